@@ -1,9 +1,12 @@
 """
 API routes for chat operations
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from app.services.chat_service import chat_service
 from app.models.chat_model import QueryRequest, QueryResponse
+from typing import Optional
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,20 +39,52 @@ async def query_documents(query: QueryRequest):
         )
 
 
+@router.post("/query/stream")
+async def query_documents_stream(query: QueryRequest):
+    """
+    Query documents using RAG pipeline, streaming the answer (Server-Sent Events)
+    
+    Sends a "sources" event after retrieval, "token" events as the answer
+    is generated, and a final "done" event with metadata.
+    
+    Args:
+        query: QueryRequest with user question
+        
+    Returns:
+        text/event-stream response
+    """
+    async def event_stream():
+        async for item in chat_service.stream_query(query):
+            yield f"event: {item['event']}\ndata: {json.dumps(item['data'])}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop reverse proxies (nginx) from buffering the stream
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 @router.get("/history")
-async def get_chat_history(limit: int = 50):
+async def get_chat_history(limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None):
     """
-    Get chat history
+    Get chat history, newest first, one page at a time
     
     Args:
         limit: Maximum number of records to return
+        cursor: next_cursor from the previous page
         
     Returns:
-        List of chat history records
+        Chat history records, and the cursor of the next page (null on the last page)
     """
     try:
-        history = await chat_service.get_chat_history(limit)
-        return {"history": history}
+        history, next_cursor = await chat_service.get_chat_history(limit, cursor)
+        return {"history": history, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving chat history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,10 +1,11 @@
 """
 API routes for document operations
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query
+from typing import List, Optional
 from app.services.document_service import document_service
-from app.models.document_model import DocumentUploadResponse
+from app.services.ingestion_service import ingestion_service
+from app.models.document_model import BatchUploadResponse, DocumentUploadResponse, IngestionBatch, IngestionJob
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,18 +14,19 @@ router = APIRouter(prefix="/documents", tags=["documents"])
 
 
 @router.post("/upload", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(file: UploadFile = File(...), workspace: Optional[str] = Form(None)):
     """
-    Upload and process a PDF document
+    Upload a PDF document and queue it for processing
     
     Args:
         file: PDF file to upload
+        workspace: Workspace to add the document to (default workspace if omitted)
         
     Returns:
-        DocumentUploadResponse with processing status
+        DocumentUploadResponse with the ingestion job ID
     """
     try:
-        result = await document_service.process_document(file)
+        result = await document_service.process_document(file, workspace)
         # Return result even if not successful (with error message)
         return result
     except Exception as e:
@@ -36,40 +38,109 @@ async def upload_document(file: UploadFile = File(...)):
         )
 
 
+@router.post("/upload/batch", response_model=BatchUploadResponse)
+async def upload_documents(files: List[UploadFile] = File(...), workspace: Optional[str] = Form(None)):
+    """
+    Upload many PDF documents (or zip archives of PDFs) and queue them as one batch
+    
+    Args:
+        files: PDF and/or ZIP files to upload
+        workspace: Workspace to add the documents to (default workspace if omitted)
+        
+    Returns:
+        BatchUploadResponse with the batch ID and per-file job IDs
+    """
+    try:
+        return await document_service.process_batch(files, workspace)
+    except Exception as e:
+        logger.error(f"Error in batch upload endpoint: {e}", exc_info=True)
+        return BatchUploadResponse(
+            success=False,
+            message=f"Upload error: {str(e)}"
+        )
+
+
+@router.get("/batches/{batch_id}", response_model=IngestionBatch)
+async def get_ingestion_batch(batch_id: str):
+    """
+    Get the progress of a batch upload
+    
+    Args:
+        batch_id: Batch ID returned by the batch upload endpoint
+        
+    Returns:
+        IngestionBatch with per-status counts and every job
+    """
+    jobs = ingestion_service.get_batch(batch_id)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    counts = {status: 0 for status in ("queued", "processing", "completed", "failed")}
+    for job in jobs:
+        counts[job.status] += 1
+    return IngestionBatch(batch_id=batch_id, total=len(jobs), jobs=jobs, **counts)
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJob)
+async def get_ingestion_job(job_id: str):
+    """
+    Get the progress of an ingestion job
+    
+    Args:
+        job_id: Job ID returned by the upload endpoint
+        
+    Returns:
+        IngestionJob with status, pages parsed and chunks embedded
+    """
+    job = ingestion_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @router.get("/")
-async def get_documents():
+async def get_documents(
+    workspace: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
     """
-    Get all uploaded documents
+    Get uploaded documents, one page at a time
+    
+    Args:
+        workspace: Only list documents of this workspace
+        limit: Maximum number of documents to return
+        cursor: next_cursor from the previous page
     
     Returns:
-        List of documents with metadata
+        Documents with metadata, and the cursor of the next page (null on the last page)
     """
     try:
-        documents = await document_service.get_all_documents()
-        return {"documents": documents}
+        documents, next_cursor = await document_service.list_documents(workspace, limit, cursor)
+        return {"documents": documents, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/stats")
-async def get_document_stats():
+async def get_document_stats(workspace: Optional[str] = None):
     """
     Get statistics about uploaded documents
     
+    Args:
+        workspace: Only count documents of this workspace
+    
     Returns:
-        Document statistics
+        Document statistics (list the documents themselves with GET /)
     """
     try:
-        documents = await document_service.get_all_documents()
-        total_size = sum(doc.get("file_size", 0) for doc in documents)
-        total_chunks = sum(doc.get("num_chunks", 0) for doc in documents)
-        
+        totals = await document_service.get_document_stats(workspace)
         return {
-            "total_documents": len(documents),
-            "total_size_mb": round(total_size / (1024 * 1024), 2),
-            "total_chunks": total_chunks,
-            "documents": documents
+            "total_documents": totals["total_documents"],
+            "total_size_mb": round(totals["total_size"] / (1024 * 1024), 2),
+            "total_chunks": totals["total_chunks"]
         }
     except Exception as e:
         logger.error(f"Error retrieving document stats: {e}")
@@ -79,7 +150,7 @@ async def get_document_stats():
 @router.delete("/{document_id}")
 async def delete_document(document_id: str):
     """
-    Delete a document by ID
+    Delete a document by ID, including its vectors and stored file
     
     Args:
         document_id: Document ID to delete
@@ -0,0 +1,82 @@
+"""
+API routes for system statistics
+"""
+from fastapi import APIRouter
+from app.core.vector_store import vector_store_manager
+from app.services.chat_service import chat_service
+from app.core.retrieval import hybrid_retriever
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/system", tags=["system"])
+
+
+@router.get("/embeddings")
+async def get_embedding_stats():
+    """
+    Get embedding pipeline statistics
+    
+    Returns:
+        Embedding batcher histograms and embedding cache hit rate
+    """
+    batcher = vector_store_manager.batcher
+    cache = vector_store_manager.embedding_cache
+    return {
+        "batcher": batcher.stats() if batcher is not None else None,
+        "cache": cache.stats() if cache is not None else None
+    }
+
+
+@router.get("/answer-cache")
+async def get_answer_cache_stats():
+    """
+    Get answer cache statistics
+    
+    Returns:
+        Answer cache size, hit rate and current corpus version
+    """
+    cache = chat_service.answer_cache
+    return {
+        "cache": cache.stats() if cache is not None else None
+    }
+
+
+@router.get("/reranker")
+async def get_reranker_stats():
+    """
+    Get reranking statistics
+    
+    Returns:
+        Configured stages, time budget, fallback count and latency histogram
+    """
+    reranker = hybrid_retriever.reranker
+    return {
+        "reranker": reranker.stats() if reranker is not None else None
+    }
+
+
+@router.get("/history-writer")
+async def get_history_writer_stats():
+    """
+    Get chat history write-behind statistics
+    
+    Returns:
+        Queued, written, spilled and dropped record counts and insert_many histograms
+    """
+    return {
+        "history_writer": chat_service.history_writer.stats()
+    }
+
+
+@router.get("/sessions")
+async def get_session_stats():
+    """
+    Get conversation session memory statistics
+    
+    Returns:
+        Sessions held in memory and the in-memory hit rate
+    """
+    return {
+        "sessions": chat_service.sessions.stats()
+    }
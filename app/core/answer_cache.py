@@ -0,0 +1,159 @@
+"""
+Semantic answer cache for repeated and near-duplicate questions
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import threading
+import time
+import numpy as np
+from app.core.embedding_cache import normalize_text
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CachedAnswer:
+    """One cached answer"""
+    
+    __slots__ = ("question", "scope", "vector", "answer", "sources", "created_at")
+    
+    def __init__(self, question: str, vector: np.ndarray, answer: str, sources: Optional[List[str]], scope: str = ""):
+        self.question = question
+        self.scope = scope
+        self.vector = vector
+        self.answer = answer
+        self.sources = sources
+        self.created_at = time.monotonic()
+
+
+class AnswerCache:
+    """
+    LRU cache of answers keyed by question text and query embedding
+    
+    Exact repeats (after normalization) are found without embedding the
+    question. Otherwise the query embedding is compared against all cached
+    questions with one matrix-vector product and the closest entry is used
+    if its cosine similarity reaches the threshold. Entries only match
+    lookups with the same scope (the workspace and document filter the
+    answer was retrieved from). The cache empties itself whenever the
+    corpus version changes, i.e. after any upload or delete.
+    """
+    
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 1000):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self._matrix_scopes: Optional[np.ndarray] = None
+        self._corpus_version: Optional[int] = None
+        self._lock = threading.Lock()
+    
+    def _sync_version(self, corpus_version: int):
+        """Drop everything if documents were added or removed since caching"""
+        if corpus_version != self._corpus_version:
+            if self._entries:
+                logger.info(f"Answer cache cleared: corpus version {self._corpus_version} -> {corpus_version}")
+            self._entries.clear()
+            self._matrix = None
+            self._corpus_version = corpus_version
+    
+    def _is_fresh(self, entry: CachedAnswer) -> bool:
+        return time.monotonic() - entry.created_at < self.ttl_seconds
+    
+    def _remove(self, key: str):
+        del self._entries[key]
+        self._matrix = None
+    
+    def get_exact(self, question: str, corpus_version: int, scope: str = "") -> Optional[CachedAnswer]:
+        """Look up a normalized exact repeat of a question"""
+        key = _key(question, scope)
+        with self._lock:
+            self._sync_version(corpus_version)
+            entry = self._entries.get(key)
+            if entry is not None and not self._is_fresh(entry):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+    
+    def get_similar(self, vector: List[float], corpus_version: int, scope: str = "") -> Optional[CachedAnswer]:
+        """Find the most similar cached question in the same scope above the threshold"""
+        query = _unit(vector)
+        with self._lock:
+            self._sync_version(corpus_version)
+            if not self._entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._matrix_keys = list(self._entries.keys())
+                self._matrix = np.stack([self._entries[k].vector for k in self._matrix_keys])
+                self._matrix_scopes = np.array([self._entries[k].scope for k in self._matrix_keys], dtype=object)
+            
+            scores = self._matrix @ query
+            scores[self._matrix_scopes != scope] = -np.inf
+            best = int(np.argmax(scores))
+            key = self._matrix_keys[best]
+            entry = self._entries[key]
+            if scores[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+            if not self._is_fresh(entry):
+                self._remove(key)
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def put(
+        self,
+        question: str,
+        vector: List[float],
+        answer: str,
+        sources: Optional[List[str]],
+        corpus_version: int,
+        scope: str = ""
+    ):
+        """Cache an answer computed against the given corpus version"""
+        key = _key(question, scope)
+        with self._lock:
+            if self._corpus_version is not None and corpus_version < self._corpus_version:
+                return  # Documents changed while this answer was being computed
+            self._sync_version(corpus_version)
+            self._entries[key] = CachedAnswer(question, _unit(vector), answer, sources, scope)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and size"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "similarity_threshold": self.similarity_threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "corpus_version": self._corpus_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def _key(question: str, scope: str) -> str:
+    return f"{scope}\x00{normalize_text(question).lower()}"
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    """Normalize a vector to unit length as float32"""
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm > 0 else array
@@ -0,0 +1,275 @@
+"""
+In-process BM25 keyword index with array-backed postings
+"""
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import math
+import os
+import re
+import threading
+import time
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Keep IDs, emails and part numbers ("XK-31", "j.smith@acme.com") as single
+# tokens, and also index their parts
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_.@/][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, with compound tokens split into their parts as well"""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    BM25 (Okapi) index over chunk texts
+    
+    Each term's postings are two parallel uint32 arrays (row numbers and term
+    frequencies), so memory stays close to 8 bytes per posting and scoring is
+    vectorized with NumPy. Each row also has a group (the chunk's document
+    ID) so searches can be restricted to some documents: postings are
+    filtered to those documents' rows before any scoring arithmetic, while
+    IDF stays corpus-wide. Deleted rows are tombstoned and squeezed out once they make
+    up a quarter of the index. The index is saved as one .npz file with
+    postings laid out back to back.
+    """
+    
+    FORMAT_VERSION = 2
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._alive = bytearray()
+        self._row_groups = array("I")
+        self._groups: Dict[str, int] = {}
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._total_length = 0
+        self._dead = 0
+        self._dirty = False
+        self._last_saved = time.monotonic()
+        self._lock = threading.RLock()
+    
+    def __len__(self) -> int:
+        return len(self._rows)
+    
+    def add(self, ids: List[str], texts: Iterable[str], groups: Optional[Iterable[str]] = None):
+        """Index chunks, replacing any existing chunks with the same IDs"""
+        groups = [""] * len(ids) if groups is None else list(groups)
+        with self._lock:
+            self._delete([chunk_id for chunk_id in ids if chunk_id in self._rows])
+            for chunk_id, text, group in zip(ids, texts, groups):
+                row = len(self._ids)
+                terms = tokenize(text)
+                frequencies: Dict[str, int] = {}
+                for term in terms:
+                    frequencies[term] = frequencies.get(term, 0) + 1
+                for term, tf in frequencies.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("I"), array("I"))
+                    postings[0].append(row)
+                    postings[1].append(tf)
+                self._ids.append(chunk_id)
+                self._rows[chunk_id] = row
+                self._lengths.append(len(terms))
+                self._row_groups.append(self._groups.setdefault(group or "", len(self._groups)))
+                self._alive.append(1)
+                self._total_length += len(terms)
+            self._dirty = True
+    
+    def delete(self, ids: Iterable[str]):
+        """Remove chunks by ID"""
+        with self._lock:
+            self._delete(ids)
+            if self._dead > max(1000, len(self._ids) // 4):
+                self._compact()
+    
+    def _delete(self, ids: Iterable[str]):
+        for chunk_id in ids:
+            row = self._rows.pop(chunk_id, None)
+            if row is None:
+                continue
+            self._alive[row] = 0
+            self._ids[row] = None
+            self._total_length -= self._lengths[row]
+            self._dead += 1
+            self._dirty = True
+    
+    def _compact(self):
+        """Squeeze tombstoned rows out of the postings"""
+        alive = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+        remap = np.cumsum(alive, dtype=np.int64) - 1
+        postings = {}
+        for term, (rows, tfs) in self._postings.items():
+            row_array = np.frombuffer(rows, dtype=np.uint32)
+            keep = alive[row_array]
+            if not keep.any():
+                continue
+            postings[term] = (
+                array("I", remap[row_array[keep]].astype(np.uint32).tobytes()),
+                array("I", np.frombuffer(tfs, dtype=np.uint32)[keep].tobytes())
+            )
+        self._postings = postings
+        self._ids = [chunk_id for chunk_id in self._ids if chunk_id is not None]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._lengths = array("I", np.frombuffer(self._lengths, dtype=np.uint32)[alive].tobytes())
+        self._row_groups = array("I", np.frombuffer(self._row_groups, dtype=np.uint32)[alive].tobytes())
+        self._alive = bytearray(b"\x01" * len(self._ids))
+        self._dead = 0
+        self._dirty = True
+    
+    def search(self, query: str, k: int, groups: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Top-k chunks for a query
+        
+        Args:
+            query: Query text
+            k: Number of results
+            groups: Only return chunks of these groups (document IDs)
+        
+        Returns:
+            (chunk ID, BM25 score) pairs, best first
+        """
+        terms = set(tokenize(query))
+        if k <= 0:
+            return []
+        with self._lock:
+            num_docs = len(self._rows)
+            if not terms or num_docs == 0:
+                return []
+            avg_length = self._total_length / num_docs
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+            alive = np.frombuffer(self._alive, dtype=np.uint8)
+            selected = None
+            if groups is not None:
+                codes = [self._groups[group] for group in groups if group in self._groups]
+                selected = np.isin(np.frombuffer(self._row_groups, dtype=np.uint32), codes) & (alive == 1)
+                if not selected.any():
+                    return []
+            scores = np.zeros(len(self._ids), dtype=np.float32)
+            
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                rows = np.frombuffer(postings[0], dtype=np.uint32)
+                tfs = np.frombuffer(postings[1], dtype=np.uint32).astype(np.float32)
+                df = int(alive[rows].sum())
+                if df == 0:
+                    continue
+                idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+                if selected is not None:
+                    keep = selected[rows]
+                    rows, tfs = rows[keep], tfs[keep]
+                norm = self.k1 * (1 - self.b + self.b * lengths[rows] / avg_length)
+                # Rows are unique within one term's postings
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+            
+            scores[alive == 0] = 0
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._ids[row], float(scores[row])) for row in top if scores[row] > 0]
+    
+    def save(self, path: str):
+        """Persist the index atomically"""
+        with self._lock:
+            if self._dead:
+                self._compact()
+            terms = sorted(self._postings)
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            for i, term in enumerate(terms):
+                offsets[i + 1] = offsets[i] + len(self._postings[term][0])
+            rows = np.empty(offsets[-1], dtype=np.uint32)
+            tfs = np.empty(offsets[-1], dtype=np.uint32)
+            for i, term in enumerate(terms):
+                rows[offsets[i]:offsets[i + 1]] = np.frombuffer(self._postings[term][0], dtype=np.uint32)
+                tfs[offsets[i]:offsets[i + 1]] = np.frombuffer(self._postings[term][1], dtype=np.uint32)
+            
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    version=np.array([self.FORMAT_VERSION]),
+                    ids=np.frombuffer(json.dumps(self._ids).encode("utf-8"), dtype=np.uint8),
+                    terms=np.frombuffer(json.dumps(terms).encode("utf-8"), dtype=np.uint8),
+                    offsets=offsets,
+                    rows=rows,
+                    tfs=tfs,
+                    lengths=np.frombuffer(self._lengths, dtype=np.uint32),
+                    groups=np.frombuffer(json.dumps(list(self._groups)).encode("utf-8"), dtype=np.uint8),
+                    row_groups=np.frombuffer(self._row_groups, dtype=np.uint32)
+                )
+            os.replace(tmp_path, path)
+            self._dirty = False
+            self._last_saved = time.monotonic()
+        logger.info(f"Saved BM25 index ({len(self._ids)} chunks, {len(terms)} terms) to {path}")
+    
+    def save_if_due(self, path: str, interval_seconds: float):
+        """Persist if there are unsaved changes older than the interval"""
+        if self._dirty and time.monotonic() - self._last_saved >= interval_seconds:
+            self.save(path)
+    
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+    
+    @classmethod
+    def load(cls, path: str, k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """Load an index saved with save()"""
+        index = cls(k1=k1, b=b)
+        with np.load(path) as data:
+            if int(data["version"][0]) != cls.FORMAT_VERSION:
+                raise ValueError(f"Unsupported BM25 index version in {path}")
+            index._ids = json.loads(data["ids"].tobytes().decode("utf-8"))
+            terms = json.loads(data["terms"].tobytes().decode("utf-8"))
+            offsets, rows, tfs = data["offsets"], data["rows"], data["tfs"]
+            for i, term in enumerate(terms):
+                start, end = offsets[i], offsets[i + 1]
+                index._postings[term] = (
+                    array("I", rows[start:end].tobytes()),
+                    array("I", tfs[start:end].tobytes())
+                )
+            index._lengths = array("I", data["lengths"].tobytes())
+            index._groups = {group: code for code, group in enumerate(json.loads(data["groups"].tobytes().decode("utf-8")))}
+            index._row_groups = array("I", data["row_groups"].tobytes())
+        index._rows = {chunk_id: row for row, chunk_id in enumerate(index._ids)}
+        index._alive = bytearray(b"\x01" * len(index._ids))
+        index._total_length = int(sum(index._lengths))
+        return index
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], weights: List[float], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked ID lists with weighted reciprocal rank fusion
+    
+    Args:
+        rankings: ID lists, best first
+        weights: One weight per ranking
+        k: RRF damping constant (60 in the original paper)
+    
+    Returns:
+        (ID, fused score) pairs, best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if weight <= 0:
+            continue
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
@@ -2,7 +2,10 @@
 Configuration management using environment variables
 """
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
+
+# Workspace names become part of a Chroma collection name
+WORKSPACE_PATTERN = r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,46}[A-Za-z0-9])?$"
 
 
 class Settings(BaseSettings):
@@ -16,19 +19,103 @@ class Settings(BaseSettings):
     DATABASE_NAME: str = "document_search_db"
     
     # Application Configuration
-    UPLOAD_DIR: str = "data/uploads"
+    UPLOAD_DIR: str = "data/uploads"  # Files are stored as <sha256>.pdf
+    MAX_UPLOAD_SIZE_MB: int = 100  # Per file, enforced while streaming
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Bytes read and written per step
     CHROMA_DIR: str = "data/chroma"
+    DEFAULT_WORKSPACE: str = "default"  # Workspace used when a request names none
     
     # LangChain Configuration
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
     
+    # Ingestion Configuration
+    INGESTION_WORKERS: int = 2  # Background threads parsing/embedding uploads
+    INGESTION_BATCH_SIZE: int = 64  # Chunks embedded per vector store write
+    INGESTION_MAX_JOBS: int = 1000  # Finished jobs kept for status lookups
+    INGESTION_METADATA_BATCH_SIZE: int = 20  # Documents per MongoDB insert_many in batch uploads
+    INGESTION_METADATA_FLUSH_MS: int = 1000  # Longest a finished document waits for its batch to fill
+    BATCH_UPLOAD_MAX_FILES: int = 1000  # PDFs accepted per batch upload (zip members included)
+    
+    # Startup: load models and open the store in the background after startup
+    # instead of on the first request
+    WARM_UP_ON_STARTUP: bool = True
+    
+    # Vector Store Backend ("chroma", or "ivf": in-process IVF index over
+    # memory-mapped vectors). Switching backends does not migrate stored chunks.
+    # Several uvicorn workers can share an IVF store on Linux/macOS: writes are
+    # serialized with a file lock and each worker picks up the others' writes.
+    VECTOR_BACKEND: str = "chroma"
+    VECTOR_DIR: str = "data/vectors"  # IVF stores, one directory per collection
+    IVF_NLIST: int = 1024  # Lists (centroids); trained once there are 39 vectors per list
+    IVF_NPROBE: int = 32  # Lists scanned per query; more is slower but more accurate
+    IVF_VECTOR_DTYPE: str = "float32"  # "float16" or "int8": scan a 2x/4x smaller quantized copy
+    IVF_RESCORE_FACTOR: int = 4  # Quantized candidates per result re-scored exactly in float32
+    
+    # Retrieval Configuration
+    RETRIEVAL_K: int = 4  # Chunks passed to the answer generator
+    HYBRID_SEARCH: bool = True  # Fuse BM25 keyword results with vector results
+    HYBRID_VECTOR_WEIGHT: float = 1.0
+    HYBRID_KEYWORD_WEIGHT: float = 1.0
+    HYBRID_CANDIDATES: int = 20  # Candidates taken from each ranking before fusion
+    RRF_K: int = 60  # Reciprocal rank fusion damping constant
+    BM25_DIR: str = "data/bm25"
+    BM25_SAVE_INTERVAL_SECONDS: float = 30.0
+    
+    # Reranking: over-fetch candidates, then rerank within a time budget
+    RERANKERS: str = "mmr"  # Comma-separated stages: "mmr", "cross_encoder"; empty disables
+    RERANK_CANDIDATES: int = 20
+    RERANK_BUDGET_MS: float = 150.0  # Fall back to retrieval order when exceeded
+    MMR_LAMBDA: float = 0.7  # 1.0 = pure relevance, 0.0 = pure diversity
+    CROSS_ENCODER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    CROSS_ENCODER_BATCH_SIZE: int = 16
+    
+    # Answer Cache (reuses answers for repeated and near-duplicate questions)
+    ANSWER_CACHE: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95  # Cosine similarity needed for a hit
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    
+    # Intent Routing (questions about the documents themselves skip retrieval)
+    INTENT_PATTERNS: Dict[str, List[str]] = {}  # Extra regexes per intent, e.g. {"list_documents": ["^inventory$"]}
+    INTENT_EXAMPLES: Dict[str, List[str]] = {}  # Extra example questions per intent for the embedding fallback
+    INTENT_EMBEDDING_FALLBACK: bool = True  # Classify unmatched questions by nearest example centroid
+    INTENT_SIMILARITY_THRESHOLD: float = 0.8
+    
+    # Conversation Sessions (recent turns used to make follow-up questions self-contained)
+    SESSION_MAX_SESSIONS: int = 1000  # Sessions kept in memory, least recently used evicted
+    SESSION_MAX_TURNS: int = 1  # Turns kept per session (condensing uses only the last one)
+    
+    # Chat History (written to MongoDB in batches, off the response path)
+    HISTORY_BATCH_SIZE: int = 50  # Records per insert_many
+    HISTORY_FLUSH_INTERVAL_MS: float = 500.0  # Longest a record waits for its batch
+    HISTORY_MAX_PENDING: int = 5000  # Queries wait for a flush beyond this many queued records
+    HISTORY_SPILL_PATH: str = "data/chat_history_spill.jsonl"  # Records kept while MongoDB is unreachable
+    HISTORY_SPILL_MAX_MB: int = 50
+    HISTORY_RETRY_MIN_S: float = 1.0  # First wait before probing MongoDB after a failed write
+    HISTORY_RETRY_MAX_S: float = 60.0  # The wait doubles after each failed probe, up to this
+    
     # Model Configuration
     USE_LOCAL_MODELS: bool = True  # Set to False to use OpenAI
     
     # Local Model Configuration (Free, no API key needed)
     LOCAL_EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     
+    # PDF Text Extraction
+    PDF_EXTRACTION_WORKERS: int = 0  # Processes per large PDF; 0 = one per CPU core, 1 = no pool
+    PDF_PARALLEL_MIN_PAGES: int = 32  # Smaller files are extracted in the ingestion thread
+    PDF_PAGES_PER_TASK: int = 16  # Pages per process pool task
+    
+    # Embedding Batching (groups concurrent embedding calls into one forward pass)
+    EMBEDDING_BATCHING: bool = True
+    EMBEDDING_MAX_BATCH_SIZE: int = 32
+    EMBEDDING_MAX_WAIT_MS: float = 5.0
+    
+    # Embedding Cache (reuses vectors of unchanged chunks across uploads and reprocessing)
+    EMBEDDING_CACHE: bool = True
+    EMBEDDING_CACHE_PATH: str = "data/embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500000
+    
     # OpenAI Model Configuration (Only if USE_LOCAL_MODELS = False)
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     LLM_MODEL: str = "gpt-4o-mini"
@@ -37,6 +124,9 @@ class Settings(BaseSettings):
     # API Configuration
     API_PREFIX: str = "/api"
     
+    # Metrics (Prometheus text format at /metrics)
+    SERVER_TIMING_HEADER: bool = False  # Report per-stage durations in a Server-Timing response header
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
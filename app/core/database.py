@@ -1,13 +1,32 @@
 """
 MongoDB database connection and management
 """
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
 from pymongo.errors import ConnectionFailure
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Indexes created at startup, per collection
+INDEXES: Dict[str, List[List[Tuple[str, int]]]] = {
+    "documents": [
+        [("content_hash", ASCENDING)],
+        [("filename", ASCENDING)],
+        # Listing a workspace page by page
+        [("workspace", ASCENDING), ("_id", ASCENDING)],
+    ],
+    "chat_history": [
+        [("timestamp", DESCENDING), ("_id", DESCENDING)],
+        [("session_id", ASCENDING), ("timestamp", DESCENDING)],
+    ],
+}
+
 
 class MongoDB:
     """MongoDB connection manager"""
@@ -24,12 +43,23 @@ class MongoDB:
             # Verify connection
             await self.client.admin.command('ping')
             logger.info(f"Connected to MongoDB: {settings.DATABASE_NAME}")
+            await self.create_indexes()
         except Exception as e:
             logger.warning(f"MongoDB connection failed: {e}. The application will continue without MongoDB.")
             # Don't raise - allow app to start without MongoDB
             self.client = None
             self.db = None
     
+    async def create_indexes(self):
+        """Create the indexes the service queries rely on (no-op for existing ones)"""
+        for collection_name, indexes in INDEXES.items():
+            for keys in indexes:
+                try:
+                    await self.db[collection_name].create_index(keys)
+                except Exception as e:
+                    # Queries still work without the index, only slower
+                    logger.warning(f"Could not create index {keys} on {collection_name}: {e}")
+    
     async def close(self):
         """Close MongoDB connection"""
         if self.client:
@@ -48,6 +78,54 @@ class MongoDB:
 mongodb = MongoDB()
 
 
+def workspace_query(workspace: Optional[str] = None) -> Dict:
+    """
+    Filter for the documents of a workspace
+    
+    Documents stored before workspaces existed have no workspace field and
+    belong to the default workspace.
+    """
+    workspace = workspace or settings.DEFAULT_WORKSPACE
+    if workspace == settings.DEFAULT_WORKSPACE:
+        return {"workspace": {"$in": [workspace, None]}}
+    return {"workspace": workspace}
+
+
+def id_cursor(cursor: Optional[str]) -> Optional[ObjectId]:
+    """
+    Decode a pagination cursor holding the last ObjectId of the previous page
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if cursor is None:
+        return None
+    try:
+        return ObjectId(cursor)
+    except (InvalidId, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def timestamp_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, ObjectId]]:
+    """
+    Decode a "<ISO timestamp>_<ObjectId>" pagination cursor
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if cursor is None:
+        return None
+    timestamp, _, last_id = cursor.rpartition("_")
+    try:
+        return datetime.fromisoformat(timestamp), ObjectId(last_id)
+    except (InvalidId, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def encode_timestamp_cursor(timestamp: datetime, last_id: ObjectId) -> str:
+    return f"{timestamp.isoformat()}_{last_id}"
+
+
 async def get_database():
     """Dependency to get database instance"""
     return mongodb.db
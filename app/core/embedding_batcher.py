@@ -0,0 +1,139 @@
+"""
+Cross-request embedding micro-batcher
+"""
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, List
+from langchain_core.embeddings import Embeddings
+from app.core.metrics import metrics
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingText:
+    """One text waiting to be embedded"""
+    
+    __slots__ = ("text", "future", "enqueued_at")
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingBatcher(Embeddings):
+    """
+    Group concurrent embed_query/embed_documents calls into shared batches
+    
+    Callers block until their vectors are ready, so this must be used from
+    worker threads (the retriever and ingestion already run there). A single
+    background thread waits up to max_wait_ms for a batch to fill up to
+    max_batch_size texts, then runs one embed_documents() forward pass.
+    Queries are taken ahead of document texts so a large ingestion doesn't
+    delay chat traffic. Queries and documents share a forward pass, which
+    is correct for symmetric models (all-MiniLM-L6-v2, OpenAI embeddings).
+    """
+    
+    def __init__(self, embeddings: Embeddings, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embeddings = embeddings
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queries: Deque[_PendingText] = deque()
+        self._documents: Deque[_PendingText] = deque()
+        self._condition = threading.Condition()
+        self._worker = None
+        
+        self._batch_sizes = metrics.histogram(
+            "embedding_batch_size",
+            "Texts per embedding forward pass",
+            [1, 2, 4, 8, 16, 32, 64, 128, 256]
+        )
+        self._queue_waits = metrics.histogram(
+            "embedding_queue_wait_seconds",
+            "Time a text waited in the batcher queue",
+            [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+        )
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed document texts, sharing batches with other callers"""
+        if not texts:
+            return []
+        pending = [_PendingText(text) for text in texts]
+        self._enqueue(self._documents, pending)
+        return [item.future.result() for item in pending]
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, sharing a batch with other callers"""
+        item = _PendingText(text)
+        self._enqueue(self._queries, [item])
+        return item.future.result()
+    
+    def _enqueue(self, queue: Deque[_PendingText], items: List[_PendingText]):
+        """Add texts to a queue and wake the worker"""
+        with self._condition:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name="embedding-batcher",
+                    daemon=True
+                )
+                self._worker.start()
+            queue.extend(items)
+            self._condition.notify()
+    
+    def _pending_count(self) -> int:
+        return len(self._queries) + len(self._documents)
+    
+    def _next_batch(self) -> List[_PendingText]:
+        """Wait for a full batch or for the oldest text's wait budget to run out"""
+        with self._condition:
+            while not self._pending_count():
+                self._condition.wait()
+            
+            oldest = min(q[0].enqueued_at for q in (self._queries, self._documents) if q)
+            deadline = oldest + self.max_wait
+            while self._pending_count() < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            
+            batch = []
+            for queue in (self._queries, self._documents):
+                while queue and len(batch) < self.max_batch_size:
+                    batch.append(queue.popleft())
+            return batch
+    
+    def _run(self):
+        """Worker loop: one forward pass per batch"""
+        while True:
+            batch = self._next_batch()
+            
+            started = time.perf_counter()
+            for item in batch:
+                self._queue_waits.observe(started - item.enqueued_at)
+            self._batch_sizes.observe(len(batch))
+            
+            try:
+                vectors = self.embeddings.embed_documents([item.text for item in batch])
+            except Exception as e:
+                logger.error(f"Error embedding batch of {len(batch)} texts: {e}")
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+            
+            for item, vector in zip(batch, vectors):
+                item.future.set_result(vector)
+    
+    def stats(self) -> dict:
+        """Batch-size and queue-wait histograms"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "pending": self._pending_count(),
+            "batch_size": self._batch_sizes.snapshot(),
+            "queue_wait_seconds": self._queue_waits.snapshot()
+        }
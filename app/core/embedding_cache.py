@@ -0,0 +1,198 @@
+"""
+Persistent content-addressed embedding cache
+"""
+from array import array
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+from langchain_core.embeddings import Embeddings
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import logging
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Chunks embed_documents took from the cache in this context, while count_reused() is active
+_reused: ContextVar[Optional[List[int]]] = ContextVar("embedding_cache_reused", default=None)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize chunk text so formatting-only differences share a cache entry"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed LRU cache of vectors keyed by (model name, text hash)
+    
+    Lookups don't write: the LRU positions of hits are kept in memory and
+    written together every touch_interval seconds, or before an eviction.
+    """
+    
+    def __init__(self, path: str, model_name: str, max_entries: int = 500_000, touch_interval: float = 30.0):
+        self.path = path
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._last_touch_flush = time.monotonic()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    
+    def key(self, text: str) -> str:
+        """Cache key for a text under this cache's model"""
+        payload = f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+    
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Look up vectors, refreshing their LRU position"""
+        found = {}
+        if not keys:
+            return found
+        now = time.time()
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            for key in found:
+                self._touched[key] = now
+            if time.monotonic() - self._last_touch_flush >= self.touch_interval:
+                self._flush_touches()
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+    
+    def _flush_touches(self):
+        """Write buffered LRU positions (caller holds the lock and commits)"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()]
+            )
+            self._touched.clear()
+        self._last_touch_flush = time.monotonic()
+    
+    def flush(self):
+        """Write buffered LRU positions now"""
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+    
+    def put_many(self, items: Dict[str, List[float]]):
+        """Store vectors, evicting least recently used entries over the cap"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+            )
+            self._entries += len(items)
+            if self._entries > self.max_entries:
+                # Evict by up-to-date LRU positions
+                self._flush_touches()
+                self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                excess = self._entries - self.max_entries
+                if excess > 0:
+                    # Evict a little extra so we don't evict on every write
+                    excess += self.max_entries // 20
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (excess,)
+                    )
+                    self._entries = max(0, self._entries - excess)
+                    logger.info(f"Embedding cache evicted {excess} entries")
+            self._conn.commit()
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and size"""
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+@contextmanager
+def count_reused() -> Iterator[List[int]]:
+    """Count the chunks embedded in this block that came from the cache (in counter[0])"""
+    counter = [0]
+    token = _reused.set(counter)
+    try:
+        yield counter
+    finally:
+        _reused.reset(token)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the model"""
+    
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed document texts, reusing cached vectors for unchanged chunks"""
+        if not texts:
+            return []
+        keys = [self.cache.key(text) for text in texts]
+        vectors: Dict[str, Optional[List[float]]] = self.cache.get_many(list(dict.fromkeys(keys)))
+        
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            computed = self.embeddings.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), computed))
+            self.cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+        
+        counter = _reused.get()
+        if counter is not None:
+            counter[0] += len(texts) - len(missing)
+        logger.debug(
+            f"Embedding cache: {len(texts) - len(missing)}/{len(texts)} chunks reused "
+            f"(overall hit rate {self.cache.stats()['hit_rate']:.1%})"
+        )
+        return [vectors[key] for key in keys]
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Queries are not cached"""
+        return self.embeddings.embed_query(text)
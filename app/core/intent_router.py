@@ -0,0 +1,241 @@
+"""
+Question intent routing: compiled patterns with an embedding nearest-centroid fallback
+"""
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+import re
+import threading
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+LIST_DOCUMENTS = "list_documents"
+DOCUMENT_STATS = "document_stats"
+SUMMARIZE_DOCUMENT = "summarize_document"
+CONTENT_QUESTION = "content_question"
+
+_DOCUMENTS = r"(?:files?|documents?|docs|pdfs?)"
+_END = r"\s*[?.!]*\s*$"
+
+# Patterns per intent; a named group "document" captures the document a question is about
+DEFAULT_PATTERNS: Dict[str, List[str]] = {
+    LIST_DOCUMENTS: [
+        rf"^\s*(?:please\s+)?(?:what|which|list|show(?:\s+me)?)\s+(?:all\s+|the\s+|my\s+|your\s+)*(?:uploaded\s+)?{_DOCUMENTS}"
+        r"(?:\s+(?:do\s+you\s+have|have\s+you\s+got|are\s+(?:there|uploaded|available)|"
+        r"(?:have|were|was)\s+(?:i\s+|been\s+)?uploaded|you\s+have|uploaded))?\s*[?.!]*\s*$",
+        rf"^\s*(?:uploaded|available)\s+{_DOCUMENTS}\s*[?.!]*\s*$",
+        rf"^\s*(?:file|document)\s+(?:details|list)\s*[?.!]*\s*$",
+    ],
+    # Whole-question forms only: "how many documents does the contract reference?" is about content
+    DOCUMENT_STATS: [
+        rf"^\s*(?:please\s+)?how\s+many\s+(?:{_DOCUMENTS}|chunks)"
+        r"(?:\s+(?:are\s+(?:there|uploaded|indexed|stored|available)|do\s+you\s+have|have\s+you\s+got|"
+        r"(?:have|were|was)\s+(?:i\s+|been\s+)?(?:uploaded|indexed)|you\s+have|uploaded|indexed))?"
+        rf"(?:\s+(?:in\s+total|so\s+far|in\s+(?:the\s+)?(?:index|database|system)))?{_END}",
+        rf"^\s*(?:please\s+)?(?:(?:show|give)\s+(?:me\s+)?|what\s+are\s+)?(?:the\s+|my\s+)?"
+        rf"(?:{_DOCUMENTS}|storage|index)\s+(?:stats|statistics){_END}",
+        rf"^\s*(?:what(?:\s+is|'s)\s+)?(?:the\s+)?total\s+(?:size|number)\s+of\s+(?:the\s+|my\s+|all\s+)?"
+        rf"(?:uploaded\s+|indexed\s+)?(?:{_DOCUMENTS}|chunks){_END}",
+    ],
+    SUMMARIZE_DOCUMENT: [
+        rf"^\s*(?:please\s+)?(?:summari[sz]e|give\s+(?:me\s+)?(?:a\s+)?summary\s+of|tl;?dr(?:\s+of)?)\s+"
+        rf"(?:the\s+)?(?:{_DOCUMENTS}\s+)?[\"']?(?P<document>[^\"'?]+?)[\"']?\s*[?.!]*\s*$",
+        rf"^\s*what\s+is\s+(?:the\s+)?(?:{_DOCUMENTS}\s+)?[\"']?(?P<document>[^\"'?\s]+\.pdf)[\"']?\s+about\s*[?.!]*\s*$",
+    ],
+}
+
+# Example questions whose embeddings form each intent's centroid
+DEFAULT_EXAMPLES: Dict[str, List[str]] = {
+    LIST_DOCUMENTS: [
+        "What files do you have?",
+        "Which documents have been uploaded?",
+        "Show me the list of uploaded PDFs",
+        "What documents can you search?",
+    ],
+    DOCUMENT_STATS: [
+        "How many documents are uploaded?",
+        "How much storage do the files use?",
+        "How many chunks are indexed in total?",
+    ],
+    CONTENT_QUESTION: [
+        "What is the candidate's work experience?",
+        "What does the contract say about termination?",
+        "Explain the main findings of the report",
+        "Which programming languages are mentioned?",
+        "What do you have on Python?",
+        "When does the agreement expire?",
+    ],
+}
+
+# Questions and the intent the default patterns must give them (None: no pattern
+# matches, so the embedding or the content path decides). IntentRouter checks
+# its patterns against this table when it's created.
+ROUTING_CASES: List[Tuple[str, Optional[str]]] = [
+    ("What files do you have?", LIST_DOCUMENTS),
+    ("list all uploaded documents", LIST_DOCUMENTS),
+    ("Which PDFs were uploaded?", LIST_DOCUMENTS),
+    ("How many documents are there?", DOCUMENT_STATS),
+    ("how many files do you have", DOCUMENT_STATS),
+    ("How many chunks are indexed in total?", DOCUMENT_STATS),
+    ("How many documents?", DOCUMENT_STATS),
+    ("Show me the storage stats", DOCUMENT_STATS),
+    ("What is the total size of all documents?", DOCUMENT_STATS),
+    ("Summarize report.pdf", SUMMARIZE_DOCUMENT),
+    ("Give me a summary of the Q3 results", SUMMARIZE_DOCUMENT),
+    ("What is contract.pdf about?", SUMMARIZE_DOCUMENT),
+    ("How many documents does the contract reference?", None),
+    ("How many files must the applicant submit?", None),
+    ("How many chunks of memory does the allocator reserve?", None),
+    ("What do the index statistics in the report show?", None),
+    ("What is the total number of documents required for the visa?", None),
+    ("Which documents does the candidate list as references?", None),
+    ("What documents are required for onboarding?", None),
+    ("What is the candidate's work experience?", None),
+]
+
+
+class IntentMatch(NamedTuple):
+    """Routing decision for a question"""
+    intent: str
+    method: str  # "pattern", "embedding" or "default"
+    score: float = 1.0
+    document: Optional[str] = None  # Document named in the question, if the intent takes one
+
+
+class IntentRouter:
+    """
+    Decide what kind of question was asked before running retrieval
+    
+    All patterns are compiled into a single alternation (one regex
+    automaton), so a question is matched against every rule in one pass of
+    a few microseconds. Questions no pattern matches can be classified by
+    the query embedding the caller computes anyway: the intent whose
+    example centroid is most similar wins if its cosine similarity reaches
+    the threshold, otherwise the question is a content question.
+    Patterns and examples are merged with the defaults, so deployments can
+    add phrasings (or new intents) from configuration.
+    """
+    
+    def __init__(
+        self,
+        patterns: Optional[Dict[str, List[str]]] = None,
+        examples: Optional[Dict[str, List[str]]] = None,
+        similarity_threshold: float = 0.8
+    ):
+        self.patterns = _merge(DEFAULT_PATTERNS, patterns)
+        self.examples = _merge(DEFAULT_EXAMPLES, examples)
+        self.similarity_threshold = similarity_threshold
+        self._regex, self._rules = self._compile(self.patterns)
+        self._centroids: Optional[np.ndarray] = None
+        self._centroid_intents: List[str] = []
+        self._lock = threading.Lock()
+        self._warm_up_thread: Optional[threading.Thread] = None
+        
+        for question, expected, actual in self.misrouted(ROUTING_CASES):
+            logger.warning(f"Intent patterns route {question!r} to {actual}, expected {expected}")
+    
+    @staticmethod
+    def _compile(patterns: Dict[str, List[str]]):
+        """One regex with a named group per rule; returns it and the intent of each rule group"""
+        alternatives = []
+        rules = {}
+        for intent, intent_patterns in patterns.items():
+            for pattern in intent_patterns:
+                name = f"r{len(rules)}"
+                # Group names must be unique across the alternation
+                alternatives.append(f"(?P<{name}>{pattern.replace('(?P<document>', f'(?P<{name}_document>')})")
+                rules[name] = intent
+        return re.compile("|".join(alternatives) or "(?!)", re.IGNORECASE), rules
+    
+    def match_pattern(self, question: str) -> Optional[IntentMatch]:
+        """Intent of the first pattern matching the question, if any"""
+        match = self._regex.search(question)
+        if match is None:
+            return None
+        # The rule's outer group is the last one to close
+        rule = match.lastgroup
+        document = match.groupdict().get(f"{rule}_document")
+        return IntentMatch(self._rules[rule], "pattern", 1.0, document.strip() if document else None)
+    
+    def misrouted(self, cases: List[Tuple[str, Optional[str]]]) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """(question, expected, actual) for each case the patterns get wrong"""
+        wrong = []
+        for question, expected in cases:
+            match = self.match_pattern(question)
+            actual = match.intent if match else None
+            if actual != expected:
+                wrong.append((question, expected, actual))
+        return wrong
+    
+    def warm_up(self, embeddings: Embeddings):
+        """Embed the example questions to enable the embedding fallback (blocking)"""
+        if self._centroids is not None:
+            return
+        with self._lock:
+            if self._centroids is not None:
+                return
+            intents = [intent for intent, examples in self.examples.items() if examples]
+            texts = [text for intent in intents for text in self.examples[intent]]
+            vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            centroids = []
+            offset = 0
+            for intent in intents:
+                count = len(self.examples[intent])
+                centroid = vectors[offset:offset + count].mean(axis=0)
+                centroids.append(centroid / max(np.linalg.norm(centroid), 1e-12))
+                offset += count
+            self._centroid_intents = intents
+            self._centroids = np.stack(centroids)
+            logger.info(f"Intent router ready: {len(self._rules)} patterns, {len(intents)} embedding centroids")
+    
+    def warm_up_in_background(self, embeddings: Embeddings):
+        """Start warm_up() in a thread unless it ran or is running (for deployments without startup warm-up)"""
+        if self._centroids is not None or self._warm_up_thread is not None:
+            return
+        with self._lock:
+            if self._centroids is not None or self._warm_up_thread is not None:
+                return
+            self._warm_up_thread = threading.Thread(
+                target=self._warm_up_logged, args=(embeddings,), name="intent-warm-up", daemon=True
+            )
+            self._warm_up_thread.start()
+    
+    def _warm_up_logged(self, embeddings: Embeddings):
+        try:
+            self.warm_up(embeddings)
+        except Exception as e:
+            logger.warning(f"Could not embed intent examples: {e}")
+        finally:
+            self._warm_up_thread = None
+    
+    def match_embedding(self, query_vector: List[float]) -> Optional[IntentMatch]:
+        """
+        Nearest intent centroid to a query embedding, if similar enough
+        
+        Returns None until warm_up() has run, so the request path never
+        waits for the examples to be embedded.
+        """
+        if self._centroids is None:
+            return None
+        vector = np.asarray(query_vector, dtype=np.float32)
+        scores = self._centroids @ (vector / max(np.linalg.norm(vector), 1e-12))
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        return IntentMatch(self._centroid_intents[best], "embedding", float(scores[best]))
+    
+    def route(self, question: str, query_vector: Optional[List[float]] = None) -> IntentMatch:
+        """Intent of a question: patterns first, then the embedding if given"""
+        match = self.match_pattern(question)
+        if match is None and query_vector is not None:
+            match = self.match_embedding(query_vector)
+        return match or IntentMatch(CONTENT_QUESTION, "default", 0.0)
+
+
+def _merge(defaults: Dict[str, List[str]], extra: Optional[Dict[str, List[str]]]) -> Dict[str, List[str]]:
+    merged = {intent: list(values) for intent, values in defaults.items()}
+    for intent, values in (extra or {}).items():
+        merged.setdefault(intent, []).extend(values)
+    return merged
@@ -0,0 +1,721 @@
+"""
+In-process IVF vector index over memory-mapped vectors
+"""
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import json
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+import logging
+from app.utils.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+_FIELD = re.compile(r"^\w+$")
+
+QUANTIZED_DTYPES = ("float16", "int8")
+
+
+class QuantizedVectors:
+    """
+    Memory-mapped float16 or int8 copy of unit vectors for approximate scoring
+    
+    int8 rows are scaled individually so each row's largest component maps
+    to 127; the per-row scale is kept in a float32 side file.
+    """
+    
+    def __init__(self, directory: str, dtype: str, capacity: int, dim: int):
+        self.dtype = dtype
+        self.codes = _map(_codes_path(directory, dtype), np.dtype(dtype), capacity, dim)
+        self.scales = _map(os.path.join(directory, "scales.f32"), np.dtype(np.float32), capacity) if dtype == "int8" else None
+    
+    @staticmethod
+    def exists(directory: str, dtype: str) -> bool:
+        return os.path.exists(_codes_path(directory, dtype))
+    
+    @staticmethod
+    def remove(directory: str, dtype: str):
+        paths = [_codes_path(directory, dtype)]
+        if dtype == "int8":
+            paths.append(os.path.join(directory, "scales.f32"))
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def encode(self, start: int, vectors: np.ndarray):
+        """Store quantized copies of rows start..start+len(vectors)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        end = start + len(vectors)
+        if self.scales is None:
+            self.codes[start:end] = vectors.astype(np.float16)
+            return
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        self.codes[start:end] = np.round(vectors / scales[:, None]).astype(np.int8)
+        self.scales[start:end] = scales
+    
+    def scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate dot products of rows with a float32 query"""
+        scores = self.codes[rows].astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales[rows]
+        return scores
+    
+    def flush(self):
+        self.codes.flush()
+        if self.scales is not None:
+            self.scales.flush()
+
+
+def _codes_path(directory: str, dtype: str) -> str:
+    return os.path.join(directory, "vectors.f16" if dtype == "float16" else "vectors.i8")
+
+
+def _map(path: str, dtype: np.dtype, capacity: int, dim: Optional[int] = None) -> np.memmap:
+    """
+    Map a row-major array file, creating it or growing it to at least capacity rows
+    
+    Files are never shrunk: another process may already have grown them.
+    """
+    row_bytes = dtype.itemsize * (dim or 1)
+    mode = "r+b" if os.path.exists(path) else "w+b"
+    with open(path, mode) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < capacity * row_bytes:
+            f.truncate(capacity * row_bytes)
+        else:
+            capacity = size // row_bytes
+    shape = (capacity, dim) if dim is not None else (capacity,)
+    return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+
+class IVFStore:
+    """
+    Inverted-file (IVF) vector index with records kept in SQLite
+    
+    Unit-length float32 vectors live in one memory-mapped file, so only the
+    pages a query touches are read and processes opening the same store
+    share them through the page cache. Records (ID, text, metadata JSON and
+    assigned list) live in SQLite next to it.
+    
+    With dtype "float16" or "int8", queries scan a second, quantized copy
+    of the vectors (2x or 4x smaller, so far more of it stays in the page
+    cache) and only the best k * rescore_factor candidates are re-scored
+    exactly from the float32 file. The quantized copy is rebuilt from the
+    float32 file when missing, so dtype can be changed without re-ingesting.
+    
+    Once enough vectors exist, nlist centroids are trained with spherical
+    k-means on a sample and every vector is assigned to its nearest
+    centroid. A query scores the centroids, then only the vectors in the
+    nprobe closest lists; more probes trade latency for recall. Vectors added
+    since the last training (list -1) are always scanned, and before the
+    first training the search is exact. Metadata filters are resolved in
+    SQLite first so only matching rows are scored.
+    
+    Several processes (e.g. uvicorn workers) may open and write the same
+    store. Writes hold an exclusive lock on <directory>/write.lock, claim
+    rows from the "next_row" counter in SQLite and bump a "generation"
+    counter in the same transaction; vectors are written to the shared
+    mapping before the commit. Every operation first compares the
+    generation with the one it last saw and, if it changed, loads the rows
+    added and deleted since (deletions are logged in a tombstones table).
+    Training and compaction renumber or reassign rows and bump an "epoch"
+    counter instead, which makes other processes reload the store. File
+    locks need fcntl, so on Windows only one process may use a store.
+    Compaction rewrites the vector file and should run while the API is
+    stopped (see scripts/compact_vector_store.py).
+    """
+    
+    FORMAT_VERSION = 1
+    
+    def __init__(
+        self,
+        directory: str,
+        nlist: int = 1024,
+        nprobe: int = 32,
+        dtype: str = "float32",
+        rescore_factor: int = 4,
+        train_min_per_list: int = 39
+    ):
+        if dtype not in QUANTIZED_DTYPES and dtype != "float32":
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        self.directory = directory
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.dtype = dtype
+        self.rescore_factor = max(1, rescore_factor)
+        # Training waits for this many vectors per list (faiss uses the same rule of thumb)
+        self.train_min_per_list = train_min_per_list
+        self._lock = threading.RLock()
+        self._write_depth = 0
+        self._training = False
+        os.makedirs(directory, exist_ok=True)
+        
+        self._db = sqlite3.connect(os.path.join(directory, "records.sqlite3"), check_same_thread=False)
+        with self._lock, self._write_lock():
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, list INTEGER NOT NULL, "
+                "document TEXT, metadata TEXT)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            # Rows deleted since the last training or compaction, for other processes to catch up
+            self._db.execute("CREATE TABLE IF NOT EXISTS tombstones (row INTEGER PRIMARY KEY, generation INTEGER NOT NULL)")
+            # Chunks are filtered by document far more often than by anything else
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS records_document_id ON records (json_extract(metadata, '$.document_id'))"
+            )
+            self._db.commit()
+            
+            self._reset()
+            self._load()
+    
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, "vectors.f32")
+    
+    @property
+    def _centroids_path(self) -> str:
+        return os.path.join(self.directory, "centroids.npy")
+    
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        """Exclusive lock between processes writing this store (re-entrant; take self._lock first)"""
+        if self._write_depth:
+            self._write_depth += 1
+            try:
+                yield
+            finally:
+                self._write_depth -= 1
+            return
+        with file_lock(os.path.join(self.directory, "write.lock")):
+            self._write_depth = 1
+            try:
+                yield
+            finally:
+                self._write_depth = 0
+    
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set_meta(self, key: str, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+    
+    def _next_generation(self, epoch: bool = False) -> int:
+        """Bump the generation (and the epoch if rows were renumbered) in the current transaction"""
+        generation = self._generation + 1
+        self._set_meta("generation", generation)
+        if epoch:
+            self._epoch = str(int(self._epoch or 0) + 1)
+            self._set_meta("epoch", self._epoch)
+        return generation
+    
+    def _reset(self):
+        """Forget everything loaded from disk"""
+        self.dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._codes: Optional[QuantizedVectors] = None
+        self._capacity = 0
+        self._size = 0  # Rows in use, including deleted ones
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._lists = np.zeros(0, dtype=np.int32)
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_count = 0
+        self._generation = 0
+        self._epoch: Optional[str] = None
+    
+    def _load(self):
+        """Open the vector file and read row assignments from SQLite (caller holds the write lock)"""
+        version = self._get_meta("version")
+        if version is not None and int(version) != self.FORMAT_VERSION:
+            raise ValueError(f"Unsupported IVF store version in {self.directory}")
+        self._generation = int(self._get_meta("generation") or 0)
+        self._epoch = self._get_meta("epoch")
+        dim = self._get_meta("dim")
+        if dim is None:
+            return
+        self.dim = int(dim)
+        self._trained_count = int(self._get_meta("trained_count") or 0)
+        
+        records = self._db.execute("SELECT row, id, list FROM records ORDER BY row").fetchall()
+        next_row = self._get_meta("next_row")
+        self._size = int(next_row) if next_row is not None else (records[-1][0] + 1 if records else 0)
+        self._remove_stale_codes()
+        rebuild_codes = self.dtype != "float32" and not QuantizedVectors.exists(self.directory, self.dtype)
+        self._open_vectors(self._size)
+        if rebuild_codes:
+            for start in range(0, self._size, 65536):
+                end = min(start + 65536, self._size)
+                self._codes.encode(start, self._vectors[start:end])
+            logger.info(f"Built {self.dtype} vectors for {self.directory} ({self._size} rows)")
+        self._ids = [None] * self._size
+        self._apply_records(records)
+        if os.path.exists(self._centroids_path):
+            self._centroids = np.load(self._centroids_path)
+        logger.info(f"IVF store loaded: {self.directory} ({len(self._rows)} vectors)")
+    
+    def _apply_records(self, records):
+        for row, chunk_id, list_id in records:
+            self._ids[row] = chunk_id
+            self._rows[chunk_id] = row
+            self._alive[row] = True
+            self._lists[row] = list_id
+    
+    def _sync(self):
+        """
+        Catch up with writes made by other processes (caller holds self._lock)
+        
+        Costs one SQLite lookup when nothing changed.
+        """
+        generation = int(self._get_meta("generation") or 0)
+        if generation == self._generation:
+            return
+        if self._get_meta("epoch") != self._epoch or self.dim is None:
+            # Trained or compacted elsewhere (row lists or numbers changed), or created
+            with self._write_lock():
+                self._reset()
+                self._load()
+            return
+        
+        size = int(self._get_meta("next_row") or self._size)
+        if size > self._capacity:
+            self._open_vectors(size)
+        # Only the rows claimed since the last sync can be new
+        records = self._db.execute(
+            "SELECT row, id, list FROM records WHERE row >= ? ORDER BY row", (self._size,)
+        ).fetchall()
+        deleted = [row for (row,) in self._db.execute(
+            "SELECT row FROM tombstones WHERE generation > ?", (self._generation,)
+        )]
+        self._ids.extend([None] * (size - len(self._ids)))
+        for row in deleted:
+            chunk_id = self._ids[row]
+            if chunk_id is not None and self._rows.get(chunk_id) == row:
+                del self._rows[chunk_id]
+            self._ids[row] = None
+            self._alive[row] = False
+        self._apply_records(records)
+        self._size = size
+        self._generation = generation
+    
+    def _open_vectors(self, capacity: int):
+        """Map the vector file, growing it (and the row arrays) to at least capacity rows"""
+        if self._vectors is not None:
+            self._vectors.flush()
+        if self._codes is not None:
+            self._codes.flush()
+        # Readers holding the old mapping keep a valid view of the rows they saw
+        self._vectors = _map(self._vectors_path, np.dtype(np.float32), capacity, self.dim)
+        capacity = len(self._vectors)
+        if self.dtype != "float32":
+            self._codes = QuantizedVectors(self.directory, self.dtype, capacity, self.dim)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive[:capacity]
+        lists = np.full(capacity, -1, dtype=np.int32)
+        lists[:len(self._lists)] = self._lists[:capacity]
+        self._alive, self._lists, self._capacity = alive, lists, capacity
+    
+    def _remove_stale_codes(self):
+        """
+        Delete quantized copies of other dtypes
+        
+        They are not updated while unused, so they'd be out of date if the
+        dtype were switched back later.
+        """
+        for dtype in QUANTIZED_DTYPES:
+            if dtype != self.dtype:
+                QuantizedVectors.remove(self.directory, dtype)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._rows)
+    
+    def add(self, ids: List[str], vectors, documents: List[str], metadatas: List[Optional[Dict]]):
+        """Add or replace records"""
+        vectors = _unit_rows(vectors)
+        with self._lock, self._write_lock():
+            self._sync()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._set_meta("version", self.FORMAT_VERSION)
+                self._set_meta("dim", self.dim)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+            generation = self._next_generation()
+            try:
+                self._delete([chunk_id for chunk_id in ids if chunk_id in self._rows], generation)
+                
+                start = self._size
+                end = start + len(ids)
+                if end > self._capacity:
+                    self._open_vectors(max(end, 2 * self._capacity, 1024))
+                # Written before the commit, so other processes never see rows without vectors
+                self._vectors[start:end] = vectors
+                if self._codes is not None:
+                    self._codes.encode(start, vectors)
+                lists = self._assign(vectors) if self._centroids is not None else np.full(len(ids), -1, dtype=np.int32)
+                self._db.executemany(
+                    "INSERT INTO records (row, id, list, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (start + i, chunk_id, int(lists[i]), documents[i], json.dumps(metadatas[i] or {}))
+                        for i, chunk_id in enumerate(ids)
+                    ]
+                )
+                self._set_meta("next_row", end)
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                # The in-memory view may be half updated; reload it
+                self._reset()
+                self._load()
+                raise
+            
+            self._ids.extend(ids)
+            for i, chunk_id in enumerate(ids):
+                self._rows[chunk_id] = start + i
+            self._lists[start:end] = lists
+            self._alive[start:end] = True
+            self._size = end
+            self._generation = generation
+            needs_training = (
+                not self._training
+                and len(self._rows) >= self.nlist * self.train_min_per_list
+                and len(self._rows) >= 2 * self._trained_count
+            )
+            if needs_training:
+                self._training = True
+        if needs_training:
+            try:
+                self.train()
+            finally:
+                self._training = False
+    
+    def delete(self, ids: Iterable[str]):
+        """Remove records by ID (unknown IDs are ignored)"""
+        with self._lock, self._write_lock():
+            self._sync()
+            ids = [chunk_id for chunk_id in ids if chunk_id in self._rows]
+            if not ids:
+                return
+            generation = self._next_generation()
+            self._delete(ids, generation)
+            self._db.commit()
+            self._generation = generation
+    
+    def _delete(self, ids: List[str], generation: int):
+        if not ids:
+            return
+        rows = [self._rows.pop(chunk_id) for chunk_id in ids]
+        for row in rows:
+            self._ids[row] = None
+        self._alive[rows] = False
+        self._db.executemany("DELETE FROM records WHERE row = ?", [(row,) for row in rows])
+        self._db.executemany(
+            "INSERT OR REPLACE INTO tombstones (row, generation) VALUES (?, ?)",
+            [(row, generation) for row in rows]
+        )
+    
+    def train(self, sample_size_per_list: int = 64, iterations: int = 10, block: int = 65536):
+        """
+        Train list centroids and reassign all vectors
+        
+        The slow part runs without the locks, on the rows that exist when it
+        starts; rows added meanwhile are assigned before the new centroids
+        are swapped in. If another process trained meanwhile, its centroids
+        are kept.
+        """
+        with self._lock:
+            self._sync()
+            size = self._size
+            rows = np.flatnonzero(self._alive[:size])
+            vectors = self._vectors
+            epoch = self._epoch
+        if len(rows) < self.nlist:
+            return
+        
+        rng = np.random.default_rng(0)
+        sample = vectors[np.sort(rng.choice(rows, min(len(rows), self.nlist * sample_size_per_list), replace=False))]
+        centroids = sample[rng.choice(len(sample), self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = _nearest(sample, centroids, block)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=self.nlist) == 0
+            # Restart empty lists from random sample points
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+            centroids = _unit_rows(sums)
+        
+        lists = np.full(size, -1, dtype=np.int32)
+        for start in range(0, size, block):
+            lists[start:start + block] = _nearest(vectors[start:min(start + block, size)], centroids, block)
+        
+        with self._lock, self._write_lock():
+            self._sync()
+            if self._epoch != epoch:
+                logger.info(f"IVF store {self.directory} was retrained or compacted meanwhile; keeping that")
+                return
+            if self._size > size:
+                lists = np.concatenate([lists, _nearest(self._vectors[size:self._size], centroids, block)])
+            live = np.flatnonzero(self._alive[:self._size])
+            self._db.executemany(
+                "UPDATE records SET list = ? WHERE row = ?",
+                zip(lists[live].tolist(), live.tolist())
+            )
+            self._set_meta("trained_count", len(live))
+            # Other processes reload the lists and centroids on the new epoch
+            generation = self._next_generation(epoch=True)
+            self._db.execute("DELETE FROM tombstones")
+            tmp_path = self._centroids_path + ".tmp.npy"
+            np.save(tmp_path, centroids)
+            os.replace(tmp_path, self._centroids_path)
+            self._db.commit()
+            self._lists[:self._size] = lists
+            self._centroids = centroids
+            self._trained_count = len(live)
+            self._generation = generation
+        logger.info(f"IVF store trained: {self.nlist} lists over {len(live)} vectors")
+    
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return _nearest(vectors, self._centroids)
+    
+    def query(self, vector, k: int, where: Optional[Dict] = None, nprobe: Optional[int] = None) -> Dict[str, list]:
+        """
+        Nearest neighbours by cosine similarity
+        
+        Args:
+            vector: Query vector
+            k: Number of results
+            where: Metadata filter ({"field": value} or {"field": {"$in": [...]}}, optionally under "$and")
+            nprobe: Lists to scan (defaults to the store's nprobe)
+        
+        Returns:
+            Dict of "ids", "documents", "metadatas" and "distances" (1 - cosine), nearest first
+        """
+        with self._lock:
+            self._sync()
+            size = self._size
+            if self.dim is None or size == 0:
+                return {"ids": [], "documents": [], "metadatas": [], "distances": []}
+            vectors = self._vectors
+            codes = self._codes
+            mask = self._alive[:size].copy()
+            lists = self._lists[:size]
+            centroids = self._centroids
+            allowed = self._rows_where(where) if where else None
+        
+        query = _unit_rows([vector])[0]
+        if allowed is not None:
+            # The filter alone selects the partition; score it exactly
+            selected = np.zeros(size, dtype=bool)
+            selected[allowed[allowed < size]] = True
+            mask &= selected
+        elif centroids is not None:
+            probes = min(nprobe or self.nprobe, len(centroids))
+            probed = np.argpartition(-(centroids @ query), probes - 1)[:probes]
+            # Index 0 stands for list -1 (added since training), always scanned
+            scanned = np.zeros(len(centroids) + 1, dtype=bool)
+            scanned[0] = True
+            scanned[probed + 1] = True
+            mask &= scanned[lists + 1]
+        
+        rows = np.flatnonzero(mask)
+        if codes is not None and len(rows) > k:
+            # Shortlist on the quantized copy, then rank exactly in float32
+            rows, _ = _top_k(lambda selected: codes.scores(selected, query), rows, k * self.rescore_factor)
+        rows, scores = _top_k(lambda selected: vectors[selected] @ query, rows, k)
+        return self._records(rows, 1.0 - scores)
+    
+    def _records(self, rows: np.ndarray, distances: np.ndarray) -> Dict[str, list]:
+        """Fetch text and metadata of rows, keeping their order"""
+        rows = rows.tolist()
+        found = {}
+        with self._lock:
+            for batch in _batches(rows):
+                for row, chunk_id, document, metadata in self._db.execute(
+                    f"SELECT row, id, document, metadata FROM records WHERE row IN ({','.join('?' * len(batch))})",
+                    batch
+                ):
+                    found[row] = (chunk_id, document, json.loads(metadata) if metadata else {})
+        keep = [i for i, row in enumerate(rows) if row in found]
+        return {
+            "ids": [found[rows[i]][0] for i in keep],
+            "documents": [found[rows[i]][1] for i in keep],
+            "metadatas": [found[rows[i]][2] for i in keep],
+            "distances": [float(distances[i]) for i in keep]
+        }
+    
+    def _rows_where(self, where: Dict) -> np.ndarray:
+        """Rows whose metadata matches a filter, resolved with SQL"""
+        clause, params = _where_sql(where)
+        return np.fromiter(
+            (row for (row,) in self._db.execute(f"SELECT row FROM records WHERE {clause}", params)),
+            dtype=np.int64
+        )
+    
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include: Sequence[str] = ("documents", "metadatas")
+    ) -> Dict[str, list]:
+        """
+        Records by ID, by metadata filter, or page through all of them
+        
+        Returns:
+            Dict of "ids" plus each requested field of "documents",
+            "metadatas" and "embeddings"
+        """
+        with self._lock:
+            self._sync()
+            if ids is not None:
+                records = []
+                for batch in _batches(list(ids)):
+                    records.extend(self._db.execute(
+                        f"SELECT row, id, document, metadata FROM records WHERE id IN ({','.join('?' * len(batch))})",
+                        batch
+                    ))
+            else:
+                clause, params = _where_sql(where) if where else ("1", [])
+                records = self._db.execute(
+                    f"SELECT row, id, document, metadata FROM records WHERE {clause} ORDER BY row LIMIT ? OFFSET ?",
+                    [*params, -1 if limit is None else limit, offset]
+                ).fetchall()
+            vectors = self._vectors
+        
+        result = {"ids": [record[1] for record in records]}
+        if "documents" in include:
+            result["documents"] = [record[2] for record in records]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(record[3]) if record[3] else {} for record in records]
+        if "embeddings" in include:
+            rows = [record[0] for record in records]
+            result["embeddings"] = vectors[rows] if rows else np.zeros((0, self.dim or 0), dtype=np.float32)
+        return result
+    
+    def flush(self):
+        """Write mapped vector pages to disk"""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            if self._codes is not None:
+                self._codes.flush()
+    
+    def compact(self, block: int = 65536) -> int:
+        """
+        Rewrite the store without deleted rows
+        
+        Returns:
+            Number of records kept
+        """
+        with self._lock, self._write_lock():
+            self._sync()
+            if self.dim is None:
+                return 0
+            live = np.flatnonzero(self._alive[:self._size])
+            tmp_path = self._vectors_path + ".compact"
+            compacted = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=(max(len(live), 1), self.dim))
+            for start in range(0, len(live), block):
+                compacted[start:start + block] = self._vectors[live[start:start + block]]
+            compacted.flush()
+            del compacted
+            
+            # Renumber rows to match their new position in the vector file
+            self._db.execute("UPDATE records SET row = -1 - row")
+            self._db.executemany(
+                "UPDATE records SET row = ? WHERE row = ?",
+                [(new, -1 - int(old)) for new, old in enumerate(live)]
+            )
+            self._db.execute("DELETE FROM tombstones")
+            self._set_meta("next_row", len(live))
+            # Other processes reload the renumbered rows on the new epoch
+            self._next_generation(epoch=True)
+            
+            self._vectors.flush()
+            self._vectors = None
+            self._codes = None
+            os.replace(tmp_path, self._vectors_path)
+            # Rebuilt from the compacted float32 file by _load()
+            QuantizedVectors.remove(self.directory, self.dtype)
+            self._db.commit()
+            self._db.execute("VACUUM")
+            self._reset()
+            self._load()
+            return len(live)
+    
+    def close(self):
+        self.flush()
+        self._db.close()
+
+
+def _unit_rows(matrix) -> np.ndarray:
+    """Normalize rows to unit length as float32"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray, block: int = 65536) -> np.ndarray:
+    """Index of the most similar centroid for each vector"""
+    result = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        result[start:start + block] = np.argmax(np.asarray(vectors[start:start + block]) @ centroids.T, axis=1)
+    return result
+
+
+def _top_k(
+    score: Callable[[np.ndarray], np.ndarray],
+    rows: np.ndarray,
+    k: int,
+    block: int = 65536
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Highest-scoring rows, best first, with their scores (score(rows) gives one per row)"""
+    if len(rows) == 0:
+        return rows, np.zeros(0, dtype=np.float32)
+    scores = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), block):
+        scores[start:start + block] = score(rows[start:start + block])
+    if len(rows) > k:
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(rows))
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return rows[best], scores[best]
+
+
+def _where_sql(where: Dict) -> Tuple[str, list]:
+    """Translate a Chroma-style metadata filter into a SQL condition"""
+    if "$and" in where:
+        parts = [_where_sql(part) for part in where["$and"]]
+        return " AND ".join(f"({clause})" for clause, _ in parts), [p for _, params in parts for p in params]
+    if len(where) != 1:
+        return _where_sql({"$and": [{key: value} for key, value in where.items()]})
+    
+    (field, condition), = where.items()
+    if not _FIELD.match(field):
+        raise ValueError(f"Unsupported metadata field: {field}")
+    column = f"json_extract(metadata, '$.{field}')"
+    if isinstance(condition, dict):
+        (operator, value), = condition.items()
+        if operator == "$eq":
+            return f"{column} = ?", [value]
+        if operator == "$in":
+            if not value:
+                return "0", []
+            return f"{column} IN ({','.join('?' * len(value))})", list(value)
+        raise ValueError(f"Unsupported metadata operator: {operator}")
+    return f"{column} = ?", [condition]
+
+
+def _batches(items: list, size: int = 900):
+    """Split SQL parameters below SQLite's variable limit"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
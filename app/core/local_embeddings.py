@@ -1,19 +1,22 @@
 """
 Local embeddings using HuggingFace models (FREE, no API key needed)
 """
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def get_local_embeddings() -> HuggingFaceEmbeddings:
+def get_local_embeddings() -> Embeddings:
     """
     Get HuggingFace embeddings (runs locally, completely free)
     Model: sentence-transformers/all-MiniLM-L6-v2
+    
+    Imports sentence-transformers (and torch) on call, not at module import.
     """
     try:
+        from langchain_huggingface import HuggingFaceEmbeddings
         embeddings = HuggingFaceEmbeddings(
             model_name=settings.LOCAL_EMBEDDING_MODEL,
             model_kwargs={'device': 'cpu'},  # Use 'cuda' if you have GPU
@@ -2,39 +2,152 @@
 Local LLM alternative (FREE, no API key needed)
 Uses extractive QA approach
 """
-from typing import List
+from typing import Callable, Iterator, List, Optional
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+import re
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Sentence ends, plus line breaks that usually separate bullet points and headings
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n|\n(?=\s*[-•*\d])")
+_WORD = re.compile(r"\w+")
+
+
+def split_sentences(context: str, min_words: int = 3) -> List[str]:
+    """
+    Split context into candidate answer sentences, dropping fragments
+    
+    Overlapping chunks repeat sentences, so each (whitespace-normalized)
+    sentence is kept once, at its first occurrence.
+    """
+    sentences = {}
+    for part in _SENTENCE_BOUNDARY.split(context):
+        sentence = " ".join(part.split())
+        if len(_WORD.findall(sentence)) >= min_words:
+            sentences.setdefault(sentence, None)
+    return list(sentences)
+
+
+def _cosine(matrix: np.ndarray, vector: List[float]) -> np.ndarray:
+    """Cosine similarity of each row of matrix to vector"""
+    query = np.asarray(vector, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+    return (matrix @ query) / np.maximum(norms, 1e-12)
+
 
 class LocalLLM:
-    """Simple extractive QA without external API"""
+    """Extractive QA without external API: returns the context sentences closest to the question"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        chunk_vectors: Optional[Callable[[List[str], str], np.ndarray]] = None,
+        num_sentences: int = 3,
+        max_sentences: int = 32,
+        top_chunks: int = 3,
+        min_relative_score: float = 0.5
+    ):
         self.name = "Local Extractive QA"
+        self.embeddings = embeddings
+        self.chunk_vectors = chunk_vectors
+        self.num_sentences = num_sentences
+        self.max_sentences = max_sentences
+        self.top_chunks = top_chunks
+        self.min_relative_score = min_relative_score
     
-    def generate_answer(self, question: str, context: str) -> str:
+    def generate_answer(
+        self,
+        question: str,
+        context: str,
+        query_vector: Optional[List[float]] = None,
+        documents: Optional[List[Document]] = None,
+        collection_name: str = "documents"
+    ) -> str:
         """
-        Generate answer using simple extractive approach
+        Generate answer by ranking context sentences against the question
+        
+        Given the retrieved documents, chunks are first ranked by their
+        stored vectors (no model call) and only the sentences of the
+        top_chunks best are considered. At most max_sentences sentences are
+        embedded, in one batch. Without embeddings or a query vector,
+        sentences are ranked by word overlap instead.
+        Blocking when embeddings are used; call it from a worker thread.
         For production, you can integrate Ollama or other local LLMs
         """
         if not context or context.strip() == "":
             return "I don't have any document content to answer your question. Please upload a PDF document first."
         
-        # Simple extractive answer - find most relevant sentences
-        sentences = [s.strip() for s in context.split('.') if s.strip()]
+        if documents and query_vector is not None:
+            context = self._best_chunks(documents, query_vector, collection_name) or context
+        sentences = split_sentences(context)[:self.max_sentences]
         
         if not sentences:
             return "I found the document but couldn't extract meaningful content. The document might be empty or image-based."
         
-        # Return the most relevant context (first few sentences as answer)
-        # In a real system, you'd use a proper extractive QA model
-        num_sentences = min(3, len(sentences))
-        answer = '. '.join(sentences[:num_sentences]) + '.'
+        if len(sentences) <= self.num_sentences:
+            selected = sentences
+        else:
+            scores = self._score(question, sentences, query_vector)
+            top = np.argpartition(-scores, self.num_sentences - 1)[:self.num_sentences]
+            # Drop filler that scores far below the best match
+            best = scores[top].max()
+            if best > 0:
+                top = top[scores[top] >= best * self.min_relative_score]
+            # Keep document order so the answer reads naturally
+            selected = [sentences[i] for i in sorted(top)]
+        
+        answer = ' '.join(selected)
         
         return f"Based on the uploaded documents:\n\n{answer}\n\n(Note: Using local processing. For better answers, add OpenAI API key or use Ollama.)"
     
+    def _best_chunks(self, documents: List[Document], query_vector: List[float], collection_name: str) -> Optional[str]:
+        """Context of the top_chunks documents closest to the query by stored vector, in retrieval order"""
+        ids = [doc.id for doc in documents]
+        if self.chunk_vectors is None or len(documents) <= self.top_chunks or not all(ids):
+            return None
+        try:
+            scores = _cosine(self.chunk_vectors(ids, collection_name), query_vector)
+        except Exception as e:
+            logger.warning(f"Reading chunk vectors failed, using all retrieved chunks: {e}")
+            return None
+        top = np.argpartition(-scores, self.top_chunks - 1)[:self.top_chunks]
+        return "\n\n".join(documents[i].page_content for i in sorted(top))
+    
+    def _score(self, question: str, sentences: List[str], query_vector: Optional[List[float]]) -> np.ndarray:
+        """Cosine similarity of each sentence to the query, or word overlap as a fallback"""
+        if self.embeddings is not None and query_vector is not None:
+            try:
+                return _cosine(np.asarray(self.embeddings.embed_documents(sentences), dtype=np.float32), query_vector)
+            except Exception as e:
+                logger.warning(f"Sentence embedding failed, ranking by word overlap: {e}")
+        
+        question_words = set(_WORD.findall(question.lower()))
+        return np.array([
+            len(question_words.intersection(_WORD.findall(sentence.lower()))) / (1 + len(sentence) / 200)
+            for sentence in sentences
+        ], dtype=np.float32)
+    
+    def stream_answer(
+        self,
+        question: str,
+        context: str,
+        query_vector: Optional[List[float]] = None,
+        documents: Optional[List[Document]] = None,
+        collection_name: str = "documents"
+    ) -> Iterator[str]:
+        """
+        Yield the answer word by word (with trailing whitespace)
+        
+        The extractive answer is cheap to compute, so this mainly lets the
+        streaming endpoint share one code path with streaming LLMs.
+        """
+        answer = self.generate_answer(question, context, query_vector, documents, collection_name)
+        for token in re.findall(r"\S+\s*|\s+", answer):
+            yield token
+    
     def invoke(self, text: str) -> str:
         """LangChain-compatible invoke method"""
         return text  # For LCEL compatibility
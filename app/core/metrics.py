@@ -0,0 +1,203 @@
+"""
+Lightweight in-process metrics
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import threading
+import time
+
+# Buckets for request and pipeline stage durations, in seconds
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+
+class Histogram:
+    """Cumulative bucketed histogram (Prometheus-style)"""
+    
+    def __init__(self, name: str, description: str, buckets: Sequence[float], labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self.buckets: List[float] = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        """Record one observation"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+    
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile from the buckets
+        
+        Interpolates linearly within the bucket holding the quantile, like
+        Prometheus' histogram_quantile(). Values past the last bucket are
+        reported as its upper bound.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            count = self._count
+        if count == 0:
+            return 0.0
+        rank = q * count
+        running = 0
+        for index, bucket_count in enumerate(counts):
+            if running + bucket_count >= rank and bucket_count > 0:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - running) / bucket_count
+            running += bucket_count
+        return self.buckets[-1]
+    
+    def snapshot(self) -> Dict:
+        """Get count, sum, estimated percentiles and cumulative bucket counts"""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+            running += bucket_count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        
+        return {
+            "description": self.description,
+            "count": count,
+            "sum": round(total, 6),
+            "mean": round(total / count, 6) if count else 0.0,
+            "p50": round(self.quantile(0.5), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6),
+            "buckets": cumulative
+        }
+    
+    def render(self) -> List[str]:
+        """Prometheus text-format sample lines"""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        lines = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+            running += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(f"{self.name}_bucket{_format_labels({**self.labels, 'le': le})} {running}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registry of named histograms, one per distinct label set"""
+    
+    def __init__(self):
+        self._histograms: Dict[Tuple, Histogram] = {}
+        self._lock = threading.Lock()
+    
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        buckets: Sequence[float],
+        labels: Optional[Dict[str, str]] = None
+    ) -> Histogram:
+        """Get a histogram by name and labels, creating it on first use"""
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(name, description, buckets, labels)
+            return self._histograms[key]
+    
+    def snapshot(self, prefix: str = "") -> Dict[str, Dict]:
+        """Snapshot all histograms whose name starts with prefix"""
+        with self._lock:
+            histograms = list(self._histograms.values())
+        return {
+            h.name + _format_labels(h.labels): h.snapshot()
+            for h in histograms if h.name.startswith(prefix)
+        }
+    
+    def render_prometheus(self) -> str:
+        """All histograms in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        lines = []
+        previous = None
+        for (name, _), histogram in histograms:
+            if name != previous:
+                lines.append(f"# HELP {name} {histogram.description}")
+                lines.append(f"# TYPE {name} histogram")
+                previous = name
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+# Spans recorded while handling the current request, if anyone is collecting them
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+
+@contextmanager
+def span(operation: str, stage: str) -> Iterator[None]:
+    """
+    Time one stage of an operation
+    
+    The duration goes into the <operation>_stage_seconds{stage=...}
+    histogram and, inside collect_spans(), into the request's span list.
+    Code run in executor threads only reports to the request if it is run
+    in a copy of the request's context (contextvars.copy_context().run).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.histogram(
+            f"{operation}_stage_seconds",
+            f"Duration of {operation} pipeline stages",
+            LATENCY_BUCKETS,
+            {"stage": stage}
+        ).observe(elapsed)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((f"{operation}_{stage}", elapsed))
+
+
+@contextmanager
+def collect_spans() -> Iterator[List[Tuple[str, float]]]:
+    """Collect the spans recorded in this context (and tasks started from it)"""
+    spans: List[Tuple[str, float]] = []
+    token = _request_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _request_spans.reset(token)
+
+
+def server_timing(spans: List[Tuple[str, float]]) -> str:
+    """Format spans as a Server-Timing header value, summing repeated stages"""
+    totals: Dict[str, float] = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
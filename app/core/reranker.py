@@ -0,0 +1,197 @@
+"""
+Post-retrieval reranking: Maximal Marginal Relevance and cross-encoder stages
+"""
+from typing import Callable, List, Optional, Sequence, Tuple
+from langchain_core.documents import Document
+from app.core.metrics import metrics
+import threading
+import time
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RerankBudgetExceeded(Exception):
+    """Raised by a stage when the per-query time budget has run out"""
+
+
+class Candidates:
+    """Retrieved chunks being reranked, best first"""
+    
+    def __init__(
+        self,
+        ids: List[str],
+        documents: List[Document],
+        scores: Optional[np.ndarray] = None,
+        collection_name: str = "documents"
+    ):
+        self.ids = ids
+        self.documents = documents
+        self.collection_name = collection_name
+        # Relevance scores from the last stage that produced any, aligned with ids
+        self.scores = scores
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def reorder(self, order: Sequence[int], scores: Optional[np.ndarray] = None) -> "Candidates":
+        """Candidates in a new order (optionally a subset), with new scores if given"""
+        order = list(order)
+        if scores is None and self.scores is not None:
+            scores = self.scores[order]
+        return Candidates(
+            [self.ids[i] for i in order],
+            [self.documents[i] for i in order],
+            scores,
+            self.collection_name
+        )
+
+
+def _check_deadline(deadline: float):
+    if time.perf_counter() > deadline:
+        raise RerankBudgetExceeded()
+
+
+class MMRReranker:
+    """
+    Maximal Marginal Relevance over stored chunk embeddings
+    
+    Picks chunks that are relevant to the query but unlike the chunks
+    already picked, so overlapping neighbours of one passage don't fill
+    every slot. Needs no model call: candidate vectors are read back from
+    the vector store and all similarities come from two matrix products.
+    """
+    
+    name = "mmr"
+    
+    def __init__(self, get_embeddings: Callable[[List[str], str], np.ndarray], lambda_mult: float = 0.7):
+        self.get_embeddings = get_embeddings
+        self.lambda_mult = lambda_mult
+    
+    def rerank(self, question: str, query_vector: List[float], candidates: Candidates, k: int, deadline: float) -> Candidates:
+        vectors = _unit_rows(self.get_embeddings(candidates.ids, candidates.collection_name))
+        _check_deadline(deadline)
+        
+        if candidates.scores is not None:
+            # Use the previous stage's relevance, rescaled to [0, 1]
+            relevance = candidates.scores.astype(np.float32)
+            spread = relevance.max() - relevance.min()
+            relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+        else:
+            relevance = vectors @ _unit_rows(np.asarray([query_vector], dtype=np.float32))[0]
+        similarity = vectors @ vectors.T
+        
+        selected = [int(np.argmax(relevance))]
+        # Highest similarity of each candidate to anything selected so far
+        redundancy = similarity[selected[0]].copy()
+        available = np.ones(len(candidates), dtype=bool)
+        available[selected[0]] = False
+        while len(selected) < min(k, len(candidates)):
+            mmr = self.lambda_mult * relevance - (1 - self.lambda_mult) * redundancy
+            mmr[~available] = -np.inf
+            best = int(np.argmax(mmr))
+            selected.append(best)
+            available[best] = False
+            np.maximum(redundancy, similarity[best], out=redundancy)
+        
+        return candidates.reorder(selected)
+
+
+class CrossEncoderReranker:
+    """
+    Score (question, chunk) pairs with a small local cross-encoder
+    
+    The model is loaded on first use. Pairs are scored in batches and the
+    deadline is checked between batches, so one slow query can overrun
+    the budget by at most one batch.
+    """
+    
+    name = "cross_encoder"
+    
+    def __init__(self, model_name: str, batch_size: int = 16):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self._model = None
+        self._lock = threading.Lock()
+    
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+                    logger.info(f"Cross-encoder loaded: {self.model_name}")
+        return self._model
+    
+    def rerank(self, question: str, query_vector: List[float], candidates: Candidates, k: int, deadline: float) -> Candidates:
+        pairs = [(question, doc.page_content) for doc in candidates.documents]
+        scores = np.empty(len(pairs), dtype=np.float32)
+        for start in range(0, len(pairs), self.batch_size):
+            _check_deadline(deadline)
+            batch = pairs[start:start + self.batch_size]
+            scores[start:start + len(batch)] = self.model.predict(batch, batch_size=len(batch), show_progress_bar=False)
+        order = np.argsort(-scores, kind="stable")
+        return candidates.reorder(order, scores[order])
+
+
+class RerankingPipeline:
+    """
+    Run reranking stages in order within a per-query time budget
+    
+    If the budget runs out (or a stage fails), the un-reranked top-k is
+    returned so reranking can only ever cost the budget, never the answer.
+    """
+    
+    def __init__(self, stages: List, budget_ms: float = 150.0):
+        self.stages = stages
+        self.budget = budget_ms / 1000.0
+        self.fallbacks = 0
+        self.errors = 0
+        self._durations = metrics.histogram(
+            "rerank_seconds",
+            "Time spent reranking retrieved chunks per query",
+            [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+        )
+    
+    def rerank(self, question: str, query_vector: List[float], candidates: Candidates, k: int) -> Tuple[List[Document], bool]:
+        """
+        Rerank candidates and keep the top k
+        
+        Returns:
+            (documents, whether reranking completed)
+        """
+        started = time.perf_counter()
+        deadline = started + self.budget
+        reranked = candidates
+        try:
+            for stage in self.stages:
+                reranked = stage.rerank(question, query_vector, reranked, k, deadline)
+            return reranked.documents[:k], True
+        except RerankBudgetExceeded:
+            self.fallbacks += 1
+            logger.warning(f"Reranking exceeded {self.budget * 1000:.0f} ms budget, using retrieval order")
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Reranking failed, using retrieval order: {e}")
+        finally:
+            self._durations.observe(time.perf_counter() - started)
+        return candidates.documents[:k], False
+    
+    def stats(self) -> dict:
+        """Stage names, budget, fallback counts and latency histogram"""
+        return {
+            "stages": [stage.name for stage in self.stages],
+            "budget_ms": self.budget * 1000,
+            "fallbacks": self.fallbacks,
+            "errors": self.errors,
+            "seconds": self._durations.snapshot()
+        }
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normalize rows to unit length as float32"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
@@ -0,0 +1,154 @@
+"""
+Hybrid retrieval: vector similarity fused with BM25 keyword search
+"""
+from typing import List, Optional
+from langchain_core.documents import Document
+from app.core.vector_store import document_filter, vector_store_manager
+from app.core.bm25_index import reciprocal_rank_fusion
+from app.core.metrics import span
+from app.core.reranker import Candidates, CrossEncoderReranker, MMRReranker, RerankingPipeline
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HybridRetriever:
+    """
+    Retrieve chunks by vector similarity and BM25, fused with reciprocal rank fusion
+    
+    Vector search finds paraphrases; BM25 finds exact terms such as names,
+    IDs and part numbers that embeddings blur together. Each ranking
+    contributes weight / (rrf_k + rank) per chunk, so neither score scale
+    has to be calibrated against the other.
+    
+    With a reranker, rerank_candidates chunks are fetched and the reranker
+    picks the final k from them. A document_ids restriction is applied
+    inside both searches rather than to their results, so the candidate
+    pool is never emptied by chunks of other documents.
+    """
+    
+    def __init__(
+        self,
+        candidates: int = 20,
+        rrf_k: int = 60,
+        reranker: Optional[RerankingPipeline] = None,
+        rerank_candidates: int = 20
+    ):
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+    
+    def retrieve(
+        self,
+        question: str,
+        query_vector: List[float],
+        k: Optional[int] = None,
+        vector_weight: Optional[float] = None,
+        keyword_weight: Optional[float] = None,
+        collection_name: str = "documents",
+        document_ids: Optional[List[str]] = None
+    ) -> List[Document]:
+        """
+        Get the top-k chunks for a question
+        
+        Args:
+            question: Raw question text (for keyword search)
+            query_vector: Question embedding (for vector search)
+            k: Number of chunks to return
+            vector_weight: Weight of the vector ranking (0 disables it)
+            keyword_weight: Weight of the BM25 ranking (0 disables it)
+            collection_name: Collection to search
+            document_ids: Only search chunks of these documents
+        
+        Returns:
+            Documents, best first
+        """
+        k = k or settings.RETRIEVAL_K
+        vector_weight = settings.HYBRID_VECTOR_WEIGHT if vector_weight is None else vector_weight
+        keyword_weight = settings.HYBRID_KEYWORD_WEIGHT if keyword_weight is None else keyword_weight
+        if not settings.HYBRID_SEARCH:
+            keyword_weight = 0.0
+        fetch = max(k, self.rerank_candidates) if self.reranker is not None else k
+        where = document_filter(document_ids)
+        
+        # Pure vector search needs no candidate pool or fusion
+        if keyword_weight <= 0:
+            with span("retrieval", "vector_search"):
+                hits = vector_store_manager.search_by_vector(query_vector, fetch, collection_name, where)
+            return self._rerank(question, query_vector, [chunk_id for chunk_id, _ in hits], dict(hits), k, collection_name)
+        
+        pool = max(fetch, self.candidates)
+        documents = {}
+        vector_ranking = []
+        if vector_weight > 0:
+            with span("retrieval", "vector_search"):
+                for chunk_id, doc in vector_store_manager.search_by_vector(query_vector, pool, collection_name, where):
+                    documents[chunk_id] = doc
+                    vector_ranking.append(chunk_id)
+        with span("retrieval", "keyword_search"):
+            keyword_ranking = [
+                chunk_id for chunk_id, _ in
+                vector_store_manager.get_keyword_index(collection_name).search(question, pool, groups=document_ids)
+            ]
+        
+        fused = reciprocal_rank_fusion(
+            [vector_ranking, keyword_ranking],
+            [vector_weight, keyword_weight],
+            k=self.rrf_k
+        )[:fetch]
+        
+        # Keyword-only hits still need their text
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in documents]
+        if missing:
+            with span("retrieval", "fetch_documents"):
+                documents.update(vector_store_manager.get_documents(missing, collection_name))
+        
+        logger.debug(
+            f"Hybrid retrieval: {len(vector_ranking)} vector + {len(keyword_ranking)} keyword "
+            f"candidates -> {len(fused)} chunks"
+        )
+        ids = [chunk_id for chunk_id, _ in fused if chunk_id in documents]
+        return self._rerank(question, query_vector, ids, documents, k, collection_name)
+    
+    def _rerank(
+        self,
+        question: str,
+        query_vector: List[float],
+        ids: List[str],
+        documents: dict,
+        k: int,
+        collection_name: str
+    ) -> List[Document]:
+        """Let the reranker pick the top k, if there is one and anything to choose from"""
+        if self.reranker is None or len(ids) <= 1:
+            return [documents[chunk_id] for chunk_id in ids[:k]]
+        candidates = Candidates(ids, [documents[chunk_id] for chunk_id in ids], collection_name=collection_name)
+        with span("retrieval", "rerank"):
+            reranked, _ = self.reranker.rerank(question, query_vector, candidates, k)
+        return reranked
+
+
+def build_reranker() -> Optional[RerankingPipeline]:
+    """Create the reranking pipeline configured in RERANKERS (None if empty)"""
+    stages = []
+    for name in filter(None, (part.strip() for part in settings.RERANKERS.split(","))):
+        if name == "mmr":
+            stages.append(MMRReranker(vector_store_manager.get_embeddings, lambda_mult=settings.MMR_LAMBDA))
+        elif name == "cross_encoder":
+            stages.append(CrossEncoderReranker(settings.CROSS_ENCODER_MODEL, batch_size=settings.CROSS_ENCODER_BATCH_SIZE))
+        else:
+            raise ValueError(f"Unknown reranker: {name}")
+    if not stages:
+        return None
+    return RerankingPipeline(stages, budget_ms=settings.RERANK_BUDGET_MS)
+
+
+# Global hybrid retriever instance
+hybrid_retriever = HybridRetriever(
+    candidates=settings.HYBRID_CANDIDATES,
+    rrf_k=settings.RRF_K,
+    reranker=build_reranker(),
+    rerank_candidates=settings.RERANK_CANDIDATES
+)
@@ -0,0 +1,131 @@
+"""
+Recent turns of chat sessions, and follow-up question condensation
+"""
+from collections import OrderedDict, deque
+from typing import Deque, List, NamedTuple, Optional
+import re
+import threading
+
+# Phrases and pronouns that make a question depend on the previous turn
+_FOLLOW_UP = re.compile(
+    r"^\s*(?:and|also|so|then|what about|how about|what else|tell me more|more about|why|how come)\b"
+    r"|\b(?:he|him|his|she|her|hers|it|its|they|them|their|theirs|this|that|these|those|same|above)\b",
+    re.IGNORECASE
+)
+_WORD = re.compile(r"[A-Za-z0-9][A-Za-z0-9'_-]*")
+
+STOPWORDS = frozenset("""
+a about above after all also am an and any are as at be been being but by can could did do does doing
+else for from had has have having he her here hers him his how i if in into is it its me more most my
+no not of on or our please same she should so some tell than that the their theirs them then there
+these they this those to too was we were what when where which who whom whose why will with would
+you your
+""".split())
+
+
+class Turn(NamedTuple):
+    """One question and answer of a session"""
+    question: str
+    standalone: str  # The question as used for retrieval (condensed if it was a follow-up)
+    answer: str
+
+
+def is_follow_up(question: str) -> bool:
+    """Whether a question probably refers back to the conversation"""
+    return bool(_FOLLOW_UP.search(question)) or len(_WORD.findall(question)) <= 2
+
+
+def condense_question(question: str, turns: List[Turn], max_terms: int = 12) -> str:
+    """
+    Make a follow-up question self-contained for retrieval
+    
+    Appends the content words of the previous turn's standalone question,
+    so "what about his education?" after "What is John Smith's work
+    experience?" is searched as "what about his education? (John Smith
+    work experience)". Questions that don't look like follow-ups are
+    returned unchanged.
+    """
+    if not turns or not is_follow_up(question):
+        return question
+    seen = {_term(word) for word in _WORD.findall(question)}
+    terms = []
+    for word in _WORD.findall(turns[-1].standalone):
+        key = _term(word)
+        if key not in STOPWORDS and key not in seen:
+            seen.add(key)
+            terms.append(word[:-2] if word.lower().endswith("'s") else word)
+    if not terms:
+        return question
+    return f"{question} ({' '.join(terms[:max_terms])})"
+
+
+def _term(word: str) -> str:
+    word = word.lower()
+    return word[:-2] if word.endswith("'s") else word
+
+
+class SessionMemory:
+    """
+    Ring buffer of the last max_turns turns per session, for max_sessions sessions
+    
+    Sessions are evicted least recently used first. get() returns None for
+    a session that isn't in memory (new, evicted, or from before a restart),
+    so the caller can load it from MongoDB once; loading an empty list
+    remembers that the session has no turns, so after that, lookups never
+    leave the process. Answers are truncated to answer_chars.
+    """
+    
+    def __init__(self, max_sessions: int = 1000, max_turns: int = 1, answer_chars: int = 500):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.answer_chars = answer_chars
+        self.hits = 0
+        self.misses = 0
+        self._sessions: "OrderedDict[str, Deque[Turn]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, session_id: str) -> Optional[List[Turn]]:
+        """Recent turns of a session, oldest first, or None if it isn't in memory"""
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is None:
+                self.misses += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return list(turns)
+    
+    def load(self, session_id: str, turns: List[Turn]):
+        """Put a session loaded from storage into memory (turns oldest first)"""
+        with self._lock:
+            if session_id not in self._sessions:
+                self._store(session_id, deque(turns[-self.max_turns:], maxlen=self.max_turns))
+    
+    def append(self, session_id: str, question: str, standalone: str, answer: str):
+        """Record a turn"""
+        turn = Turn(question, standalone, answer[:self.answer_chars])
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is None:
+                self._store(session_id, deque([turn], maxlen=self.max_turns))
+            else:
+                turns.append(turn)
+                self._sessions.move_to_end(session_id)
+    
+    def _store(self, session_id: str, turns: Deque[Turn]):
+        self._sessions[session_id] = turns
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+    
+    def stats(self) -> dict:
+        """Session count and hit rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "max_turns": self.max_turns,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
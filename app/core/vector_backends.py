@@ -0,0 +1,254 @@
+"""
+Vector store backends: Chroma, or an in-process IVF index over memory-mapped files
+"""
+from langchain_core.embeddings import Embeddings
+from app.core.ivf_store import IVFStore
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+import os
+import shutil
+import sqlite3
+import uuid
+import logging
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+logger = logging.getLogger(__name__)
+
+
+def _is_uuid(name: str) -> bool:
+    """Whether a directory name looks like a Chroma segment ID"""
+    try:
+        uuid.UUID(name)
+        return True
+    except ValueError:
+        return False
+
+
+def disk_usage(path: str) -> int:
+    """Total bytes of the files under a directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+class VectorBackend:
+    """
+    Storage and nearest-neighbour search for one collection of chunks
+    
+    Vectors are computed by the caller. Results use Chroma's dict layout
+    ("ids", "documents", "metadatas", "embeddings", "distances") with flat
+    lists, and metadata filters use Chroma's where syntax.
+    """
+    
+    name = "base"
+    
+    # Directory whose size compact() reports
+    directory: str = ""
+    
+    def count(self) -> int:
+        raise NotImplementedError
+    
+    def add(self, ids: List[str], vectors, documents: List[str], metadatas: List[Optional[Dict]]):
+        """Add records, replacing existing records with the same IDs"""
+        raise NotImplementedError
+    
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+    
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include: Sequence[str] = ("documents", "metadatas")
+    ) -> Dict[str, list]:
+        """Records by ID, by metadata filter, or a page of all of them"""
+        raise NotImplementedError
+    
+    def query(self, vector: List[float], k: int, where: Optional[Dict] = None) -> Dict[str, list]:
+        """The k nearest records, nearest first"""
+        raise NotImplementedError
+    
+    def flush(self):
+        """Persist anything buffered in memory"""
+    
+    def compact(self, batch_size: int = 1000) -> int:
+        """Reclaim space left by deleted records; returns the number kept"""
+        raise NotImplementedError
+
+
+class ChromaBackend(VectorBackend):
+    """
+    Chroma collection (HNSW index with Chroma's default parameters)
+    
+    The LangChain wrapper is kept as `store` for code that wants a
+    LangChain vector store; reads and writes go to the raw collection.
+    """
+    
+    name = "chroma"
+    
+    def __init__(self, collection_name: str, persist_directory: str, embeddings: Embeddings):
+        self.collection_name = collection_name
+        self.directory = persist_directory
+        self.embeddings = embeddings
+        self.store = self._open()
+    
+    def _open(self) -> "Chroma":
+        # chromadb takes over a second to import, so it is loaded on first use
+        from langchain_chroma import Chroma
+        return Chroma(
+            collection_name=self.collection_name,
+            embedding_function=self.embeddings,
+            persist_directory=self.directory
+        )
+    
+    def count(self) -> int:
+        return self.store._collection.count()
+    
+    def add(self, ids: List[str], vectors, documents: List[str], metadatas: List[Optional[Dict]]):
+        self.store._collection.upsert(
+            ids=list(ids),
+            embeddings=[list(vector) for vector in vectors],
+            documents=list(documents),
+            # Chroma rejects empty metadata dicts but accepts None
+            metadatas=[metadata or None for metadata in metadatas]
+        )
+    
+    def delete(self, ids: List[str]):
+        if ids:
+            self.store.delete(ids=list(ids))
+    
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include: Sequence[str] = ("documents", "metadatas")
+    ) -> Dict[str, list]:
+        return self.store._collection.get(
+            ids=list(ids) if ids is not None else None,
+            where=where,
+            limit=limit,
+            offset=offset or None,
+            include=list(include)
+        )
+    
+    def query(self, vector: List[float], k: int, where: Optional[Dict] = None) -> Dict[str, list]:
+        result = self.store._collection.query(
+            query_embeddings=[vector],
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        return {key: result[key][0] for key in ("ids", "documents", "metadatas", "distances")}
+    
+    def compact(self, batch_size: int = 1000) -> int:
+        """
+        Copy the collection into a fresh one and vacuum the store
+        
+        Chroma only marks deleted vectors as removed in its HNSW index, so
+        the copy (which gets a new, dense index) is swapped in under the
+        original name.
+        """
+        client = self.store._client
+        source = self.store._collection
+        count = source.count()
+        
+        tmp_name = f"{self.collection_name}__compact"
+        try:
+            client.delete_collection(tmp_name)
+        except Exception:
+            pass  # No leftover from an interrupted run
+        target = client.create_collection(tmp_name, metadata=source.metadata, embedding_function=None)
+        
+        for offset in range(0, count, batch_size):
+            batch = source.get(
+                limit=batch_size,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            if batch["ids"]:
+                target.add(
+                    ids=batch["ids"],
+                    embeddings=batch["embeddings"],
+                    documents=batch["documents"],
+                    metadatas=batch["metadatas"]
+                )
+        
+        # Swap the compacted copy in under the original name
+        client.delete_collection(self.collection_name)
+        target.modify(name=self.collection_name)
+        self.store = self._open()
+        
+        self._vacuum()
+        return count
+    
+    def _vacuum(self):
+        """Remove index directories of dropped segments and vacuum Chroma's SQLite file"""
+        sqlite_path = os.path.join(self.directory, "chroma.sqlite3")
+        if not os.path.exists(sqlite_path):
+            return
+        conn = sqlite3.connect(sqlite_path)
+        try:
+            live_segments = {row[0] for row in conn.execute("SELECT id FROM segments")}
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        
+        # Chroma leaves the HNSW files of deleted collections on disk
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isdir(path) and _is_uuid(name) and name not in live_segments:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+class IVFBackend(VectorBackend):
+    """In-process IVF index (see IVFStore) in <directory>/<collection>/"""
+    
+    name = "ivf"
+    
+    def __init__(
+        self,
+        collection_name: str,
+        directory: str,
+        nlist: int = 1024,
+        nprobe: int = 32,
+        dtype: str = "float32",
+        rescore_factor: int = 4
+    ):
+        self.collection_name = collection_name
+        self.directory = os.path.join(directory, collection_name)
+        self.index = IVFStore(self.directory, nlist=nlist, nprobe=nprobe, dtype=dtype, rescore_factor=rescore_factor)
+    
+    def count(self) -> int:
+        return len(self.index)
+    
+    def add(self, ids: List[str], vectors, documents: List[str], metadatas: List[Optional[Dict]]):
+        self.index.add(ids, vectors, documents, metadatas)
+    
+    def delete(self, ids: List[str]):
+        self.index.delete(ids)
+    
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include: Sequence[str] = ("documents", "metadatas")
+    ) -> Dict[str, list]:
+        return self.index.get(ids=ids, where=where, limit=limit, offset=offset, include=include)
+    
+    def query(self, vector: List[float], k: int, where: Optional[Dict] = None) -> Dict[str, list]:
+        return self.index.query(vector, k, where=where)
+    
+    def flush(self):
+        self.index.flush()
+    
+    def compact(self, batch_size: int = 1000) -> int:
+        return self.index.compact()
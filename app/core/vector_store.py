@@ -1,63 +1,446 @@
 """
-ChromaDB vector store initialization and management
+Vector store initialization and management
 """
-from langchain_chroma import Chroma
-from app.core.config import settings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.core.config import WORKSPACE_PATTERN, settings
+from app.core.bm25_index import BM25Index
+from app.core.vector_backends import ChromaBackend, IVFBackend, VectorBackend, disk_usage
+from app.utils.file_lock import SharedCounter
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 import os
+import re
+import threading
+import uuid
+import numpy as np
 import logging
 
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
 logger = logging.getLogger(__name__)
 
+_WORKSPACE = re.compile(WORKSPACE_PATTERN)
+
+
+def collection_for_workspace(workspace: Optional[str] = None) -> str:
+    """
+    Chroma collection that holds a workspace's chunks
+    
+    The default workspace keeps the original "documents" collection so
+    existing stores need no migration.
+    
+    Raises:
+        ValueError: If the workspace name is not allowed
+    """
+    workspace = workspace or settings.DEFAULT_WORKSPACE
+    if workspace == settings.DEFAULT_WORKSPACE:
+        return "documents"
+    if not _WORKSPACE.match(workspace):
+        raise ValueError(
+            "Workspace names must be 1-48 letters, digits, '-' or '_' "
+            "and start and end with a letter or digit"
+        )
+    return f"ws_{workspace}"
+
+
+def document_filter(document_ids: Optional[List[str]]) -> Optional[Dict]:
+    """Chroma metadata filter matching chunks of the given documents (None for all)"""
+    if document_ids is None:
+        return None
+    if len(document_ids) == 1:
+        return {"document_id": document_ids[0]}
+    return {"document_id": {"$in": list(document_ids)}}
+
 
 class VectorStoreManager:
-    """Manage ChromaDB vector store operations"""
+    """
+    Manage vector store operations
+    
+    Collections are stored by the backend chosen with VECTOR_BACKEND:
+    Chroma, or the in-process IVF index (tunable nlist/nprobe, vectors in
+    memory-mapped files).
+    """
     
     def __init__(self):
-        self.persist_directory = settings.CHROMA_DIR
+        self.backend_name = settings.VECTOR_BACKEND
+        self.persist_directory = settings.CHROMA_DIR if self.backend_name == "chroma" else settings.VECTOR_DIR
+        
+        # Use local embeddings (FREE) or OpenAI embeddings. The model itself is
+        # loaded on first use or by warm_up(), not at import time.
+        self.use_local = settings.USE_LOCAL_MODELS or not settings.OPENAI_API_KEY
+        self.model_name = settings.LOCAL_EMBEDDING_MODEL if self.use_local else settings.EMBEDDING_MODEL
+        self._embeddings: Optional[Embeddings] = None
+        self._model_embeddings: Optional[Embeddings] = None
+        self._embeddings_lock = threading.Lock()
+        self.batcher = None
+        self.embedding_cache = None
+        
+        # One long-lived backend per collection. Chroma handles all share the
+        # same persistent client, so writes made through them are visible to
+        # every subsequent query without reopening the store.
+        self._stores: Dict[str, VectorBackend] = {}
+        self._lock = threading.Lock()
+        
+        # BM25 keyword index per collection, kept in sync with every write
+        self.keyword_index_dir = settings.BM25_DIR
+        self._keyword_indexes: Dict[str, BM25Index] = {}
+        self._keyword_lock = threading.Lock()
+        
+        self._ensure_directory()
+        
+        # Bumped on every write so caches of derived results can expire. It
+        # lives next to the store, so writes by other workers and by the
+        # maintenance scripts expire this process's caches too.
+        self._corpus_version = SharedCounter(os.path.join(self.persist_directory, "corpus_version"))
+    
+    @property
+    def corpus_version(self) -> int:
+        """Write counter of the store, shared by every process that uses it"""
+        return self._corpus_version.value
+    
+    def _ensure_directory(self):
+        """Ensure the vector store directory exists"""
+        os.makedirs(self.persist_directory, exist_ok=True)
+    
+    @property
+    def embeddings(self) -> Embeddings:
+        """Embedding pipeline, loading the model on first access"""
+        if self._embeddings is None:
+            with self._embeddings_lock:
+                if self._embeddings is None:
+                    self._embeddings = self._load_embeddings()
+        return self._embeddings
+    
+    @property
+    def model_embeddings(self) -> Embeddings:
+        """
+        Embedding pipeline without the persistent cache
         
-        # Use local embeddings (FREE) or OpenAI embeddings
-        if settings.USE_LOCAL_MODELS or not settings.OPENAI_API_KEY:
+        For one-off texts (e.g. answer sentences) that would only evict
+        chunk vectors from the cache.
+        """
+        embeddings = self.embeddings
+        return self._model_embeddings or embeddings
+    
+    def _load_embeddings(self) -> Embeddings:
+        """Load the embedding model and wrap it in the batcher and cache"""
+        if self.use_local:
             from app.core.local_embeddings import get_local_embeddings
-            self.embeddings = get_local_embeddings()
+            embeddings = get_local_embeddings()
             logger.info("Using FREE local embeddings (no API key needed)")
         else:
             from langchain_openai import OpenAIEmbeddings
-            self.embeddings = OpenAIEmbeddings(
+            embeddings = OpenAIEmbeddings(
                 model=settings.EMBEDDING_MODEL,
                 openai_api_key=settings.OPENAI_API_KEY
             )
             logger.info("Using OpenAI embeddings")
         
-        self._ensure_directory()
+        # Share forward passes across concurrent queries and ingestion jobs
+        if settings.EMBEDDING_BATCHING:
+            from app.core.embedding_batcher import EmbeddingBatcher
+            self.batcher = EmbeddingBatcher(
+                embeddings,
+                max_batch_size=settings.EMBEDDING_MAX_BATCH_SIZE,
+                max_wait_ms=settings.EMBEDDING_MAX_WAIT_MS
+            )
+            embeddings = self.batcher
+        
+        self._model_embeddings = embeddings
+        
+        # Skip the model entirely for chunks we've embedded before
+        if settings.EMBEDDING_CACHE:
+            from app.core.embedding_cache import EmbeddingCache, CachedEmbeddings
+            self.embedding_cache = EmbeddingCache(
+                settings.EMBEDDING_CACHE_PATH,
+                self.model_name,
+                max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
+            )
+            embeddings = CachedEmbeddings(embeddings, self.embedding_cache)
+        
+        return embeddings
     
-    def _ensure_directory(self):
-        """Ensure ChromaDB directory exists"""
-        os.makedirs(self.persist_directory, exist_ok=True)
+    def warm_up(self, collection_name: str = "documents"):
+        """
+        Load the embedding model, open the store and load the keyword index
+        
+        Blocking; run it in a worker thread. Everything it touches would
+        otherwise be loaded by the first request.
+        """
+        embeddings = self.embeddings
+        if self.use_local:
+            # The first forward pass is much slower than later ones
+            embeddings.embed_query("warm up")
+        self.get_backend(collection_name)
+        self.get_keyword_index(collection_name)
     
-    def get_vector_store(self, collection_name: str = "documents") -> Chroma:
-        """Get or create a vector store"""
-        try:
-            vector_store = Chroma(
-                collection_name=collection_name,
-                embedding_function=self.embeddings,
-                persist_directory=self.persist_directory
+    @property
+    def is_ready(self) -> bool:
+        """Whether the embedding model is loaded and the default store is open"""
+        return self._embeddings is not None and "documents" in self._stores
+    
+    def get_backend(self, collection_name: str = "documents") -> VectorBackend:
+        """Get the cached backend for a collection, creating it on first use"""
+        backend = self._stores.get(collection_name)
+        if backend is not None:
+            return backend
+        
+        with self._lock:
+            # Another thread may have created it while we waited
+            backend = self._stores.get(collection_name)
+            if backend is not None:
+                return backend
+            try:
+                backend = self._create_backend(collection_name)
+                self._stores[collection_name] = backend
+                logger.info(f"Vector store initialized: {collection_name} ({backend.name})")
+                return backend
+            except Exception as e:
+                logger.error(f"Error initializing vector store: {e}")
+                raise
+    
+    def _create_backend(self, collection_name: str) -> VectorBackend:
+        if self.backend_name == "chroma":
+            return ChromaBackend(collection_name, self.persist_directory, self.embeddings)
+        if self.backend_name == "ivf":
+            return IVFBackend(
+                collection_name,
+                self.persist_directory,
+                nlist=settings.IVF_NLIST,
+                nprobe=settings.IVF_NPROBE,
+                dtype=settings.IVF_VECTOR_DTYPE,
+                rescore_factor=settings.IVF_RESCORE_FACTOR
             )
-            logger.info(f"Vector store initialized: {collection_name}")
-            return vector_store
-        except Exception as e:
-            logger.error(f"Error initializing vector store: {e}")
-            raise
+        raise ValueError(f"Unknown vector backend: {self.backend_name}")
+    
+    def get_vector_store(self, collection_name: str = "documents") -> "Chroma":
+        """LangChain Chroma store of a collection (Chroma backend only)"""
+        backend = self.get_backend(collection_name)
+        if not isinstance(backend, ChromaBackend):
+            raise ValueError(f"The {backend.name} backend has no LangChain vector store")
+        return backend.store
+    
+    def invalidate(self, collection_name: Optional[str] = None):
+        """
+        Drop cached backends so the next call reopens them
+        
+        Only needed when the persisted store was changed outside this
+        process (e.g. by a script) or a collection was deleted/recreated.
+        
+        Args:
+            collection_name: Collection to drop, or None to drop all
+        """
+        with self._lock:
+            if collection_name is None:
+                dropped = list(self._stores.values())
+                self._stores.clear()
+            else:
+                dropped = [self._stores.pop(collection_name)] if collection_name in self._stores else []
+        for backend in dropped:
+            backend.flush()
+        logger.info(f"Vector store cache invalidated: {collection_name or 'all collections'}")
     
-    def add_documents(self, documents, collection_name: str = "documents"):
-        """Add documents to vector store"""
+    def add_documents(self, documents, collection_name: str = "documents", ids: Optional[List[str]] = None):
+        """
+        Add documents to vector store
+        
+        Args:
+            documents: Chunks to embed and store
+            collection_name: Target collection
+            ids: Optional chunk IDs; existing chunks with the same IDs are replaced
+        """
         try:
-            vector_store = self.get_vector_store(collection_name)
-            vector_store.add_documents(documents)
+            if ids is None:
+                ids = [str(uuid.uuid4()) for _ in documents]
+            backend = self.get_backend(collection_name)
+            texts = [doc.page_content for doc in documents]
+            backend.add(ids, self.embeddings.embed_documents(texts), texts, [doc.metadata for doc in documents])
+            keyword_index = self.get_keyword_index(collection_name)
+            keyword_index.add(ids, texts, [doc.metadata.get("document_id", "") for doc in documents])
+            keyword_index.save_if_due(self._keyword_index_path(collection_name), settings.BM25_SAVE_INTERVAL_SECONDS)
+            self._bump_corpus_version()
             logger.info(f"Added {len(documents)} documents to vector store")
-            return vector_store
+            return backend
         except Exception as e:
             logger.error(f"Error adding documents to vector store: {e}")
+            # The handle may be broken (e.g. collection removed underneath us)
+            self.invalidate(collection_name)
+            raise
+    
+    def delete(self, ids: Optional[List[str]] = None, collection_name: str = "documents", where: Optional[Dict] = None):
+        """
+        Delete chunks by ID or metadata filter in one bulk operation
+        
+        Args:
+            ids: Chunk IDs to delete
+            collection_name: Collection to delete from
+            where: Metadata filter, e.g. {"source": file_path}
+        """
+        if not ids and not where:
+            return
+        try:
+            backend = self.get_backend(collection_name)
+            if not ids:
+                # Resolve the filter so the keyword index can drop the same chunks
+                ids = backend.get(where=where, include=[])["ids"]
+            if ids:
+                backend.delete(list(ids))
+            keyword_index = self.get_keyword_index(collection_name)
+            keyword_index.delete(ids)
+            keyword_index.save_if_due(self._keyword_index_path(collection_name), settings.BM25_SAVE_INTERVAL_SECONDS)
+            self._bump_corpus_version()
+            logger.info(f"Deleted {len(ids) if ids else 'matching'} documents from vector store")
+        except Exception as e:
+            logger.error(f"Error deleting documents from vector store: {e}")
+            self.invalidate(collection_name)
             raise
+    
+    def search_by_vector(
+        self,
+        query_vector: List[float],
+        k: int = 4,
+        collection_name: str = "documents",
+        where: Optional[Dict] = None
+    ) -> List[Tuple[str, Document]]:
+        """
+        Similarity search returning chunk IDs with the documents
+        
+        Args:
+            query_vector: Query embedding
+            k: Number of results
+            collection_name: Collection to search
+            where: Metadata filter applied inside the search, e.g. document_filter(ids)
+            
+        Returns:
+            (chunk ID, Document) pairs, most similar first
+        """
+        result = self.get_backend(collection_name).query(query_vector, k, where)
+        return [
+            (chunk_id, Document(id=chunk_id, page_content=text or "", metadata=metadata or {}))
+            for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        ]
+    
+    def get_documents(self, ids: List[str], collection_name: str = "documents") -> Dict[str, Document]:
+        """
+        Fetch chunks by ID
+        
+        Returns:
+            Mapping of chunk ID to Document (missing IDs are left out)
+        """
+        if not ids:
+            return {}
+        result = self.get_backend(collection_name).get(ids=list(ids), include=["documents", "metadatas"])
+        return {
+            chunk_id: Document(id=chunk_id, page_content=text or "", metadata=metadata or {})
+            for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        }
+    
+    def get_embeddings(self, ids: List[str], collection_name: str = "documents") -> np.ndarray:
+        """
+        Read stored chunk vectors back from the store (no model call)
+        
+        Returns:
+            Matrix with one row per ID, in the order given
+        """
+        result = self.get_backend(collection_name).get(ids=list(ids), include=["embeddings"])
+        rows = {chunk_id: row for row, chunk_id in enumerate(result["ids"])}
+        vectors = np.asarray(result["embeddings"], dtype=np.float32)
+        return vectors[[rows[chunk_id] for chunk_id in ids]]
+    
+    def _keyword_index_path(self, collection_name: str) -> str:
+        return os.path.join(self.keyword_index_dir, f"{collection_name}.npz")
+    
+    def get_keyword_index(self, collection_name: str = "documents") -> BM25Index:
+        """
+        Get the BM25 index of a collection
+        
+        Loaded from disk on first use. It is rebuilt from the vector store
+        only if the saved file is missing or out of sync (e.g. after a crash
+        before the last save or a write by another process).
+        """
+        index = self._keyword_indexes.get(collection_name)
+        if index is not None:
+            return index
+        
+        with self._keyword_lock:
+            index = self._keyword_indexes.get(collection_name)
+            if index is not None:
+                return index
+            
+            path = self._keyword_index_path(collection_name)
+            count = self.get_backend(collection_name).count()
+            if os.path.exists(path):
+                try:
+                    index = BM25Index.load(path)
+                except Exception as e:
+                    logger.warning(f"Could not load BM25 index {path}: {e}")
+            if index is None or len(index) != count:
+                index = self._build_keyword_index(collection_name)
+                index.save(path)
+            self._keyword_indexes[collection_name] = index
+            logger.info(f"BM25 index ready: {collection_name} ({len(index)} chunks)")
+            return index
+    
+    def _build_keyword_index(self, collection_name: str, batch_size: int = 1000) -> BM25Index:
+        """Index every chunk currently in the vector store"""
+        logger.info(f"Rebuilding BM25 index for {collection_name}...")
+        index = BM25Index()
+        backend = self.get_backend(collection_name)
+        offset = 0
+        while True:
+            batch = backend.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+            if not batch["ids"]:
+                break
+            index.add(
+                batch["ids"],
+                [text or "" for text in batch["documents"]],
+                [(metadata or {}).get("document_id", "") for metadata in batch["metadatas"]]
+            )
+            offset += len(batch["ids"])
+        return index
+    
+    def flush(self):
+        """Persist keyword indexes with unsaved changes, backend buffers and cache LRU positions (call on shutdown)"""
+        for collection_name, index in list(self._keyword_indexes.items()):
+            if index.dirty:
+                index.save(self._keyword_index_path(collection_name))
+        for backend in list(self._stores.values()):
+            backend.flush()
+        if self.embedding_cache is not None:
+            self.embedding_cache.flush()
+    
+    def _bump_corpus_version(self):
+        self._corpus_version.increment()
+    
+    def compact(self, collection_name: str = "documents", batch_size: int = 1000) -> Dict:
+        """
+        Rebuild a collection to reclaim space left by deleted chunks
+        
+        Run this while nothing else writes to the store, e.g. from
+        scripts/compact_vector_store.py with the API stopped.
+        
+        Args:
+            collection_name: Collection to compact
+            batch_size: Records copied per batch
+            
+        Returns:
+            Record count and on-disk size before and after
+        """
+        backend = self.get_backend(collection_name)
+        size_before = disk_usage(backend.directory)
+        count = backend.compact(batch_size)
+        size_after = disk_usage(backend.directory)
+        logger.info(
+            f"Compacted {collection_name}: {count} records, "
+            f"{size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB"
+        )
+        return {
+            "collection": collection_name,
+            "records": count,
+            "size_before_bytes": size_before,
+            "size_after_bytes": size_after
+        }
 
 
 # Global vector store manager instance
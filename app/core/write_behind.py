@@ -0,0 +1,332 @@
+"""
+Write-behind buffer for MongoDB inserts
+"""
+from collections import deque
+from typing import Deque, List, Optional
+from bson import json_util
+from pymongo.errors import BulkWriteError
+from app.core.database import mongodb
+from app.core.metrics import LATENCY_BUCKETS, metrics
+import asyncio
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# MongoDB error code for a duplicate _id (a spilled record that was written after all)
+DUPLICATE_KEY = 11000
+
+
+class WriteBehindBuffer:
+    """
+    Queue records for one collection and insert them in batches off the request path
+    
+    add() only appends to an in-memory queue. A background task writes the
+    queue with insert_many once batch_size records are waiting or every
+    flush_interval_ms, whichever comes first. When max_pending records are
+    queued (MongoDB is slower than the request rate), add() waits for the
+    next flush instead of letting the queue grow without bound.
+    
+    When a write fails (MongoDB unreachable), the buffer stops trying
+    inserts: batches go straight to a JSON-lines spill file of at most
+    spill_max_bytes, and a background probe pings MongoDB after retry_min_s,
+    doubling the wait after each failure up to retry_max_s. Once a probe
+    succeeds, writes resume and the spill file is replayed. Records that
+    don't fit in the spill file, or that MongoDB rejects (e.g. failing
+    validation), are logged, dropped and counted. When MongoDB isn't
+    configured at all, records are dropped with a single warning.
+    
+    drain() writes everything still queued and must be awaited on shutdown.
+    """
+    
+    def __init__(
+        self,
+        collection_name: str,
+        batch_size: int = 50,
+        flush_interval_ms: float = 500.0,
+        max_pending: int = 5000,
+        spill_path: Optional[str] = None,
+        spill_max_bytes: int = 50 * 1024 * 1024,
+        retry_min_s: float = 1.0,
+        retry_max_s: float = 60.0
+    ):
+        self.collection_name = collection_name
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_pending = max(self.batch_size, max_pending)
+        self.spill_path = spill_path
+        self.spill_max_bytes = spill_max_bytes
+        self.retry_min = retry_min_s
+        self.retry_max = max(retry_min_s, retry_max_s)
+        self._pending: Deque[dict] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._room: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closing = False
+        
+        # Outage state: while _outage is set, batches are spilled without an
+        # insert attempt and _probe_task pings MongoDB at _retry_at
+        self._outage = False
+        self._retry_delay = self.retry_min
+        self._retry_at = 0.0
+        self._probe_task: Optional[asyncio.Task] = None
+        self._replay_due = False
+        self._warned_unconfigured = False
+        
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+        
+        self._batch_sizes = metrics.histogram(
+            f"{collection_name}_write_batch_size",
+            f"Records per {collection_name} insert_many",
+            [1, 2, 4, 8, 16, 32, 64, 128, 256]
+        )
+        self._write_durations = metrics.histogram(
+            f"{collection_name}_write_seconds",
+            f"Time per {collection_name} insert_many",
+            LATENCY_BUCKETS
+        )
+    
+    @property
+    def _replay_path(self) -> str:
+        return self.spill_path + ".replay"
+    
+    def _ensure_started(self):
+        """Start the flush task on the running event loop"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._room = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+    
+    async def add(self, record: dict):
+        """Queue a record, waiting for a flush while the queue is full"""
+        self._ensure_started()
+        while len(self._pending) >= self.max_pending:
+            self._room.clear()
+            self._wakeup.set()
+            await self._room.wait()
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+    
+    async def _run(self):
+        """Flush task: write the queue when a batch is full or the interval has passed"""
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+    
+    async def flush(self):
+        """Write everything queued so far"""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            if self._outage:
+                self._schedule_probe()
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                self._room.set()
+                await self._write(batch)
+            if self._replay_due and not self._outage and mongodb.db is not None:
+                # A probe succeeded; replay without waiting for the next record
+                self._replay_due = False
+                if self._has_spill():
+                    await self._replay(mongodb.get_collection(self.collection_name))
+    
+    async def drain(self):
+        """Stop the flush task and write everything still queued (call on shutdown)"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        await self.flush()
+        self._task = None
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+    
+    async def _write(self, batch: List[dict]):
+        """insert_many one batch, spilling what couldn't be written"""
+        if mongodb.db is None:
+            # Not configured (or the startup connection failed): nothing to spill for
+            if not self._warned_unconfigured:
+                logger.warning(f"MongoDB not available. {self.collection_name} records are not stored.")
+                self._warned_unconfigured = True
+            self.dropped += len(batch)
+            return
+        if self._outage:
+            await self._spill(batch)
+            return
+        
+        collection = mongodb.get_collection(self.collection_name)
+        started = time.perf_counter()
+        try:
+            await collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # MongoDB was reachable and rejected individual records, so retrying won't help
+            rejected = self._rejected(e)
+            self.written += len(batch) - len(rejected)
+            self._drop_rejected(rejected)
+            return
+        except Exception as e:
+            logger.warning(f"Writing {len(batch)} {self.collection_name} records failed: {e}")
+            self._enter_outage()
+            await self._spill(batch)
+            return
+        self._write_durations.observe(time.perf_counter() - started)
+        self._batch_sizes.observe(len(batch))
+        self.written += len(batch)
+        
+        if self._has_spill():
+            await self._replay(collection)
+    
+    @staticmethod
+    def _rejected(error: BulkWriteError) -> List[dict]:
+        """Write errors other than duplicate _ids (records that were written earlier)"""
+        return [e for e in error.details.get("writeErrors", []) if e.get("code") != DUPLICATE_KEY]
+    
+    def _drop_rejected(self, rejected: List[dict]):
+        """Drop records MongoDB refuses (validation, size limits): they would fail on every retry"""
+        for error in rejected:
+            logger.error(
+                f"MongoDB rejected a {self.collection_name} record (code {error.get('code')}): "
+                f"{error.get('errmsg', 'write error')}; dropping it"
+            )
+        self.dropped += len(rejected)
+    
+    def _has_spill(self) -> bool:
+        return bool(self.spill_path) and (os.path.exists(self._replay_path) or os.path.exists(self.spill_path))
+    
+    def _enter_outage(self):
+        """Stop attempting inserts until a probe reaches MongoDB"""
+        if not self._outage:
+            logger.warning(
+                f"Spilling {self.collection_name} records until MongoDB is reachable "
+                f"(next probe in {self._retry_delay:g}s)"
+            )
+        self._outage = True
+        self._retry_at = time.monotonic() + self._retry_delay
+    
+    def _schedule_probe(self):
+        """Start a probe once the backoff has passed, unless one is running"""
+        if self._probe_task is not None and not self._probe_task.done():
+            return
+        if time.monotonic() < self._retry_at:
+            return
+        self._probe_task = asyncio.create_task(self._probe())
+    
+    async def _probe(self):
+        """Ping MongoDB; resume writes on success, back off further on failure"""
+        try:
+            await mongodb.db.command("ping")
+        except Exception as e:
+            self._retry_delay = min(self._retry_delay * 2, self.retry_max)
+            self._retry_at = time.monotonic() + self._retry_delay
+            logger.debug(f"MongoDB probe failed ({e}); next in {self._retry_delay:g}s")
+            return
+        logger.info(f"MongoDB is reachable again; resuming {self.collection_name} writes")
+        self._outage = False
+        self._retry_delay = self.retry_min
+        self._replay_due = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    async def _spill(self, records: List[dict]):
+        """Append records to the spill file, dropping those past spill_max_bytes"""
+        if not records:
+            return
+        if not self.spill_path:
+            self.dropped += len(records)
+            return
+        lines = [json_util.dumps(record) + "\n" for record in records]
+        loop = asyncio.get_running_loop()
+        kept = await loop.run_in_executor(None, self._append_lines, lines)
+        self.spilled += kept
+        if kept < len(records):
+            self.dropped += len(records) - kept
+            logger.error(
+                f"{self.collection_name} spill file is full ({self.spill_max_bytes} bytes); "
+                f"dropped {len(records) - kept} record(s)"
+            )
+    
+    def _append_lines(self, lines: List[str]) -> int:
+        """Append lines up to the size limit; returns how many were written"""
+        os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+        size = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+        kept = []
+        for line in lines:
+            if size + len(line) > self.spill_max_bytes:
+                break
+            kept.append(line)
+            size += len(line)
+        if kept:
+            with open(self.spill_path, "a") as f:
+                f.writelines(kept)
+        return len(kept)
+    
+    async def _replay(self, collection):
+        """
+        Write spilled records now that MongoDB accepts writes again
+        
+        The spill file is renamed first, so records spilled meanwhile go to
+        a new file. If MongoDB becomes unreachable again, the rest is spilled
+        again; records MongoDB rejects are dropped.
+        """
+        loop = asyncio.get_running_loop()
+        
+        def take() -> List[dict]:
+            if not os.path.exists(self._replay_path):
+                os.replace(self.spill_path, self._replay_path)
+            with open(self._replay_path) as f:
+                return [json_util.loads(line) for line in f if line.strip()]
+        
+        records = await loop.run_in_executor(None, take)
+        replayed = 0
+        for offset in range(0, len(records), self.batch_size):
+            batch = records[offset:offset + self.batch_size]
+            try:
+                await collection.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                rejected = self._rejected(e)
+                replayed += len(batch) - len(rejected)
+                self._drop_rejected(rejected)
+                continue
+            except Exception as e:
+                logger.warning(f"Replaying spilled {self.collection_name} records failed: {e}")
+                self._enter_outage()
+                await self._spill(records[offset:])
+                break
+            replayed += len(batch)
+        os.remove(self._replay_path)
+        self.replayed += replayed
+        if replayed:
+            logger.info(f"Replayed {replayed} spilled {self.collection_name} record(s)")
+    
+    def stats(self) -> dict:
+        """Queue length, write counters and insert_many histograms"""
+        spill_bytes = 0
+        if self.spill_path:
+            for path in (self.spill_path, self._replay_path):
+                if os.path.exists(path):
+                    spill_bytes += os.path.getsize(path)
+        return {
+            "pending": len(self._pending),
+            "written": self.written,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+            "outage": self._outage,
+            "spill_bytes": spill_bytes,
+            "batch_size": self._batch_sizes.snapshot(),
+            "write_seconds": self._write_durations.snapshot()
+        }
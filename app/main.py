@@ -1,15 +1,22 @@
 """
 FastAPI main application
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 import logging
+import time
 
 from app.core.database import mongodb
 from app.core.config import settings
-from app.api import documents, chat
+from app.core.metrics import LATENCY_BUCKETS, collect_spans, metrics, server_timing
+from app.api import documents, chat, system
+from app.services.ingestion_service import ingestion_service
+from app.core.vector_store import vector_store_manager
+from app.services.chat_service import chat_service
 
 # Configure logging
 logging.basicConfig(
@@ -19,18 +26,35 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def warm_up():
+    """Load models and open the vector store without blocking startup"""
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, vector_store_manager.warm_up)
+        await loop.run_in_executor(None, chat_service.warm_up)
+        logger.info("Warm-up complete, application is ready")
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}. Components will load on first use.", exc_info=True)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     logger.info("Starting up application...")
     await mongodb.connect()
+    if settings.WARM_UP_ON_STARTUP:
+        # Keep a reference so the task isn't garbage collected
+        app.state.warm_up_task = asyncio.create_task(warm_up())
     logger.info("Application started successfully")
     
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
+    ingestion_service.shutdown()
+    vector_store_manager.flush()
+    await chat_service.history_writer.drain()
     await mongodb.close()
     logger.info("Application shutdown complete")
 
@@ -52,20 +76,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    """Time each request and, if enabled, report its stage spans in a Server-Timing header"""
+    started = time.perf_counter()
+    with collect_spans() as spans:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    
+    # Label by endpoint name so path parameters don't create a series per ID
+    route = request.scope.get("route")
+    if route is not None and route.name != "prometheus_metrics":
+        metrics.histogram(
+            "http_request_seconds",
+            "Time to produce the response (streamed bodies excluded)",
+            LATENCY_BUCKETS,
+            {"method": request.method, "endpoint": route.name}
+        ).observe(elapsed)
+    
+    if settings.SERVER_TIMING_HEADER:
+        response.headers["Server-Timing"] = server_timing(list(spans) + [("total", elapsed)])
+    return response
+
 # Include routers
 app.include_router(documents.router, prefix=settings.API_PREFIX)
 app.include_router(chat.router, prefix=settings.API_PREFIX)
+app.include_router(system.router, prefix=settings.API_PREFIX)
 
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness check: the process is up and serving requests"""
     return {
         "status": "healthy",
         "service": "AI Document Search Assistant"
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: embedding model loaded, vector store open and LLM created"""
+    checks = {
+        "vector_store": vector_store_manager.is_ready,
+        "llm": chat_service.is_ready,
+        "mongodb": mongodb.db is not None
+    }
+    # MongoDB is optional (the app runs without it), so it is reported but not required
+    ready = checks["vector_store"] and checks["llm"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "checks": checks}
+    )
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Request and pipeline stage histograms in the Prometheus text format"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 # Serve static files (frontend) - MUST BE LAST
 app.mount("/", StaticFiles(directory="frontend", html=True), name="static")
 
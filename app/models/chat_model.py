@@ -4,11 +4,20 @@ Chat data models
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
+from app.core.config import WORKSPACE_PATTERN
+
+SESSION_ID_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
 
 
 class QueryRequest(BaseModel):
     """Query request model"""
     question: str = Field(..., min_length=1, description="User question")
+    k: Optional[int] = Field(None, ge=1, le=20, description="Number of chunks to retrieve")
+    vector_weight: Optional[float] = Field(None, ge=0, description="Weight of vector search in rank fusion")
+    keyword_weight: Optional[float] = Field(None, ge=0, description="Weight of keyword (BM25) search in rank fusion")
+    workspace: Optional[str] = Field(None, pattern=WORKSPACE_PATTERN, description="Workspace (document collection) to search")
+    document_ids: Optional[List[str]] = Field(None, min_length=1, max_length=100, description="Only search these documents")
+    session_id: Optional[str] = Field(None, pattern=SESSION_ID_PATTERN, description="Conversation the question belongs to")
     
 
 class QueryResponse(BaseModel):
@@ -16,6 +25,8 @@ class QueryResponse(BaseModel):
     answer: str
     sources: Optional[List[str]] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    cached: bool = False
+    session_id: Optional[str] = None
 
 
 class ChatHistory(BaseModel):
@@ -25,6 +36,7 @@ class ChatHistory(BaseModel):
     sources: Optional[List[str]] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     session_id: Optional[str] = None
+    standalone_question: Optional[str] = None  # Follow-up question as condensed for retrieval
 
 
 class ChatHistoryResponse(BaseModel):
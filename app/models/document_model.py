@@ -2,7 +2,7 @@
 Document data models
 """
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -14,6 +14,9 @@ class DocumentMetadata(BaseModel):
     upload_date: datetime = Field(default_factory=datetime.utcnow)
     num_chunks: int
     status: str = "processed"
+    content_hash: Optional[str] = None
+    chunk_ids: List[str] = Field(default_factory=list)
+    workspace: str = "default"
 
 
 class DocumentResponse(BaseModel):
@@ -33,3 +36,45 @@ class DocumentUploadResponse(BaseModel):
     document_id: Optional[str] = None
     filename: Optional[str] = None
     num_chunks: Optional[int] = None
+    job_id: Optional[str] = None
+    status: Optional[str] = None
+
+
+class IngestionJob(BaseModel):
+    """Background ingestion job status"""
+    job_id: str
+    filename: str
+    file_path: str
+    file_size: int
+    status: str = "queued"  # queued | processing | completed | failed
+    message: Optional[str] = None
+    pages_parsed: int = 0
+    pages_total: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_reused: int = 0  # Embedded chunks taken from the embedding cache
+    document_id: Optional[str] = None
+    batch_id: Optional[str] = None
+    content_hash: Optional[str] = None
+    workspace: str = "default"
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+
+class BatchUploadResponse(BaseModel):
+    """Batch upload response model"""
+    success: bool
+    message: str
+    batch_id: Optional[str] = None
+    files: List[DocumentUploadResponse] = Field(default_factory=list)
+
+
+class IngestionBatch(BaseModel):
+    """Progress of a batch upload"""
+    batch_id: str
+    total: int
+    queued: int
+    processing: int
+    completed: int
+    failed: int
+    jobs: List[IngestionJob]
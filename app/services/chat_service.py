@@ -1,80 +1,172 @@
 """
 Chat service with RAG pipeline
 """
-from typing import Dict, List
+from functools import partial
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from app.core.database import mongodb
-from app.core.vector_store import vector_store_manager
+from app.core.database import encode_timestamp_cursor, mongodb, timestamp_cursor, workspace_query
+from app.core.vector_store import collection_for_workspace, vector_store_manager
+from app.core.retrieval import hybrid_retriever
 from app.core.config import settings
 from app.models.chat_model import QueryRequest, QueryResponse, ChatHistory
+from app.core.answer_cache import AnswerCache
+from app.core.metrics import span
+from app.core.intent_router import DOCUMENT_STATS, LIST_DOCUMENTS, SUMMARIZE_DOCUMENT, IntentMatch, IntentRouter
+from app.core.session_memory import SessionMemory, Turn, condense_question, is_follow_up
+from app.core.write_behind import WriteBehindBuffer
+from app.services.document_service import document_service
+import asyncio
+import contextvars
+import re
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Documents described when asked what has been uploaded (the count covers all)
+FILE_LIST_LIMIT = 20
+
+# Fields returned by get_chat_history
+HISTORY_FIELDS = {"question": 1, "answer": 1, "sources": 1, "timestamp": 1, "session_id": 1, "standalone_question": 1}
+
 
 class ChatService:
     """Service for handling chat operations with RAG"""
     
     def __init__(self):
-        # Use local LLM (FREE) or OpenAI
-        if settings.USE_LOCAL_MODELS or not settings.OPENAI_API_KEY:
+        # Use local LLM (FREE) or OpenAI, created on first use or by warm_up()
+        self.use_local = settings.USE_LOCAL_MODELS or not settings.OPENAI_API_KEY
+        self._llm = None
+        self._qa_chain = None
+        self._llm_lock = threading.Lock()
+        
+        # Answers for repeated questions, invalidated when documents change
+        self.answer_cache = None
+        if settings.ANSWER_CACHE:
+            self.answer_cache = AnswerCache(
+                similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+                ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+                max_entries=settings.ANSWER_CACHE_MAX_ENTRIES
+            )
+        
+        # Decides whether a question is answered from metadata or by retrieval
+        self.intent_router = IntentRouter(
+            patterns=settings.INTENT_PATTERNS,
+            examples=settings.INTENT_EXAMPLES,
+            similarity_threshold=settings.INTENT_SIMILARITY_THRESHOLD
+        )
+        
+        # Recent turns per session, for condensing follow-up questions
+        self.sessions = SessionMemory(
+            max_sessions=settings.SESSION_MAX_SESSIONS,
+            max_turns=settings.SESSION_MAX_TURNS
+        )
+        
+        # Chat history is inserted in batches after the response is sent
+        self.history_writer = WriteBehindBuffer(
+            "chat_history",
+            batch_size=settings.HISTORY_BATCH_SIZE,
+            flush_interval_ms=settings.HISTORY_FLUSH_INTERVAL_MS,
+            max_pending=settings.HISTORY_MAX_PENDING,
+            spill_path=settings.HISTORY_SPILL_PATH,
+            spill_max_bytes=settings.HISTORY_SPILL_MAX_MB * 1024 * 1024,
+            retry_min_s=settings.HISTORY_RETRY_MIN_S,
+            retry_max_s=settings.HISTORY_RETRY_MAX_S
+        )
+    
+    @property
+    def llm(self):
+        """Answer generator, created on first access"""
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    self._llm = self._load_llm()
+        return self._llm
+    
+    def _load_llm(self):
+        if self.use_local:
             from app.core.local_llm import LocalLLM
-            self.llm = LocalLLM()
-            self.use_local = True
             logger.info("Using FREE local LLM (no API key needed)")
-        else:
-            from app.core.llm import get_llm
-            self.llm = get_llm()
-            self.use_local = False
-            logger.info("Using OpenAI LLM")
-        
-        # Don't initialize retriever here - do it fresh each query
+            # Chunks are pre-ranked by their stored vectors; only sentences of
+            # the best ones are embedded, bypassing the chunk embedding cache
+            return LocalLLM(
+                embeddings=vector_store_manager.model_embeddings,
+                chunk_vectors=vector_store_manager.get_embeddings
+            )
+        from app.core.llm import get_llm
+        logger.info("Using OpenAI LLM")
+        return get_llm()
+    
+    @property
+    def qa_chain(self):
+        """RAG chain for the OpenAI LLM, built on first access"""
+        if self._qa_chain is None:
+            self._qa_chain = self._create_qa_chain()
+        return self._qa_chain
+    
+    def warm_up(self):
+        """Create the LLM (and chain) ahead of the first query"""
+        components = [self.llm]
         if not self.use_local:
-            self.qa_chain = self._create_qa_chain()
-    
-    def _get_retriever(self):
-        """Get a fresh retriever (to ensure latest documents are included)"""
-        vector_store = vector_store_manager.get_vector_store()
-        return vector_store.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": 4}
-        )
+            components.append(self.qa_chain)
+        if settings.INTENT_EMBEDDING_FALLBACK:
+            self.intent_router.warm_up(vector_store_manager.embeddings)
+            components.append(self.intent_router)
+        logger.info(f"Chat service ready: {', '.join(type(c).__name__ for c in components)}")
     
-    async def get_uploaded_documents_info(self) -> str:
-        """Get information about uploaded documents from MongoDB"""
+    @property
+    def is_ready(self) -> bool:
+        """Whether the LLM has been created"""
+        return self._llm is not None
+    
+    async def get_uploaded_documents_info(self, workspace: Optional[str] = None) -> str:
+        """Describe the most recently uploaded documents of a workspace from MongoDB"""
         try:
             collection = mongodb.get_collection("documents")
             if collection is None:
                 return "No documents database available."
             
-            docs = []
-            async for doc in collection.find():
-                docs.append({
-                    "filename": doc.get("filename", "Unknown"),
-                    "upload_date": doc.get("upload_date"),
-                    "num_chunks": doc.get("num_chunks", 0),
-                    "file_size": doc.get("file_size", 0)
-                })
-            
-            if not docs:
+            query = workspace_query(workspace)
+            total = await collection.count_documents(query)
+            if total == 0:
                 return "No documents have been uploaded yet."
             
-            info = f"I have access to {len(docs)} document(s):\n\n"
+            docs = await collection.find(
+                query, {"filename": 1, "upload_date": 1, "num_chunks": 1, "file_size": 1}
+            ).sort("_id", -1).limit(FILE_LIST_LIMIT).to_list(FILE_LIST_LIMIT)
+            
+            info = f"I have access to {total} document(s):\n\n"
             for i, doc in enumerate(docs, 1):
-                size_mb = doc['file_size'] / (1024 * 1024)
-                info += f"{i}. **{doc['filename']}**\n"
-                info += f"   - Uploaded: {doc['upload_date']}\n"
+                size_mb = doc.get('file_size', 0) / (1024 * 1024)
+                info += f"{i}. **{doc.get('filename', 'Unknown')}**\n"
+                info += f"   - Uploaded: {doc.get('upload_date')}\n"
                 info += f"   - Size: {size_mb:.2f} MB\n"
-                info += f"   - Chunks: {doc['num_chunks']}\n\n"
+                info += f"   - Chunks: {doc.get('num_chunks', 0)}\n\n"
+            if total > len(docs):
+                info += f"...and {total - len(docs)} older document(s).\n"
             
             return info
         except Exception as e:
             logger.error(f"Error getting document info: {e}")
             return "Error retrieving document information."
     
+    async def get_document_stats_info(self, workspace: Optional[str] = None) -> str:
+        """Describe the document count and totals of a workspace"""
+        try:
+            totals = await document_service.get_document_stats(workspace or settings.DEFAULT_WORKSPACE)
+            if totals["total_documents"] == 0:
+                return "No documents have been uploaded yet."
+            size_mb = totals["total_size"] / (1024 * 1024)
+            return (
+                f"I have access to {totals['total_documents']} document(s), "
+                f"{size_mb:.2f} MB in total, split into {totals['total_chunks']} chunks."
+            )
+        except Exception as e:
+            logger.error(f"Error getting document stats: {e}")
+            return "Error retrieving document information."
+    
     def _format_docs(self, docs):
         """Format documents for context"""
         return "\n\n".join(doc.page_content for doc in docs)
@@ -107,16 +199,205 @@ Answer: """
             input_variables=["context", "question"]
         )
         
-        # Create RAG chain using LCEL
+        # Create RAG chain using LCEL; context comes from the retrieved docs
         qa_chain = (
-            {"context": self.retriever | self._format_docs, "question": RunnablePassthrough()}
-            | prompt
+            prompt
             | self.llm
             | StrOutputParser()
         )
         
         return qa_chain
     
+    def _route(self, question: str, query_vector: Optional[List[float]] = None) -> IntentMatch:
+        """Intent of a question (patterns, then the query embedding if given)"""
+        if query_vector is not None:
+            if not settings.INTENT_EMBEDDING_FALLBACK:
+                query_vector = None
+            else:
+                # Without startup warm-up, the centroids are built on first use
+                self.intent_router.warm_up_in_background(vector_store_manager.embeddings)
+        with span("query", "route"):
+            return self.intent_router.route(question, query_vector)
+    
+    async def _metadata_answer(self, intent: IntentMatch, workspace: Optional[str]) -> Optional[str]:
+        """Answer for intents served from document metadata instead of retrieval, else None"""
+        if intent.intent == LIST_DOCUMENTS:
+            with span("query", "list_documents"):
+                return await self.get_uploaded_documents_info(workspace)
+        if intent.intent == DOCUMENT_STATS:
+            with span("query", "document_stats"):
+                return await self.get_document_stats_info(workspace)
+        return None
+    
+    def _metadata_response(self, docs_info: str, session_id: Optional[str]) -> QueryResponse:
+        return QueryResponse(
+            answer=docs_info,
+            sources=["MongoDB Database"],
+            timestamp=datetime.utcnow(),
+            session_id=session_id
+        )
+    
+    def _metadata_events(self, docs_info: str, session_id: Optional[str]) -> List[Dict]:
+        return [
+            {"event": "sources", "data": {"sources": ["MongoDB Database"]}},
+            {"event": "token", "data": {"text": docs_info}},
+            {"event": "done", "data": {"session_id": session_id, "timestamp": datetime.utcnow().isoformat()}}
+        ]
+    
+    async def _scope_to_document(self, query: QueryRequest, intent: IntentMatch) -> QueryRequest:
+        """Restrict a question about a named document (e.g. "summarize report.pdf") to that document"""
+        if intent.intent != SUMMARIZE_DOCUMENT or not intent.document or query.document_ids:
+            return query
+        collection = mongodb.get_collection("documents") if mongodb.db is not None else None
+        if collection is None:
+            return query
+        name = intent.document
+        workspace = workspace_query(query.workspace)
+        # Exact name (with or without .pdf) uses the filename index
+        docs = await collection.find(
+            {"filename": {"$in": [name, f"{name}.pdf"]}, **workspace}, {"_id": 1}
+        ).to_list(100)
+        if not docs and (name.lower().endswith(".pdf") or not any(c.isspace() for c in name)):
+            # Ignoring case scans the collection, so only for names that look like a file name
+            pattern = f"^{re.escape(name)}(\\.pdf)?$"
+            docs = await collection.find(
+                {"filename": {"$regex": pattern, "$options": "i"}, **workspace}, {"_id": 1}
+            ).to_list(100)
+        if not docs:
+            logger.info(f"No document named {name!r}; answering from all documents")
+            return query
+        return query.model_copy(update={"document_ids": [str(doc["_id"]) for doc in docs]})
+    
+    async def _embed_query(self, question: str) -> List[float]:
+        """Embed the question once (in a worker thread) for cache lookup and retrieval"""
+        loop = asyncio.get_running_loop()
+        with span("query", "embed"):
+            return await loop.run_in_executor(None, vector_store_manager.embeddings.embed_query, question)
+    
+    async def _retrieve(self, query: QueryRequest, query_vector: List[float]):
+        """Get relevant documents by hybrid vector + keyword search"""
+        loop = asyncio.get_running_loop()
+        # Run in a copy of this context so the retriever's spans reach the request
+        with span("query", "retrieve"):
+            return await loop.run_in_executor(
+                None,
+                contextvars.copy_context().run,
+                partial(
+                    hybrid_retriever.retrieve,
+                    query.question,
+                    query_vector,
+                    k=query.k,
+                    vector_weight=query.vector_weight,
+                    keyword_weight=query.keyword_weight,
+                    collection_name=collection_for_workspace(query.workspace),
+                    document_ids=query.document_ids
+                )
+            )
+    
+    def _uses_default_retrieval(self, query: QueryRequest) -> bool:
+        """Answers are only cached for the default retrieval parameters"""
+        return query.k is None and query.vector_weight is None and query.keyword_weight is None
+    
+    def _cache_scope(self, query: QueryRequest) -> str:
+        """Answers are only reused for the same workspace and document filter"""
+        scope = collection_for_workspace(query.workspace)
+        if query.document_ids is not None:
+            scope += ":" + ",".join(sorted(set(query.document_ids)))
+        return scope
+    
+    def _cached_answer(self, query: QueryRequest, query_vector: Optional[List[float]] = None):
+        """Look up a cached answer by exact question, or by embedding if given"""
+        if self.answer_cache is None:
+            return None
+        version = vector_store_manager.corpus_version
+        scope = self._cache_scope(query)
+        with span("query", "cache_lookup"):
+            if query_vector is None:
+                return self.answer_cache.get_exact(query.question, version, scope)
+            return self.answer_cache.get_similar(query_vector, version, scope)
+    
+    def _cache_answer(
+        self,
+        query: QueryRequest,
+        query_vector: List[float],
+        answer: str,
+        sources: List[str],
+        corpus_version: int
+    ):
+        """Cache an answer computed against the given corpus version"""
+        if self.answer_cache is not None:
+            self.answer_cache.put(
+                query.question, query_vector, answer, sources or None, corpus_version, self._cache_scope(query)
+            )
+    
+    def _extract_sources(self, docs) -> List[str]:
+        """Extract unique source information"""
+        sources = []
+        for doc in docs:
+            if hasattr(doc, 'metadata') and 'filename' in doc.metadata:
+                # Files are stored under their content hash, so show the upload name
+                sources.append(doc.metadata['filename'])
+            elif hasattr(doc, 'metadata') and 'source' in doc.metadata:
+                sources.append(doc.metadata['source'])
+        
+        # Remove duplicates
+        return list(set(sources))
+    
+    async def _session_turns(self, session_id: str) -> List[Turn]:
+        """
+        Recent turns of a session, from memory or, for a session not in memory, from MongoDB
+        
+        The result is remembered even when MongoDB has no turns (or isn't
+        reachable), so a session is looked up at most once.
+        """
+        turns = self.sessions.get(session_id)
+        if turns is not None:
+            return turns
+        
+        records = []
+        collection = mongodb.get_collection("chat_history") if mongodb.db is not None else None
+        if collection is not None:
+            try:
+                with span("query", "load_session"):
+                    records = await collection.find(
+                        {"session_id": session_id},
+                        {"question": 1, "standalone_question": 1, "answer": 1}
+                    ).sort("timestamp", -1).limit(self.sessions.max_turns).to_list(self.sessions.max_turns)
+            except Exception as e:
+                logger.warning(f"Could not load session {session_id}: {e}")
+        turns = [
+            Turn(record["question"], record.get("standalone_question") or record["question"], record.get("answer", ""))
+            for record in reversed(records)
+        ]
+        self.sessions.load(session_id, turns)
+        return turns
+    
+    async def _standalone_query(self, query: QueryRequest) -> QueryRequest:
+        """The query with a follow-up question condensed using its session's recent turns"""
+        if query.session_id is None or not is_follow_up(query.question):
+            # Only follow-ups use earlier turns; don't load a session for anything else
+            return query
+        turns = await self._session_turns(query.session_id)
+        question = condense_question(query.question, turns)
+        if question == query.question:
+            return query
+        logger.info(f"Condensed follow-up question: {question[:80]}")
+        return query.model_copy(update={"question": question})
+    
+    async def _save_history(self, original: QueryRequest, query: QueryRequest, answer: str, sources: List[str]):
+        """Queue chat history for MongoDB (written in batches by history_writer) and remember the turn"""
+        chat_history = ChatHistory(
+            question=original.question,
+            answer=answer,
+            sources=sources if sources else None,
+            session_id=original.session_id,
+            standalone_question=query.question if query is not original else None
+        )
+        if original.session_id is not None:
+            self.sessions.append(original.session_id, original.question, query.question, answer)
+        with span("query", "save_history"):
+            await self.history_writer.add(chat_history.dict())
+    
     async def process_query(self, query: QueryRequest) -> QueryResponse:
         """
         Process user query using RAG pipeline
@@ -128,78 +409,73 @@ Answer: """
             QueryResponse with answer and sources
         """
         try:
-            # Check if user is asking about uploaded files
-            question_lower = query.question.lower()
-            file_questions = [
-                "what files", "which files", "what documents", "which documents",
-                "list files", "list documents", "show files", "show documents",
-                "uploaded files", "uploaded documents", "what do you have",
-                "what pdfs", "file details", "document details"
-            ]
-            
-            if any(keyword in question_lower for keyword in file_questions):
-                # Return document information from MongoDB
-                docs_info = await self.get_uploaded_documents_info()
-                return QueryResponse(
-                    answer=docs_info,
-                    sources=["MongoDB Database"],
-                    timestamp=datetime.utcnow()
-                )
+            # Questions about the documents themselves are answered from MongoDB
+            intent = self._route(query.question)
+            docs_info = await self._metadata_answer(intent, query.workspace)
+            if docs_info is not None:
+                return self._metadata_response(docs_info, query.session_id)
             
-            # Get relevant documents (run synchronously in async context)
-            import asyncio
-            loop = asyncio.get_event_loop()
-            
-            # Get fresh retriever to ensure latest documents
-            retriever = self._get_retriever()
-            # Use invoke() for LangChain v0.2+
-            docs = await loop.run_in_executor(
-                None, 
-                retriever.invoke, 
-                query.question
-            )
+            # Follow-ups are searched, cached and answered as standalone questions
+            original = query
+            query = await self._standalone_query(query)
+            query = await self._scope_to_document(query, intent)
             
-            # Generate answer
-            if self.use_local:
-                # Use simple extractive method (FREE, no API)
-                context = "\n\n".join([doc.page_content for doc in docs])
-                answer = self.llm.generate_answer(query.question, context)
-            else:
-                # Use OpenAI with LCEL chain
-                answer = await loop.run_in_executor(
-                    None,
-                    self.qa_chain.invoke,
-                    query.question
+            # Cheap exact-repeat check first, then by query embedding
+            use_cache = self._uses_default_retrieval(query)
+            cached = self._cached_answer(query) if use_cache else None
+            if cached is None:
+                corpus_version = vector_store_manager.corpus_version
+                query_vector = await self._embed_query(query.question)
+                if intent.method == "default":
+                    # No pattern matched; the embedding may still recognize a metadata question
+                    docs_info = await self._metadata_answer(self._route(query.question, query_vector), query.workspace)
+                    if docs_info is not None:
+                        return self._metadata_response(docs_info, query.session_id)
+                cached = self._cached_answer(query, query_vector) if use_cache else None
+            if cached is not None:
+                logger.info(f"Answer cache hit: {query.question[:50]}...")
+                await self._save_history(original, query, cached.answer, cached.sources or [])
+                return QueryResponse(
+                    answer=cached.answer,
+                    sources=cached.sources,
+                    timestamp=datetime.utcnow(),
+                    cached=True,
+                    session_id=query.session_id
                 )
             
-            # Extract source information
-            sources = []
-            for doc in docs:
-                if hasattr(doc, 'metadata') and 'source' in doc.metadata:
-                    sources.append(doc.metadata['source'])
-            
-            # Remove duplicates
-            sources = list(set(sources))
+            docs = await self._retrieve(query, query_vector)
+            context = self._format_docs(docs)
             
-            # Store chat history in MongoDB
-            chat_history = ChatHistory(
-                question=query.question,
-                answer=answer,
-                sources=sources if sources else None
-            )
+            # Generate answer
+            with span("query", "generate"):
+                if self.use_local:
+                    # Rank context sentences against the query (FREE, no API)
+                    loop = asyncio.get_running_loop()
+                    answer = await loop.run_in_executor(
+                        None,
+                        partial(
+                            self.llm.generate_answer, query.question, context, query_vector,
+                            docs, collection_for_workspace(query.workspace)
+                        )
+                    )
+                else:
+                    # Use OpenAI with LCEL chain
+                    answer = await self.qa_chain.ainvoke(
+                        {"context": context, "question": query.question}
+                    )
             
-            collection = mongodb.get_collection("chat_history")
-            if collection is not None:
-                await collection.insert_one(chat_history.dict())
-            else:
-                logger.warning("MongoDB not available. Chat history not stored.")
+            sources = self._extract_sources(docs)
+            if use_cache:
+                self._cache_answer(query, query_vector, answer, sources, corpus_version)
+            await self._save_history(original, query, answer, sources)
             
             logger.info(f"Query processed: {query.question[:50]}...")
             
             return QueryResponse(
                 answer=answer,
                 sources=sources if sources else None,
-                timestamp=datetime.utcnow()
+                timestamp=datetime.utcnow(),
+                session_id=query.session_id
             )
             
         except Exception as e:
@@ -208,33 +484,147 @@ Answer: """
             return QueryResponse(
                 answer="I'm sorry, but I don't have any documents to search through yet. Please upload a PDF document first from the Upload page.",
                 sources=None,
-                timestamp=datetime.utcnow()
+                timestamp=datetime.utcnow(),
+                session_id=query.session_id
             )
     
-    async def get_chat_history(self, limit: int = 50) -> List[Dict]:
+    async def stream_query(self, query: QueryRequest) -> AsyncIterator[Dict]:
         """
-        Get chat history from MongoDB
+        Process user query, yielding results as they become available
+        
+        Yields a "sources" event once retrieval is done, "token" events as
+        the answer is generated, then a final "done" event (or "error").
+        
+        Args:
+            query: QueryRequest object
+            
+        Yields:
+            Dicts with "event" and "data" keys
+        """
+        try:
+            intent = self._route(query.question)
+            docs_info = await self._metadata_answer(intent, query.workspace)
+            if docs_info is not None:
+                for event in self._metadata_events(docs_info, query.session_id):
+                    yield event
+                return
+            
+            # Follow-ups are searched, cached and answered as standalone questions
+            original = query
+            query = await self._standalone_query(query)
+            query = await self._scope_to_document(query, intent)
+            
+            use_cache = self._uses_default_retrieval(query)
+            cached = self._cached_answer(query) if use_cache else None
+            if cached is None:
+                corpus_version = vector_store_manager.corpus_version
+                query_vector = await self._embed_query(query.question)
+                if intent.method == "default":
+                    docs_info = await self._metadata_answer(self._route(query.question, query_vector), query.workspace)
+                    if docs_info is not None:
+                        for event in self._metadata_events(docs_info, query.session_id):
+                            yield event
+                        return
+                cached = self._cached_answer(query, query_vector) if use_cache else None
+            if cached is not None:
+                await self._save_history(original, query, cached.answer, cached.sources or [])
+                yield {"event": "sources", "data": {"sources": cached.sources or []}}
+                yield {"event": "token", "data": {"text": cached.answer}}
+                yield {"event": "done", "data": {"cached": True, "session_id": query.session_id, "timestamp": datetime.utcnow().isoformat()}}
+                return
+            
+            docs = await self._retrieve(query, query_vector)
+            sources = self._extract_sources(docs)
+            yield {"event": "sources", "data": {"sources": sources}}
+            
+            context = self._format_docs(docs)
+            parts = []
+            if self.use_local:
+                # Sentence ranking embeds text, so run it off the event loop
+                loop = asyncio.get_running_loop()
+                with span("query", "generate"):
+                    tokens = await loop.run_in_executor(
+                        None,
+                        lambda: list(self.llm.stream_answer(
+                            query.question, context, query_vector, docs, collection_for_workspace(query.workspace)
+                        ))
+                    )
+                for token in tokens:
+                    parts.append(token)
+                    yield {"event": "token", "data": {"text": token}}
+            else:
+                async for token in self.qa_chain.astream(
+                    {"context": context, "question": query.question}
+                ):
+                    parts.append(token)
+                    yield {"event": "token", "data": {"text": token}}
+            
+            answer = "".join(parts)
+            if use_cache:
+                self._cache_answer(query, query_vector, answer, sources, corpus_version)
+            await self._save_history(original, query, answer, sources)
+            
+            logger.info(f"Streamed query processed: {query.question[:50]}...")
+            
+            yield {
+                "event": "done",
+                "data": {
+                    "num_chunks": len(docs),
+                    "cached": False,
+                    "session_id": query.session_id,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            }
+            
+        except Exception as e:
+            logger.error(f"Error streaming query: {e}", exc_info=True)
+            yield {
+                "event": "error",
+                "data": {"message": "Sorry, I encountered an error processing your question. Please make sure you have uploaded a document first, then try again."}
+            }
+    
+    async def get_chat_history(self, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Get one page of chat history from MongoDB, newest first
         
         Args:
             limit: Maximum number of records to return
+            cursor: next_cursor of the previous page
             
         Returns:
-            List of chat history records
+            (chat history records, cursor of the next page or None on the last page)
+        
+        Raises:
+            ValueError: If the cursor is malformed
         """
+        before = timestamp_cursor(cursor)
         try:
             collection = mongodb.get_collection("chat_history")
             if collection is None:
                 logger.warning("MongoDB not available. Returning empty chat history.")
-                return []
-            history = []
-            async for record in collection.find().sort("timestamp", -1).limit(limit):
-                record["id"] = str(record["_id"])
-                del record["_id"]
-                history.append(record)
-            return history
+                return [], None
+            query = {}
+            if before is not None:
+                timestamp, last_id = before
+                query = {"$or": [
+                    {"timestamp": {"$lt": timestamp}},
+                    {"timestamp": timestamp, "_id": {"$lt": last_id}}
+                ]}
+            
+            # One extra record tells whether there is a next page
+            records = await collection.find(query, HISTORY_FIELDS).sort(
+                [("timestamp", -1), ("_id", -1)]
+            ).limit(limit + 1).to_list(limit + 1)
+            next_cursor = None
+            if len(records) > limit:
+                records = records[:limit]
+                next_cursor = encode_timestamp_cursor(records[-1]["timestamp"], records[-1]["_id"])
+            for record in records:
+                record["id"] = str(record.pop("_id"))
+            return records, next_cursor
         except Exception as e:
             logger.error(f"Error retrieving chat history: {e}")
-            return []
+            return [], None
 
 
 # Global chat service instance
@@ -2,42 +2,66 @@
 Document processing service
 """
 from fastapi import UploadFile
-from typing import Dict
+from functools import partial
+from typing import BinaryIO, Dict, List, Optional, Tuple
+import asyncio
 import os
-import shutil
+import zipfile
 from datetime import datetime
 from app.core.config import settings
-from app.core.database import mongodb
-from app.core.vector_store import vector_store_manager
-from app.utils.pdf_loader import PDFLoaderUtil
-from app.utils.text_splitter import text_splitter
-from app.models.document_model import DocumentMetadata, DocumentUploadResponse
+from app.core.database import id_cursor, mongodb, workspace_query
+from app.core.metrics import span
+from app.core.vector_store import collection_for_workspace, vector_store_manager
+from app.services.ingestion_service import ingestion_service
+from app.models.document_model import BatchUploadResponse, DocumentUploadResponse
+from app.utils.file_storage import ContentAddressedStore, FileTooLargeError, StoredFile
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Fields returned when listing documents (chunk IDs can be thousands per document)
+DOCUMENT_LIST_FIELDS = {
+    "filename": 1,
+    "file_size": 1,
+    "upload_date": 1,
+    "num_chunks": 1,
+    "status": 1,
+    "content_hash": 1,
+    "workspace": 1
+}
+
 
 class DocumentService:
     """Service for handling document operations"""
     
     def __init__(self):
         self.upload_dir = settings.UPLOAD_DIR
+        self.max_batch_files = settings.BATCH_UPLOAD_MAX_FILES
         self._ensure_upload_directory()
-        self.pdf_loader = PDFLoaderUtil()
+        self.store = ContentAddressedStore(
+            self.upload_dir,
+            max_size=settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024,
+            chunk_size=settings.UPLOAD_CHUNK_SIZE
+        )
     
     def _ensure_upload_directory(self):
         """Ensure upload directory exists"""
         os.makedirs(self.upload_dir, exist_ok=True)
     
-    async def process_document(self, file: UploadFile) -> DocumentUploadResponse:
+    async def process_document(self, file: UploadFile, workspace: Optional[str] = None) -> DocumentUploadResponse:
         """
-        Process uploaded PDF document
+        Save an uploaded PDF and queue it for background ingestion
+        
+        The file is streamed to content-addressed storage while hashed. If
+        the same content is already indexed in the workspace (or being
+        indexed), no new ingestion job is started.
         
         Args:
             file: Uploaded file
+            workspace: Workspace to add the document to (default workspace if None)
             
         Returns:
-            DocumentUploadResponse
+            DocumentUploadResponse with the ingestion job ID
         """
         try:
             # Validate file type
@@ -47,71 +71,36 @@ class DocumentService:
                     message="Only PDF files are supported"
                 )
             
-            # Save file locally
-            file_path = os.path.join(self.upload_dir, file.filename)
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            file_size = os.path.getsize(file_path)
-            logger.info(f"Saved file: {file.filename} ({file_size} bytes)")
-            
-            # Load PDF
-            documents = self.pdf_loader.load_pdf(file_path)
-            
-            # Split into chunks
-            chunks = text_splitter.split_documents(documents)
-            
-            # Add to vector store
-            try:
-                vector_store_manager.add_documents(chunks)
-            except Exception as embed_error:
-                error_msg = str(embed_error)
-                logger.error(f"Error adding to vector store: {error_msg}")
-                
-                # Check for specific OpenAI errors
-                if "insufficient_quota" in error_msg or "exceeded your current quota" in error_msg:
-                    return DocumentUploadResponse(
-                        success=False,
-                        message="OpenAI API quota exceeded. Please add credits to your OpenAI account at https://platform.openai.com/settings/organization/billing"
-                    )
-                elif "rate_limit" in error_msg:
-                    return DocumentUploadResponse(
-                        success=False,
-                        message="OpenAI API rate limit reached. Please wait a moment and try again."
-                    )
-                else:
-                    return DocumentUploadResponse(
-                        success=False,
-                        message=f"Error processing document embeddings: {error_msg}"
-                    )
+            workspace = workspace or settings.DEFAULT_WORKSPACE
+            error = self._check_workspace(workspace)
+            if error is not None:
+                return error
             
-            # Store metadata in MongoDB
-            metadata = DocumentMetadata(
-                filename=file.filename,
-                file_path=file_path,
-                file_size=file_size,
-                num_chunks=len(chunks),
-                status="processed"
-            )
+            # Save file locally
+            with span("upload", "save_file"):
+                stored = await self.store.save_upload(file, file.filename)
+            logger.info(f"Saved file: {file.filename} ({stored.size} bytes, sha256 {stored.content_hash[:12]})")
             
-            collection = mongodb.get_collection("documents")
-            document_id = None
-            if collection is not None:
-                result = await collection.insert_one(metadata.dict())
-                document_id = str(result.inserted_id)
-            else:
-                logger.warning("MongoDB not available. Document metadata not stored.")
+            with span("upload", "dedupe_lookup"):
+                existing = await self._find_indexed([stored.content_hash], workspace)
+            duplicate = self._duplicate_response(file.filename, stored.content_hash, existing, workspace)
+            if duplicate is not None:
+                return duplicate
             
-            logger.info(f"Document processed successfully: {file.filename}")
+            # Parsing, chunking and embedding happen in the background
+            with span("upload", "enqueue"):
+                job = ingestion_service.submit(stored.path, file.filename, stored.size, stored.content_hash, workspace)
             
             return DocumentUploadResponse(
                 success=True,
-                message="Document uploaded and processed successfully",
-                document_id=document_id,
+                message="Document uploaded and queued for processing",
                 filename=file.filename,
-                num_chunks=len(chunks)
+                job_id=job.job_id,
+                status=job.status
             )
             
+        except FileTooLargeError as e:
+            return DocumentUploadResponse(success=False, message=str(e), filename=file.filename)
         except Exception as e:
             logger.error(f"Error processing document: {e}")
             return DocumentUploadResponse(
@@ -119,29 +108,318 @@ class DocumentService:
                 message=f"Error processing document: {str(e)}"
             )
     
-    async def get_all_documents(self):
-        """Get all documents from MongoDB"""
+    async def process_batch(self, files: List[UploadFile], workspace: Optional[str] = None) -> BatchUploadResponse:
+        """
+        Save many uploaded PDFs (or zip archives of PDFs) and queue them as one batch
+        
+        Files whose content is already indexed in the workspace, being
+        indexed, or repeated within the batch are reported without starting
+        another job.
+        
+        Args:
+            files: Uploaded files; .zip files are expanded to their PDFs
+            workspace: Workspace to add the documents to (default workspace if None)
+            
+        Returns:
+            BatchUploadResponse with the batch ID and a status per file
+        """
+        workspace = workspace or settings.DEFAULT_WORKSPACE
+        error = self._check_workspace(workspace)
+        if error is not None:
+            return BatchUploadResponse(success=False, message=error.message)
+        
+        results: List[DocumentUploadResponse] = []
+        saved: List[Tuple[str, StoredFile]] = []
+        
+        for file in files:
+            name = file.filename or ""
+            try:
+                if name.lower().endswith(".zip"):
+                    # One more than the allowance is enough to tell the batch is too large
+                    saved.extend(await self._save_zip(file.file, name, self.max_batch_files + 1 - len(saved)))
+                elif name.endswith(".pdf"):
+                    saved.append((name, await self.store.save_upload(file, name)))
+                else:
+                    results.append(DocumentUploadResponse(
+                        success=False,
+                        message="Only PDF and ZIP files are supported",
+                        filename=name
+                    ))
+            except Exception as e:
+                logger.error(f"Error saving {name}: {e}")
+                results.append(DocumentUploadResponse(
+                    success=False,
+                    message=str(e) if isinstance(e, FileTooLargeError) else f"Error saving file: {str(e)}",
+                    filename=name
+                ))
+            if len(saved) > self.max_batch_files:
+                # Stop at the first file past the limit instead of saving the rest
+                await self._remove_unused([stored for _, stored in saved])
+                return BatchUploadResponse(
+                    success=False,
+                    message=f"Too many PDFs in one batch (more than {self.max_batch_files})"
+                )
+        
+        existing = await self._find_indexed([stored.content_hash for _, stored in saved], workspace)
+        
+        to_ingest = []
+        seen = set()
+        for name, stored in saved:
+            if stored.content_hash in seen:
+                results.append(DocumentUploadResponse(
+                    success=True,
+                    message="Duplicate of another file in this batch",
+                    filename=name,
+                    status="completed"
+                ))
+                continue
+            seen.add(stored.content_hash)
+            duplicate = self._duplicate_response(name, stored.content_hash, existing, workspace)
+            if duplicate is not None:
+                results.append(duplicate)
+            else:
+                to_ingest.append((stored.path, name, stored.size, stored.content_hash))
+        
+        if not to_ingest:
+            queued_any = any(result.success for result in results)
+            return BatchUploadResponse(
+                success=queued_any,
+                message="All documents were already uploaded" if queued_any else "No PDF files to process",
+                files=results
+            )
+        
+        batch_id, jobs = ingestion_service.submit_batch(to_ingest, workspace)
+        results = [
+            DocumentUploadResponse(
+                success=True,
+                message="Document uploaded and queued for processing",
+                filename=job.filename,
+                job_id=job.job_id,
+                status=job.status
+            )
+            for job in jobs
+        ] + results
+        
+        return BatchUploadResponse(
+            success=True,
+            message=f"{len(jobs)} document(s) queued for processing",
+            batch_id=batch_id,
+            files=results
+        )
+    
+    def _check_workspace(self, workspace: str) -> Optional[DocumentUploadResponse]:
+        """Error response for an invalid workspace name, else None"""
         try:
-            collection = mongodb.get_collection("documents")
-            if collection is None:
-                logger.warning("MongoDB not available. Returning empty document list.")
-                return []
-            documents = []
-            async for doc in collection.find():
-                doc["id"] = str(doc["_id"])
-                del doc["_id"]
-                documents.append(doc)
-            return documents
-        except Exception as e:
-            logger.error(f"Error retrieving documents: {e}")
-            return []
+            collection_for_workspace(workspace)
+        except ValueError as e:
+            return DocumentUploadResponse(success=False, message=str(e))
+        return None
+    
+    async def _find_indexed(self, content_hashes: List[str], workspace: Optional[str] = None) -> Dict[str, dict]:
+        """
+        Documents already stored for any of the given content hashes
+        
+        Args:
+            content_hashes: SHA-256 hashes to look up
+            workspace: Only look in this workspace (None for every workspace)
+        """
+        collection = mongodb.get_collection("documents")
+        if collection is None or not content_hashes:
+            return {}
+        query = {"content_hash": {"$in": list(set(content_hashes))}}
+        if workspace is not None:
+            query.update(workspace_query(workspace))
+        found = {}
+        async for doc in collection.find(query, {"content_hash": 1, "num_chunks": 1}):
+            found.setdefault(doc["content_hash"], doc)
+        return found
+    
+    def _duplicate_response(
+        self,
+        filename: str,
+        content_hash: str,
+        existing: Dict[str, dict],
+        workspace: Optional[str] = None
+    ) -> Optional[DocumentUploadResponse]:
+        """Response for content that is already indexed or being indexed in the workspace, else None"""
+        doc = existing.get(content_hash)
+        if doc is not None:
+            logger.info(f"Skipping ingestion of {filename}: identical content already indexed")
+            return DocumentUploadResponse(
+                success=True,
+                message="Document already uploaded; reusing the existing index",
+                document_id=str(doc["_id"]),
+                filename=filename,
+                num_chunks=doc.get("num_chunks"),
+                status="completed"
+            )
+        job = ingestion_service.find_active(content_hash, workspace)
+        if job is not None:
+            return DocumentUploadResponse(
+                success=True,
+                message="An identical document is already being processed",
+                filename=filename,
+                job_id=job.job_id,
+                status=job.status
+            )
+        return None
+    
+    async def _save_zip(self, source: BinaryIO, filename: str, max_files: int) -> List[Tuple[str, StoredFile]]:
+        """
+        Extract the PDFs of an uploaded zip archive, one member at a time
+        
+        Extraction stops after max_files PDFs. If a member can't be saved
+        (e.g. it is too large), the PDFs already extracted are removed
+        before the error is raised.
+        
+        Returns:
+            (member filename, stored file) per PDF
+        """
+        extracted: List[Tuple[str, StoredFile]] = []
+        
+        def extract():
+            with zipfile.ZipFile(source) as archive:
+                for member in archive.infolist():
+                    if len(extracted) >= max_files:
+                        break
+                    name = os.path.basename(member.filename)
+                    # Skip folders, macOS resource forks and non-PDFs
+                    if member.is_dir() or name.startswith("._") or not name.endswith(".pdf"):
+                        continue
+                    with archive.open(member) as pdf:
+                        extracted.append((name, self.store.save_fileobj(pdf, name)))
+            logger.info(f"Extracted {len(extracted)} PDF(s) from {filename}")
+        
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, extract)
+        except Exception:
+            await self._remove_unused([stored for _, stored in extracted])
+            raise
+        return extracted
+    
+    async def _remove_unused(self, stored_files: List[StoredFile]):
+        """Remove files saved for a rejected upload, but not ones that documents or active jobs use"""
+        if not stored_files:
+            return
+        in_use = await self._find_indexed([stored.content_hash for stored in stored_files])
+        unused = {
+            stored.content_hash: stored.path for stored in stored_files
+            if stored.content_hash not in in_use and ingestion_service.find_active(stored.content_hash) is None
+        }
+        for path in unused.values():
+            if os.path.exists(path):
+                os.remove(path)
+    
+    async def list_documents(
+        self,
+        workspace: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Get one page of documents, oldest first
+        
+        Args:
+            workspace: Only list documents of this workspace
+            limit: Page size
+            cursor: next_cursor of the previous page
+        
+        Returns:
+            (documents, cursor of the next page or None on the last page)
+        
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        after = id_cursor(cursor)
+        collection = mongodb.get_collection("documents")
+        if collection is None:
+            logger.warning("MongoDB not available. Returning empty document list.")
+            return [], None
+        query = {} if workspace is None else workspace_query(workspace)
+        if after is not None:
+            query["_id"] = {"$gt": after}
+        
+        # One extra document tells whether there is a next page
+        documents = []
+        async for doc in collection.find(query, DOCUMENT_LIST_FIELDS).sort("_id", 1).limit(limit + 1):
+            doc["id"] = str(doc.pop("_id"))
+            documents.append(doc)
+        if len(documents) > limit:
+            return documents[:limit], documents[limit - 1]["id"]
+        return documents, None
+    
+    async def get_document_stats(self, workspace: Optional[str] = None) -> Dict:
+        """Document count, total size and total chunks, summed by MongoDB"""
+        collection = mongodb.get_collection("documents")
+        totals = {"total_documents": 0, "total_size": 0, "total_chunks": 0}
+        if collection is None:
+            logger.warning("MongoDB not available. Returning empty document stats.")
+            return totals
+        pipeline = [
+            {"$match": {} if workspace is None else workspace_query(workspace)},
+            {"$group": {
+                "_id": None,
+                "total_documents": {"$sum": 1},
+                "total_size": {"$sum": "$file_size"},
+                "total_chunks": {"$sum": "$num_chunks"}
+            }}
+        ]
+        async for row in collection.aggregate(pipeline):
+            totals.update({key: row[key] for key in totals})
+        return totals
     
     async def delete_document(self, document_id: str):
-        """Delete document by ID"""
+        """
+        Delete a document, its vectors and its stored file
+        
+        Args:
+            document_id: Document ID to delete
+            
+        Returns:
+            True if the document existed
+        """
         try:
             from bson import ObjectId
             collection = mongodb.get_collection("documents")
-            result = await collection.delete_one({"_id": ObjectId(document_id)})
+            doc = await collection.find_one(
+                {"_id": ObjectId(document_id)},
+                {"chunk_ids": 1, "content_hash": 1, "file_path": 1, "workspace": 1}
+            )
+            if doc is None:
+                return False
+            
+            # Identical uploads share the stored file, and within a
+            # workspace also their chunk IDs
+            others = []
+            if doc.get("content_hash"):
+                async for other in collection.find(
+                    {"content_hash": doc["content_hash"], "_id": {"$ne": doc["_id"]}},
+                    {"workspace": 1}
+                ):
+                    others.append(other.get("workspace") or settings.DEFAULT_WORKSPACE)
+            workspace = doc.get("workspace") or settings.DEFAULT_WORKSPACE
+            
+            if workspace not in others:
+                collection_name = collection_for_workspace(workspace)
+                loop = asyncio.get_running_loop()
+                if doc.get("chunk_ids"):
+                    await loop.run_in_executor(
+                        None,
+                        partial(vector_store_manager.delete, doc["chunk_ids"], collection_name)
+                    )
+                elif doc.get("file_path"):
+                    # Documents ingested before chunk IDs were recorded
+                    await loop.run_in_executor(
+                        None,
+                        partial(vector_store_manager.delete, collection_name=collection_name, where={"source": doc["file_path"]})
+                    )
+            
+            if not others and doc.get("file_path") and os.path.exists(doc["file_path"]):
+                os.remove(doc["file_path"])
+            
+            result = await collection.delete_one({"_id": doc["_id"]})
+            logger.info(f"Deleted document {document_id} ({len(doc.get('chunk_ids', []))} chunks)")
             return result.deleted_count > 0
         except Exception as e:
             logger.error(f"Error deleting document: {e}")
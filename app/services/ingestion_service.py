@@ -0,0 +1,385 @@
+"""
+Background ingestion of uploaded documents
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import List, Optional, Tuple
+import asyncio
+import threading
+import time
+import uuid
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from app.core.config import settings
+from app.core.database import mongodb, workspace_query
+from app.core.embedding_cache import count_reused
+from app.core.metrics import LATENCY_BUCKETS, metrics, span
+from app.core.vector_store import collection_for_workspace, vector_store_manager
+from app.utils.pdf_loader import PDFLoaderUtil, shutdown_pool
+from app.utils.text_splitter import text_splitter
+from app.utils.hashing import chunk_id, file_sha256
+from app.models.document_model import DocumentMetadata, IngestionJob
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def describe_embedding_error(error: Exception) -> str:
+    """Turn an embedding/vector store error into a user-facing message"""
+    error_msg = str(error)
+    
+    # Check for specific OpenAI errors
+    if "insufficient_quota" in error_msg or "exceeded your current quota" in error_msg:
+        return "OpenAI API quota exceeded. Please add credits to your OpenAI account at https://platform.openai.com/settings/organization/billing"
+    elif "rate_limit" in error_msg:
+        return "OpenAI API rate limit reached. Please wait a moment and try again."
+    else:
+        return f"Error processing document embeddings: {error_msg}"
+
+
+class IngestionService:
+    """Run PDF parsing, chunking and embedding in a bounded worker pool"""
+    
+    def __init__(self):
+        self.max_workers = settings.INGESTION_WORKERS
+        self.batch_size = settings.INGESTION_BATCH_SIZE
+        self.max_jobs = settings.INGESTION_MAX_JOBS
+        self.metadata_batch_size = settings.INGESTION_METADATA_BATCH_SIZE
+        self.metadata_flush_interval = settings.INGESTION_METADATA_FLUSH_MS / 1000.0
+        self.pdf_loader = PDFLoaderUtil()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._tasks = set()
+        self._lock = threading.Lock()
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Create the worker pool on first use"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="ingestion"
+            )
+        return self._executor
+    
+    def submit(
+        self,
+        file_path: str,
+        filename: str,
+        file_size: int,
+        content_hash: Optional[str] = None,
+        workspace: Optional[str] = None
+    ) -> IngestionJob:
+        """
+        Enqueue an ingestion job for a saved PDF
+        
+        Must be called from the event loop. The job runs in the worker pool
+        and its document metadata is written to MongoDB once it completes.
+        
+        Args:
+            file_path: Path of the saved PDF
+            filename: Original upload filename
+            file_size: Size of the saved file in bytes
+            content_hash: SHA-256 of the file, if already known
+            workspace: Workspace to index the document into (default workspace if None)
+        
+        Returns:
+            The queued IngestionJob
+        """
+        job = self._new_job(file_path, filename, file_size, content_hash, workspace=workspace)
+        self._start(self._run_batch([job]))
+        logger.info(f"Queued ingestion job {job.job_id} for {filename}")
+        return job
+    
+    def submit_batch(
+        self,
+        files: List[Tuple[str, str, int, Optional[str]]],
+        workspace: Optional[str] = None
+    ) -> Tuple[str, List[IngestionJob]]:
+        """
+        Enqueue ingestion jobs for many saved PDFs
+        
+        Files are ingested concurrently, bounded by the worker pool size, so
+        their chunks share embedding batches. Document metadata is written
+        with insert_many in groups of metadata_batch_size.
+        
+        Args:
+            files: (file path, original filename, file size, content hash or None) per PDF
+            workspace: Workspace to index the documents into (default workspace if None)
+        
+        Returns:
+            (batch ID, queued jobs in input order)
+        """
+        batch_id = uuid.uuid4().hex
+        jobs = [
+            self._new_job(path, filename, size, content_hash, batch_id, workspace)
+            for path, filename, size, content_hash in files
+        ]
+        self._start(self._run_batch(jobs))
+        logger.info(f"Queued ingestion batch {batch_id} with {len(jobs)} file(s)")
+        return batch_id, jobs
+    
+    def _new_job(
+        self,
+        file_path: str,
+        filename: str,
+        file_size: int,
+        content_hash: Optional[str] = None,
+        batch_id: Optional[str] = None,
+        workspace: Optional[str] = None
+    ) -> IngestionJob:
+        """Create and register a queued job"""
+        job = IngestionJob(
+            workspace=workspace or settings.DEFAULT_WORKSPACE,
+            job_id=uuid.uuid4().hex,
+            filename=filename,
+            file_path=file_path,
+            file_size=file_size,
+            content_hash=content_hash,
+            batch_id=batch_id,
+            # Assigned up front so chunks can be tagged with it during ingestion
+            document_id=str(ObjectId())
+        )
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune_jobs()
+        return job
+    
+    def _start(self, coroutine):
+        """Run a coroutine as a background task"""
+        task = asyncio.create_task(coroutine)
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        """Get a job by ID"""
+        return self._jobs.get(job_id)
+    
+    def find_active(self, content_hash: str, workspace: Optional[str] = None) -> Optional[IngestionJob]:
+        """Get an unfinished job for the same content, in the given workspace or any if None"""
+        with self._lock:
+            for job in self._jobs.values():
+                if (
+                    job.content_hash == content_hash
+                    and (workspace is None or job.workspace == workspace)
+                    and job.finished_at is None
+                ):
+                    return job
+        return None
+    
+    def get_batch(self, batch_id: str) -> List[IngestionJob]:
+        """Get the (still retained) jobs of a batch"""
+        with self._lock:
+            return [job for job in self._jobs.values() if job.batch_id == batch_id]
+    
+    def _prune_jobs(self):
+        """Forget the oldest finished jobs beyond the retention limit"""
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [j.job_id for j in self._jobs.values() if j.finished_at is not None][:excess]:
+            del self._jobs[job_id]
+    
+    async def _run_batch(self, jobs: List[IngestionJob]):
+        """
+        Run the CPU-heavy stages off the event loop, then store metadata
+        
+        Metadata of finished documents is written metadata_batch_size at a
+        time, or metadata_flush_interval after the first one is waiting,
+        whichever comes first, so documents become visible promptly even
+        while the rest of the batch is still being ingested.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        
+        async def ingest(job: IngestionJob):
+            ids = []
+            try:
+                return job, await loop.run_in_executor(executor, self._ingest, job, ids), None
+            except Exception as e:
+                if ids:
+                    # Don't leave a partially indexed document behind
+                    await self._remove_partial(job, ids)
+                return job, None, e
+        
+        running = {asyncio.ensure_future(ingest(job)) for job in jobs}
+        pending = []
+        flush_at = None
+        while running:
+            timeout = None if flush_at is None else max(0.0, flush_at - loop.time())
+            finished, running = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                job, result, error = task.result()
+                if error is not None:
+                    logger.error(f"Ingestion job {job.job_id} failed: {error}")
+                    self._finish(job, "failed", str(error) if job.message is None else job.message)
+                    continue
+                
+                content_hash, ids = result
+                metadata = DocumentMetadata(
+                    filename=job.filename,
+                    file_path=job.file_path,
+                    file_size=job.file_size,
+                    num_chunks=job.chunks_total,
+                    status="processed",
+                    content_hash=content_hash,
+                    chunk_ids=ids,
+                    workspace=job.workspace
+                )
+                pending.append((job, {"_id": ObjectId(job.document_id), **metadata.dict()}))
+                if flush_at is None:
+                    flush_at = loop.time() + self.metadata_flush_interval
+            
+            if pending and (len(pending) >= self.metadata_batch_size or loop.time() >= flush_at):
+                await self._store_metadata(pending)
+                pending = []
+                flush_at = None
+        
+        if pending:
+            await self._store_metadata(pending)
+    
+    async def _store_metadata(self, pending: List[Tuple[IngestionJob, dict]]):
+        """Store document metadata in MongoDB with one insert_many and finish the jobs"""
+        failed = {}
+        try:
+            collection = mongodb.get_collection("documents")
+            if collection is not None:
+                with span("ingest", "store_metadata"):
+                    await collection.insert_many([document for _, document in pending], ordered=False)
+            else:
+                logger.warning("MongoDB not available. Document metadata not stored.")
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                failed[write_error["index"]] = write_error.get("errmsg", "write error")
+        except Exception as e:
+            failed = {index: str(e) for index in range(len(pending))}
+        
+        for index, (job, _) in enumerate(pending):
+            if index in failed:
+                logger.error(f"Error storing metadata for job {job.job_id}: {failed[index]}")
+                self._finish(job, "failed", f"Error storing document metadata: {failed[index]}")
+            else:
+                logger.info(f"Document processed successfully: {job.filename}{self._cache_report(job)}")
+                self._finish(job, "completed", "Document uploaded and processed successfully")
+    
+    def _cache_report(self, job: IngestionJob) -> str:
+        """Embedding cache hits of a job and the overall hit rate, for its log line"""
+        if vector_store_manager.embedding_cache is None or not job.chunks_embedded:
+            return ""
+        hit_rate = vector_store_manager.embedding_cache.stats()["hit_rate"]
+        return (
+            f" (embedding cache: {job.chunks_reused}/{job.chunks_embedded} chunks reused, "
+            f"overall hit rate {hit_rate:.1%})"
+        )
+    
+    async def _remove_partial(self, job: IngestionJob, ids: List[str]):
+        """
+        Delete the chunks a failed job wrote
+        
+        Chunk IDs are content hashes, so an indexed document with the same
+        content in the workspace (a concurrent re-upload, an older
+        duplicate) may own the same IDs; those are kept.
+        """
+        try:
+            collection = mongodb.get_collection("documents") if mongodb.db is not None else None
+            if collection is not None:
+                referenced = set()
+                content_hash = ids[0].rsplit(":", 1)[0]
+                async for doc in collection.find(
+                    {"content_hash": content_hash, **workspace_query(job.workspace)}, {"chunk_ids": 1}
+                ):
+                    referenced.update(doc.get("chunk_ids") or [])
+                ids = [chunk_id for chunk_id in ids if chunk_id not in referenced]
+            if ids:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(
+                    None,
+                    partial(vector_store_manager.delete, ids, collection_for_workspace(job.workspace))
+                )
+        except Exception as cleanup_error:
+            logger.error(f"Error removing partial chunks of job {job.job_id}: {cleanup_error}")
+    
+    def _ingest(self, job: IngestionJob, ids: List[str]):
+        """
+        Parse, split and embed one PDF (runs in a worker thread)
+        
+        Pages are streamed through the splitter and written to the vector
+        store in batches of batch_size chunks, so at most one page and one
+        batch are held in memory regardless of the document's size. IDs of
+        written chunks are appended to ids as batches complete, so the
+        caller can remove them if a later batch fails.
+        
+        Returns:
+            (content hash, chunk IDs)
+        """
+        job.status = "processing"
+        content_hash = job.content_hash or file_sha256(job.file_path)
+        
+        def pages():
+            iterator = iter(self.pdf_loader.iter_pages(job.file_path))
+            while True:
+                with span("ingest", "parse_page"):
+                    page = next(iterator, None)
+                if page is None:
+                    return
+                job.pages_total = page.metadata.get("total_pages", job.pages_total)
+                yield page
+                job.pages_parsed += 1
+        
+        started = time.perf_counter()
+        batch = []
+        for chunk in text_splitter.iter_chunks(pages()):
+            # Tag chunks with their document so they can be purged on delete
+            chunk.metadata["document_id"] = job.document_id
+            chunk.metadata["filename"] = job.filename
+            batch.append(chunk)
+            job.chunks_total += 1
+            if len(batch) >= self.batch_size:
+                self._write_batch(job, content_hash, batch, ids)
+                batch = []
+        if batch:
+            self._write_batch(job, content_hash, batch, ids)
+        
+        metrics.histogram(
+            "ingest_document_seconds",
+            "Time to parse, chunk and embed one document",
+            LATENCY_BUCKETS
+        ).observe(time.perf_counter() - started)
+        return content_hash, ids
+    
+    def _write_batch(self, job: IngestionJob, content_hash: str, batch: list, ids: list):
+        """Embed and upsert one batch of chunks, recording their IDs"""
+        batch_ids = [chunk_id(content_hash, len(ids) + i) for i in range(len(batch))]
+        try:
+            with span("ingest", "embed_write"), count_reused() as reused:
+                vector_store_manager.add_documents(batch, collection_for_workspace(job.workspace), ids=batch_ids)
+        except Exception as embed_error:
+            logger.error(f"Error adding to vector store: {embed_error}")
+            job.message = describe_embedding_error(embed_error)
+            raise
+        ids.extend(batch_ids)
+        job.chunks_embedded += len(batch)
+        job.chunks_reused += reused[0]
+        logger.info(
+            f"Job {job.job_id}: page {job.pages_parsed}/{job.pages_total or '?'}, "
+            f"{job.chunks_embedded} chunks embedded"
+        )
+    
+    def _finish(self, job: IngestionJob, status: str, message: str):
+        """Mark a job as finished"""
+        job.status = status
+        job.message = message
+        job.finished_at = datetime.utcnow()
+    
+    def shutdown(self):
+        """Stop the worker pools, abandoning jobs that haven't started"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        shutdown_pool()
+
+
+# Global ingestion service instance
+ingestion_service = IngestionService()
@@ -0,0 +1,81 @@
+"""
+State shared between processes through files
+"""
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no advisory locks, so only single-process deployments are safe
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False) -> Iterator[None]:
+    """
+    Hold an advisory lock on path (created if missing) while the block runs
+    
+    Locks are taken per open file, so they exclude other threads of the
+    same process as well as other processes.
+    
+    Args:
+        path: Lock file path
+        shared: Take a shared (reader) lock instead of an exclusive one
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+class SharedCounter:
+    """
+    Integer counter stored in a file, for every process using a directory
+    
+    increment() rewrites the file under a file lock. Reading re-parses the
+    file only when its stat() changed, so it costs one system call.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._value = 0
+        self._lock = threading.Lock()
+    
+    def _read(self) -> int:
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+    
+    @property
+    def value(self) -> int:
+        """Current value (0 before the first increment)"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+        stamp = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                self._value = self._read()
+                self._stamp = stamp
+        return self._value
+    
+    def increment(self) -> int:
+        """Add one and return the new value"""
+        with file_lock(self.path + ".lock"):
+            value = self._read() + 1
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(str(value))
+            os.replace(tmp_path, self.path)
+        return value
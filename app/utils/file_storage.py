@@ -0,0 +1,115 @@
+"""
+Content-addressed storage for uploaded files
+"""
+from typing import BinaryIO, NamedTuple
+import hashlib
+import os
+import uuid
+import aiofiles
+import aiofiles.os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size limit"""
+
+
+class StoredFile(NamedTuple):
+    """A file saved in the store"""
+    path: str
+    content_hash: str
+    size: int
+
+
+class ContentAddressedStore:
+    """
+    Save files under the SHA-256 of their content
+    
+    Files are streamed in fixed-size chunks to a unique temporary file while
+    being hashed, then renamed to <directory>/<sha256><suffix>. Uploads with
+    the same name no longer overwrite each other, identical content is
+    stored once, and an oversized upload is rejected as soon as it crosses
+    the limit instead of after it has been written.
+    """
+    
+    def __init__(self, directory: str, max_size: int, chunk_size: int = 1024 * 1024, suffix: str = ".pdf"):
+        self.directory = directory
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.suffix = suffix
+        self.incoming_dir = os.path.join(directory, ".incoming")
+        os.makedirs(self.incoming_dir, exist_ok=True)
+    
+    def path_for(self, content_hash: str) -> str:
+        """Storage path of a content hash"""
+        return os.path.join(self.directory, content_hash + self.suffix)
+    
+    def _temp_path(self) -> str:
+        return os.path.join(self.incoming_dir, uuid.uuid4().hex + ".part")
+    
+    def _too_large(self, name: str) -> FileTooLargeError:
+        return FileTooLargeError(f"{name} exceeds the maximum upload size of {self.max_size // (1024 * 1024)} MB")
+    
+    async def save_upload(self, upload, name: str = "upload") -> StoredFile:
+        """
+        Stream an async file-like object (e.g. FastAPI's UploadFile) into the store
+        
+        Raises:
+            FileTooLargeError: If the content exceeds max_size
+        """
+        digest = hashlib.sha256()
+        size = 0
+        temp_path = self._temp_path()
+        try:
+            async with aiofiles.open(temp_path, "wb") as out:
+                while True:
+                    chunk = await upload.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_size:
+                        raise self._too_large(name)
+                    digest.update(chunk)
+                    await out.write(chunk)
+            path = self.path_for(digest.hexdigest())
+            if await aiofiles.os.path.exists(path):
+                # Same bytes are already stored
+                await aiofiles.os.remove(temp_path)
+            else:
+                await aiofiles.os.replace(temp_path, path)
+            return StoredFile(path, digest.hexdigest(), size)
+        except BaseException:
+            if await aiofiles.os.path.exists(temp_path):
+                await aiofiles.os.remove(temp_path)
+            raise
+    
+    def save_fileobj(self, source: BinaryIO, name: str = "file") -> StoredFile:
+        """
+        Blocking variant of save_upload for sync file objects (e.g. zip members)
+        
+        Run it in a worker thread.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        temp_path = self._temp_path()
+        try:
+            with open(temp_path, "wb") as out:
+                for chunk in iter(lambda: source.read(self.chunk_size), b""):
+                    size += len(chunk)
+                    if size > self.max_size:
+                        raise self._too_large(name)
+                    digest.update(chunk)
+                    out.write(chunk)
+            path = self.path_for(digest.hexdigest())
+            if os.path.exists(path):
+                # Same bytes are already stored
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, path)
+            return StoredFile(path, digest.hexdigest(), size)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
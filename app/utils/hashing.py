@@ -0,0 +1,46 @@
+"""
+Content hashing utilities
+"""
+from typing import List
+import hashlib
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    Compute the SHA-256 of a file without reading it into memory at once
+    
+    Args:
+        file_path: Path to file
+        
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids(content_hash: str, num_chunks: int) -> List[str]:
+    """
+    Deterministic vector store IDs for the chunks of a file
+    
+    Re-indexing the same content yields the same IDs, so writes replace
+    existing vectors instead of duplicating them.
+    
+    Args:
+        content_hash: SHA-256 of the source file
+        num_chunks: Number of chunks
+        
+    Returns:
+        List of chunk IDs in chunk order
+    """
+    return [chunk_id(content_hash, i) for i in range(num_chunks)]
+
+
+def chunk_id(content_hash: str, index: int) -> str:
+    """Vector store ID of one chunk (see chunk_ids)"""
+    return f"{content_hash}:{index}"
@@ -1,13 +1,91 @@
 """
 PDF document loader utility
 """
-from langchain_community.document_loaders import PyPDFLoader
-from typing import List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 from langchain_core.documents import Document
+from app.core.config import settings
+import multiprocessing
+import os
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Per worker process: the last opened reader, so consecutive page ranges of
+# one file don't re-parse its cross-reference table
+_reader_cache: Dict[Tuple[str, int], object] = {}
+
+
+def extraction_workers() -> int:
+    """Configured number of extraction processes (0 means one per CPU core)"""
+    return settings.PDF_EXTRACTION_WORKERS or os.cpu_count() or 1
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Create the shared extraction pool on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawn rather than fork: the server process has threads (event
+            # loop executors, Chroma) that must not be forked mid-operation
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the extraction processes"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _open_reader(file_path: str):
+    import pypdf
+    
+    key = (file_path, os.stat(file_path).st_mtime_ns)
+    reader = _reader_cache.get(key)
+    if reader is None:
+        _reader_cache.clear()
+        reader = _reader_cache[key] = pypdf.PdfReader(file_path)
+    return reader
+
+
+def _page_text(page) -> str:
+    """Text of one page; both extraction paths use it so they produce identical chunks"""
+    return page.extract_text().strip()
+
+
+def _document_metadata(file_path: str, reader, num_pages: int) -> Dict:
+    """Metadata shared by every page of a document"""
+    metadata = {"source": file_path, "total_pages": num_pages}
+    for key, value in (reader.metadata or {}).items():
+        if isinstance(value, str):
+            metadata.setdefault(key.lstrip("/").lower(), value)
+    return metadata
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[str, str]]:
+    """
+    Extract the text of pages [start, end) (runs in a worker process)
+    
+    Returns:
+        (text, page label) per page, in page order
+    """
+    reader = _open_reader(file_path)
+    # pypdf rebuilds the whole label list on every page_labels access
+    labels = reader.page_labels
+    return [(_page_text(reader.pages[number]), labels[number]) for number in range(start, end)]
+
 
 class PDFLoaderUtil:
     """Utility class for loading PDF documents"""
@@ -23,11 +101,88 @@ class PDFLoaderUtil:
         Returns:
             List of Document objects
         """
+        documents = list(PDFLoaderUtil.iter_pages(file_path, workers=1))
+        logger.info(f"Loaded {len(documents)} pages from {file_path}")
+        return documents
+    
+    @staticmethod
+    def iter_pages(file_path: str, workers: Optional[int] = None) -> Iterator[Document]:
+        """
+        Yield PDF pages one at a time, in order
+        
+        Large files are extracted in parallel: page ranges are sharded
+        across a process pool and reassembled in order. Only a bounded
+        number of ranges are in flight, so memory use does not grow with
+        the number of pages. Both paths yield the same text and metadata
+        ("source", "total_pages", "page", "page_label" and the document
+        info) for a page, so chunks don't depend on the worker settings.
+        
+        Args:
+            file_path: Path to PDF file
+            workers: Extraction processes (default: PDF_EXTRACTION_WORKERS)
+            
+        Yields:
+            One Document per page
+        """
+        workers = workers or extraction_workers()
+        try:
+            import pypdf
+            reader = pypdf.PdfReader(file_path)
+            num_pages = len(reader.pages)
+            metadata = _document_metadata(file_path, reader, num_pages)
+        except Exception as e:
+            logger.error(f"Error loading PDF {file_path}: {e}")
+            raise ValueError(f"Failed to load PDF: {str(e)}")
+        
+        if workers > 1 and num_pages >= settings.PDF_PARALLEL_MIN_PAGES:
+            yield from PDFLoaderUtil._iter_pages_parallel(file_path, metadata, num_pages, workers)
+            return
+        
+        try:
+            labels = reader.page_labels
+            for number in range(num_pages):
+                yield Document(
+                    page_content=_page_text(reader.pages[number]),
+                    metadata={**metadata, "page": number, "page_label": labels[number]}
+                )
+            logger.info(f"Streamed {num_pages} pages from {file_path}")
+        except Exception as e:
+            logger.error(f"Error loading PDF {file_path}: {e}")
+            raise ValueError(f"Failed to load PDF: {str(e)}")
+    
+    @staticmethod
+    def _iter_pages_parallel(file_path: str, metadata: Dict, num_pages: int, workers: int) -> Iterator[Document]:
+        """Extract page ranges in the process pool, yielding pages in order"""
+        pool = _get_pool(workers)
+        step = max(1, settings.PDF_PAGES_PER_TASK)
+        ranges = iter(range(0, num_pages, step))
+        in_flight = deque()
+        
+        def submit_next() -> bool:
+            start = next(ranges, None)
+            if start is None:
+                return False
+            end = min(start + step, num_pages)
+            in_flight.append((start, pool.submit(_extract_page_range, file_path, start, end)))
+            return True
+        
         try:
-            loader = PyPDFLoader(file_path)
-            documents = loader.load()
-            logger.info(f"Loaded {len(documents)} pages from {file_path}")
-            return documents
+            # Keep every worker busy with one range queued behind it
+            while len(in_flight) < 2 * workers and submit_next():
+                pass
+            while in_flight:
+                start, future = in_flight.popleft()
+                pages = future.result()
+                submit_next()
+                for offset, (text, label) in enumerate(pages):
+                    yield Document(
+                        page_content=text,
+                        metadata={**metadata, "page": start + offset, "page_label": label}
+                    )
+            logger.info(f"Extracted {num_pages} pages from {file_path} with {workers} processes")
         except Exception as e:
             logger.error(f"Error loading PDF {file_path}: {e}")
             raise ValueError(f"Failed to load PDF: {str(e)}")
+        finally:
+            for _, future in in_flight:
+                future.cancel()
@@ -2,7 +2,7 @@
 Text splitting utility
 """
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List
+from typing import Iterable, Iterator, List
 from langchain_core.documents import Document
 from app.core.config import settings
 import logging
@@ -38,6 +38,27 @@ class TextSplitterUtil:
         except Exception as e:
             logger.error(f"Error splitting documents: {e}")
             raise ValueError(f"Failed to split documents: {str(e)}")
+    
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Split documents lazily, one document at a time
+        
+        Produces the same chunks as split_documents() (chunks never span
+        documents) without holding them all in memory.
+        
+        Args:
+            documents: Iterable of Document objects, e.g. streamed PDF pages
+            
+        Yields:
+            Chunked Document objects in order
+        """
+        for document in documents:
+            try:
+                chunks = self.text_splitter.split_documents([document])
+            except Exception as e:
+                logger.error(f"Error splitting documents: {e}")
+                raise ValueError(f"Failed to split documents: {str(e)}")
+            yield from chunks
 
 
 # Global text splitter instance
@@ -0,0 +1,127 @@
+"""
+Generate a synthetic PDF corpus with a labeled question set
+
+Each document is filler text (see synthetic_pdf.random_pages) with a few
+fact sentences planted on random pages. Every fact names a made-up project
+code, so exactly one chunk in the corpus answers its question. The labels
+(question, file, page, answer) are written to questions.json next to the
+PDFs.
+
+Usage:
+    python benchmarks/corpus.py out_dir --documents 20 --pages 30 --facts 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from typing import Dict, List
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_pdf import random_pages, write_pdf
+
+QUESTIONS_FILE = "questions.json"
+
+SYLLABLES = (
+    "va ro mek tal quin zor bel dra fen lux nor pim sat kev oru yel "
+    "gar tho wen ix ud ral bri cos hep jun"
+).split()
+FIRST_NAMES = "Maren Idris Talia Oskar Priya Lucan Noor Emeric Sana Viggo Ada Teo".split()
+LAST_NAMES = "Holt Varga Okafor Lindqvist Mehta Duarte Ferris Nakamura Brandt Quayle".split()
+CITIES = "Tromso Valparaiso Krakow Hobart Tangier Winnipeg Cebu Tartu Arequipa Dunedin".split()
+MONTHS = "January February March April May June July August September October November December".split()
+
+# (fact sentence, question, answer kind)
+TEMPLATES = [
+    ("The budget of project {code} is owned by {answer}.", "Who owns the budget of project {code}?", "name"),
+    ("Project {code} ships from the {answer} warehouse.", "Which warehouse does project {code} ship from?", "city"),
+    ("The {code} contract renews on {answer}.", "When does the {code} contract renew?", "date"),
+]
+
+
+def _answer(rng: random.Random, kind: str) -> str:
+    if kind == "name":
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    if kind == "city":
+        return rng.choice(CITIES)
+    return f"{rng.randint(1, 28)} {rng.choice(MONTHS)} {rng.randint(2025, 2035)}"
+
+
+def _codes(rng: random.Random, count: int) -> List[str]:
+    """Distinct made-up project codes (three syllables, capitalized)"""
+    codes = set()
+    while len(codes) < count:
+        codes.add("".join(rng.choice(SYLLABLES) for _ in range(3)).capitalize())
+    # Sort before shuffling: set order varies between interpreter runs
+    codes = sorted(codes)
+    rng.shuffle(codes)
+    return codes
+
+
+def generate_corpus(
+    directory: str,
+    documents: int = 20,
+    pages: int = 30,
+    lines: int = 50,
+    facts: int = 5,
+    seed: int = 0
+) -> List[Dict]:
+    """
+    Write documents PDFs and questions.json to directory
+    
+    Args:
+        directory: Output directory (created if missing)
+        documents: Number of PDFs
+        pages: Pages per PDF
+        lines: Lines of filler text per page
+        facts: Labeled facts planted in each PDF
+        seed: Seed for text, facts and placement
+    
+    Returns:
+        The labeled questions: question, filename, page (1-based) and answer
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    codes = iter(_codes(rng, documents * facts))
+    questions = []
+    
+    for number in range(documents):
+        filename = f"doc_{number:04d}.pdf"
+        content = random_pages(pages, lines, seed=seed * 100003 + number)
+        for _ in range(facts):
+            fact, question, kind = rng.choice(TEMPLATES)
+            code, answer = next(codes), _answer(rng, kind)
+            page = rng.randrange(pages)
+            content[page].insert(rng.randint(0, len(content[page])), fact.format(code=code, answer=answer))
+            questions.append({
+                "question": question.format(code=code),
+                "filename": filename,
+                "page": page + 1,
+                "answer": answer
+            })
+        write_pdf(os.path.join(directory, filename), content)
+    
+    with open(os.path.join(directory, QUESTIONS_FILE), "w") as f:
+        json.dump(questions, f, indent=2)
+    return questions
+
+
+def load_questions(directory: str) -> List[Dict]:
+    """Labeled questions of a corpus written by generate_corpus"""
+    with open(os.path.join(directory, QUESTIONS_FILE)) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic PDF corpus with labeled questions")
+    parser.add_argument("directory")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=30, help="Pages per document")
+    parser.add_argument("--lines", type=int, default=50, help="Lines of text per page")
+    parser.add_argument("--facts", type=int, default=5, help="Labeled facts per document")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    labeled = generate_corpus(args.directory, args.documents, args.pages, args.lines, args.facts, args.seed)
+    print(f"Wrote {args.documents} PDFs and {len(labeled)} labeled questions to {args.directory}")
@@ -0,0 +1,58 @@
+"""
+Benchmark PDF text extraction throughput (pages/sec) vs. worker processes
+
+Usage:
+    python benchmarks/pdf_extraction.py --pages 400 --workers 1,2,4,8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import pdf_loader
+from app.utils.pdf_loader import PDFLoaderUtil
+from benchmarks.synthetic_pdf import random_pages, write_pdf
+
+
+def extract(path: str, workers: int):
+    """Extract all pages and return (texts, seconds)"""
+    start = time.perf_counter()
+    texts = [page.page_content for page in PDFLoaderUtil.iter_pages(path, workers=workers)]
+    return texts, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parallel PDF text extraction")
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--lines", type=int, default=50, help="Lines of text per page")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per worker count (best is reported)")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "benchmark.pdf")
+        write_pdf(path, random_pages(args.pages, args.lines))
+        print(f"{args.pages}-page PDF ({os.path.getsize(path) / 1024 / 1024:.1f} MB), {os.cpu_count()} CPU core(s)\n")
+        
+        baseline = None
+        expected = None
+        print(f"{'workers':>8} {'pages/sec':>10} {'seconds':>9} {'speedup':>8}")
+        for workers in [int(w) for w in args.workers.split(",")]:
+            # Start the pool outside the timed runs; it is long-lived in the app
+            pdf_loader.shutdown_pool()
+            texts, _ = extract(path, workers)
+            
+            if expected is None:
+                expected = texts
+            elif texts != expected:
+                print(f"  warning: {workers} workers produced different text than {args.workers.split(',')[0]}")
+            
+            best = min(extract(path, workers)[1] for _ in range(args.repeat))
+            baseline = baseline or best
+            print(f"{workers:>8} {args.pages / best:>10.1f} {best:>9.3f} {baseline / best:>7.2f}x")
+        
+        pdf_loader.shutdown_pool()
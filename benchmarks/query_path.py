@@ -0,0 +1,69 @@
+"""
+Benchmark the chat query path: fresh Chroma handle per query vs cached handle
+
+Usage:
+    python benchmarks/query_path.py --queries 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.vector_store import vector_store_manager
+
+QUESTIONS = [
+    "What is the person's name?",
+    "Which programming languages are listed?",
+    "Summarize the work experience",
+    "What is the email address?",
+]
+
+
+def run(num_queries: int, fresh: bool, collection_name: str):
+    """Run queries through get_vector_store() + similarity search and return latencies in ms"""
+    latencies = []
+    for i in range(num_queries):
+        if fresh:
+            # Old behaviour: every query constructs a new Chroma object
+            vector_store_manager.invalidate(collection_name)
+        start = time.perf_counter()
+        retriever = vector_store_manager.get_vector_store(collection_name).as_retriever(
+            search_type="similarity",
+            search_kwargs={"k": 4}
+        )
+        retriever.invoke(QUESTIONS[i % len(QUESTIONS)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(name: str, latencies):
+    """Print latency percentiles"""
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{name:<8} mean={statistics.mean(ordered):7.2f}ms  p50={statistics.median(ordered):7.2f}ms  p95={p95:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200, help="Queries per mode")
+    parser.add_argument("--collection", default="documents", help="Chroma collection to query")
+    args = parser.parse_args()
+    
+    # Warm up the embedding model so it doesn't skew the first mode
+    run(5, fresh=False, collection_name=args.collection)
+    
+    before = run(args.queries, fresh=True, collection_name=args.collection)
+    after = run(args.queries, fresh=False, collection_name=args.collection)
+    
+    print(f"\nQuery path latency over {args.queries} queries:")
+    summarize("before", before)
+    summarize("after", after)
+    print(f"speedup (mean): {statistics.mean(before) / statistics.mean(after):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+End-to-end RAG benchmark: ingestion throughput, query latency, memory and recall
+
+Generates a synthetic corpus with labeled questions (see corpus.py), runs
+the FastAPI app in-process (httpx ASGI transport, no server or network)
+against a throwaway data directory, and writes the results as JSON so runs
+can be compared over time:
+
+- ingestion: batch upload until the last job finishes, in pages/s and chunks/s
+- query: POST /api/chat/query latency percentiles and queries/s per concurrency
+- stages: p50/p95/p99 of the pipeline stage histograms from app.core.metrics
+- recall: share of questions whose answering chunk is retrieved in the top k
+- memory: peak RSS of the process and of finished worker processes
+
+Settings come from the environment as usual (e.g. VECTOR_BACKEND=ivf), except
+that data paths point into the scratch directory, MongoDB uses the --database
+database (dropped afterwards), and the answer cache is off unless
+--answer-cache is given, so repeated questions are really answered.
+
+Usage:
+    python benchmarks/rag_suite.py --documents 20 --pages 30 --concurrency 1,4,16 --output results.json
+    VECTOR_BACKEND=ivf python benchmarks/rag_suite.py --corpus /tmp/corpus --queries 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add parent directory to path
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import QUESTIONS_FILE, generate_corpus, load_questions
+
+# Data paths redirected into the scratch directory
+DATA_PATHS = {
+    "UPLOAD_DIR": "uploads",
+    "CHROMA_DIR": "chroma",
+    "VECTOR_DIR": "vectors",
+    "BM25_DIR": "bm25",
+    "EMBEDDING_CACHE_PATH": "embedding_cache.sqlite3",
+    "HISTORY_SPILL_PATH": "chat_history_spill.jsonl"
+}
+
+# Settings recorded with the results
+REPORTED_SETTINGS = [
+    "VECTOR_BACKEND", "IVF_NLIST", "IVF_NPROBE", "IVF_VECTOR_DTYPE", "RETRIEVAL_K", "HYBRID_SEARCH",
+    "RERANKERS", "CHUNK_SIZE", "CHUNK_OVERLAP", "INGESTION_WORKERS", "INGESTION_BATCH_SIZE",
+    "EMBEDDING_BATCHING", "EMBEDDING_CACHE", "ANSWER_CACHE", "USE_LOCAL_MODELS", "LOCAL_EMBEDDING_MODEL"
+]
+
+
+def log(message: str):
+    """Progress goes to stderr so stdout stays valid JSON"""
+    print(message, file=sys.stderr)
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(max(int(round(q * len(ordered) + 0.5)) - 1, 0), len(ordered) - 1)]
+
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """Peak resident memory of this process and of its finished child processes"""
+    if resource is None:
+        return {"process": None, "children": None}
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "process": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def wait_ready(client, timeout: float = 600.0):
+    """Wait until models are loaded and the vector store is open"""
+    deadline = time.monotonic() + timeout
+    while (await client.get("/ready")).status_code != 200:
+        if time.monotonic() > deadline:
+            raise TimeoutError("Application did not become ready")
+        await asyncio.sleep(0.2)
+
+
+async def ingest(client, corpus_dir: str, filenames: List[str], files_per_request: int) -> Dict:
+    """Upload the corpus in batches and wait for every ingestion job to finish"""
+    start = time.perf_counter()
+    batch_ids = []
+    for offset in range(0, len(filenames), files_per_request):
+        files = []
+        for name in filenames[offset:offset + files_per_request]:
+            with open(os.path.join(corpus_dir, name), "rb") as f:
+                files.append(("files", (name, f.read(), "application/pdf")))
+        response = await client.post("/api/documents/upload/batch", files=files)
+        response.raise_for_status()
+        batch_ids.append(response.json()["batch_id"])
+    upload_seconds = time.perf_counter() - start
+    
+    jobs = []
+    for batch_id in batch_ids:
+        while True:
+            batch = (await client.get(f"/api/documents/batches/{batch_id}")).json()
+            if batch["queued"] == 0 and batch["processing"] == 0:
+                jobs.extend(batch["jobs"])
+                break
+            await asyncio.sleep(0.1)
+    seconds = time.perf_counter() - start
+    
+    pages = sum(job["pages_total"] for job in jobs)
+    chunks = sum(job["chunks_total"] for job in jobs)
+    return {
+        "documents": len(jobs),
+        "failed": sum(job["status"] == "failed" for job in jobs),
+        "pages": pages,
+        "chunks": chunks,
+        "upload_seconds": round(upload_seconds, 3),
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(pages / seconds, 2),
+        "chunks_per_second": round(chunks / seconds, 2)
+    }
+
+
+def measure_recall(questions: List[Dict], k: int) -> Dict:
+    """
+    Retrieval quality against the labeled questions
+    
+    A question is a hit when one of the top k chunks comes from the labeled
+    file and contains the answer; document recall only needs the file.
+    """
+    from app.core.retrieval import hybrid_retriever
+    from app.core.vector_store import vector_store_manager
+    
+    hits = document_hits = 0
+    reciprocal_ranks = 0.0
+    for item in questions:
+        vector = vector_store_manager.embeddings.embed_query(item["question"])
+        docs = hybrid_retriever.retrieve(item["question"], vector, k=k)
+        files = [doc.metadata.get("filename") for doc in docs]
+        document_hits += item["filename"] in files
+        for rank, doc in enumerate(docs, 1):
+            if doc.metadata.get("filename") == item["filename"] and item["answer"] in doc.page_content:
+                hits += 1
+                reciprocal_ranks += 1.0 / rank
+                break
+    return {
+        "questions": len(questions),
+        "k": k,
+        "recall_at_k": round(hits / len(questions), 4),
+        "document_recall_at_k": round(document_hits / len(questions), 4),
+        "mrr": round(reciprocal_ranks / len(questions), 4)
+    }
+
+
+async def measure_latency(client, questions: List[Dict], concurrency: int, total: int) -> Dict:
+    """Send total queries from concurrency workers; latencies include the whole HTTP round trip"""
+    latencies = []
+    errors = 0
+    pending = iter(range(total))
+    
+    async def worker():
+        nonlocal errors
+        for number in pending:
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/chat/query", json={"question": questions[number % len(questions)]["question"]}
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += response.status_code != 200
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+    
+    ordered = sorted(latencies)
+    return {
+        "queries": total,
+        "errors": errors,
+        "queries_per_second": round(total / seconds, 2),
+        "mean_ms": round(sum(ordered) / len(ordered), 2),
+        "p50_ms": round(percentile(ordered, 0.50), 2),
+        "p95_ms": round(percentile(ordered, 0.95), 2),
+        "p99_ms": round(percentile(ordered, 0.99), 2),
+        "max_ms": round(ordered[-1], 2)
+    }
+
+
+def stage_latencies() -> Dict[str, Dict]:
+    """Percentiles of the pipeline stage histograms recorded during the run"""
+    from app.core.metrics import metrics
+    return {
+        name: {key: snapshot[key] for key in ("count", "mean", "p50", "p95", "p99")}
+        for name, snapshot in sorted(metrics.snapshot().items())
+        if "_stage_seconds" in name
+    }
+
+
+async def run(args, corpus_dir: str, filenames: List[str], questions: List[Dict]) -> Dict:
+    import httpx
+    from app.main import app
+    from app.core.config import settings
+    from app.core.database import mongodb
+    
+    results = {"memory_mb": {"start": peak_rss_mb()}}
+    
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            start = time.perf_counter()
+            await wait_ready(client)
+            results["startup_seconds"] = round(time.perf_counter() - start, 3)
+            results["mongodb"] = mongodb.db is not None
+            
+            log(f"Ingesting {len(filenames)} documents...")
+            results["ingestion"] = await ingest(client, corpus_dir, filenames, args.files_per_request)
+            results["memory_mb"]["after_ingestion"] = peak_rss_mb()
+            log(json.dumps(results["ingestion"]))
+            
+            log(f"Measuring recall@{args.k} over {len(questions)} questions...")
+            results["recall"] = await asyncio.get_running_loop().run_in_executor(
+                None, measure_recall, questions, args.k
+            )
+            log(json.dumps(results["recall"]))
+            
+            # Warm-up queries are not measured
+            await measure_latency(client, questions, 1, min(5, len(questions)))
+            results["query"] = {}
+            for concurrency in [int(value) for value in args.concurrency.split(",")]:
+                log(f"Querying at concurrency {concurrency}...")
+                results["query"][str(concurrency)] = await measure_latency(
+                    client, questions, concurrency, args.queries
+                )
+                log(json.dumps(results["query"][str(concurrency)]))
+            results["memory_mb"]["after_queries"] = peak_rss_mb()
+            results["stages"] = stage_latencies()
+            
+            if mongodb.client is not None and not args.keep:
+                await mongodb.client.drop_database(settings.DATABASE_NAME)
+    
+    results["memory_mb"]["end"] = peak_rss_mb()
+    results["settings"] = {name: getattr(settings, name) for name in REPORTED_SETTINGS}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="Corpus directory to use (generated there if it has no questions.json)")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=30, help="Pages per document")
+    parser.add_argument("--lines", type=int, default=50, help="Lines of text per page")
+    parser.add_argument("--facts", type=int, default=5, help="Labeled facts per document")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--files-per-request", type=int, default=50, help="PDFs per batch upload request")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--k", type=int, default=4, help="Chunks retrieved per question for recall")
+    parser.add_argument("--database", default="rag_benchmark", help="MongoDB database for the run")
+    parser.add_argument("--answer-cache", action="store_true", help="Keep the answer cache enabled")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory and database")
+    parser.add_argument("--output", help="Write the results JSON here (default: stdout)")
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix="rag_benchmark_")
+    corpus_dir = args.corpus or os.path.join(workdir, "corpus")
+    try:
+        generated = not os.path.exists(os.path.join(corpus_dir, QUESTIONS_FILE))
+        if generated:
+            log(f"Generating {args.documents} x {args.pages}-page corpus in {corpus_dir}...")
+            questions = generate_corpus(corpus_dir, args.documents, args.pages, args.lines, args.facts, args.seed)
+        else:
+            questions = load_questions(corpus_dir)
+        filenames = sorted(name for name in os.listdir(corpus_dir) if name.lower().endswith(".pdf"))
+        
+        # Must be set before app.core.config is imported
+        for name, path in DATA_PATHS.items():
+            os.environ[name] = os.path.join(workdir, path)
+        os.environ["DATABASE_NAME"] = args.database
+        if not args.answer_cache:
+            os.environ["ANSWER_CACHE"] = "false"
+        
+        results = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "corpus": {
+                "directory": args.corpus,
+                "documents": len(filenames),
+                "questions": len(questions),
+                "pages_per_document": args.pages if generated else None,
+                "seed": args.seed if generated else None
+            }
+        }
+        results.update(asyncio.run(run(args, corpus_dir, filenames, questions)))
+    finally:
+        if args.keep:
+            log(f"Scratch data kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    output = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        log(f"Results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
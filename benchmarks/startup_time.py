@@ -0,0 +1,116 @@
+"""
+Benchmark application startup: import time of app.main and time until /health and /ready
+
+Each measurement runs in a fresh interpreter so module caches don't hide
+import costs.
+
+Usage:
+    python benchmarks/startup_time.py --runs 5 --top 15
+    python benchmarks/startup_time.py --serve --port 8765
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def import_times(runs: int):
+    """Wall time of `import app.main` in fresh interpreters, in ms"""
+    times = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        times.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+    return times
+
+
+def slowest_imports(top: int):
+    """Modules with the largest cumulative import time (python -X importtime)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    # Top-level packages only, so nested modules don't crowd the list
+    rows = [row for row in rows if "." not in row[1]]
+    return sorted(rows, reverse=True)[:top]
+
+
+def wait_for(url: str, deadline: float):
+    """Poll a URL until it returns 200; return seconds waited or None on timeout"""
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def serve_times(port: int, timeout: float):
+    """Start uvicorn and measure time until /health and /ready answer 200"""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + timeout
+        health = wait_for(f"http://127.0.0.1:{port}/health", deadline)
+        health = None if health is None else time.perf_counter() - started
+        ready = wait_for(f"http://127.0.0.1:{port}/ready", deadline)
+        ready = None if ready is None else time.perf_counter() - started
+        return health, ready
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def fmt(seconds):
+    return "timeout" if seconds is None else f"{seconds * 1000:8.0f} ms"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark import and startup time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh-interpreter imports to time")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    parser.add_argument("--serve", action="store_true", help="Also start uvicorn and time /health and /ready")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for /ready")
+    args = parser.parse_args()
+    
+    times = import_times(args.runs)
+    print(f"import app.main ({args.runs} runs)")
+    print(f"  median {statistics.median(times):8.1f} ms   min {min(times):8.1f} ms   max {max(times):8.1f} ms")
+    
+    if args.top:
+        print(f"\nSlowest top-level imports (cumulative)")
+        for cumulative, name in slowest_imports(args.top):
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    
+    if args.serve:
+        health, ready = serve_times(args.port, args.timeout)
+        print(f"\nuvicorn startup")
+        print(f"  /health  {fmt(health)}")
+        print(f"  /ready   {fmt(ready)}")
@@ -0,0 +1,85 @@
+"""
+Generate synthetic text PDFs for benchmarks (no PDF library needed)
+
+Usage:
+    python benchmarks/synthetic_pdf.py out.pdf --pages 500
+"""
+import argparse
+import random
+from typing import List
+
+WORDS = (
+    "system process data model service request response document index query "
+    "vector embedding cache latency throughput memory storage network client "
+    "server batch stream page chunk token score rank result error retry "
+    "config deploy release version feature customer invoice contract report"
+).split()
+
+
+def write_pdf(path: str, pages: List[List[str]]):
+    """
+    Write a minimal PDF with one text line per list entry
+    
+    Args:
+        path: Output file
+        pages: Lines of text for each page
+    """
+    objects = []
+    
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+    
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_ref = add(b"")  # Filled in once the page objects exist
+    kids = []
+    for lines in pages:
+        text = b" ".join(
+            b"(" + line.replace("\\", "").replace("(", "").replace(")", "").encode("latin-1", "replace") + b") '"
+            for line in lines
+        )
+        stream = b"BT /F1 10 Tf 40 760 Td 12 TL " + text + b" ET"
+        contents = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_ref, contents, font)
+        ))
+    objects[pages_ref - 1] = (
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % kid for kid in kids) + b"] /Count %d >>" % len(kids)
+    )
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_ref)
+    
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    with open(path, "wb") as f:
+        f.write(bytes(out))
+
+
+def random_pages(num_pages: int, lines_per_page: int = 50, seed: int = 0) -> List[List[str]]:
+    """Pages of pseudo-random sentences, reproducible for a given seed"""
+    rng = random.Random(seed)
+    return [
+        [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14))).capitalize() + "."
+            for _ in range(lines_per_page)
+        ]
+        for _ in range(num_pages)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic text PDF")
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=50, help="Lines of text per page")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_pdf(args.path, random_pages(args.pages, args.lines, args.seed))
+    print(f"Wrote {args.pages} pages to {args.path}")
@@ -0,0 +1,161 @@
+"""
+Benchmark recall@k vs query latency of the IVF vector store against exact NumPy search
+
+Builds an IVF store from synthetic clustered unit vectors (or the vectors of
+an existing collection) and, for each vector dtype and nprobe, measures
+recall@k against a brute-force dot product over the same vectors. With
+--chroma, the same vectors are also loaded into a Chroma collection for
+comparison.
+
+Usage:
+    python benchmarks/vector_recall.py --vectors 200000 --nlist 1024 --nprobe 1,4,16,64
+    python benchmarks/vector_recall.py --dtypes float32,float16,int8 --rescore-factor 4
+    python benchmarks/vector_recall.py --collection documents --nlist 64
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.ivf_store import IVFStore, QUANTIZED_DTYPES
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors drawn around random cluster centres, like topic-clustered chunk embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 65536):
+        end = min(start + 65536, count)
+        labels = rng.integers(0, clusters, end - start)
+        vectors[start:end] = centres[labels] + 0.6 * rng.standard_normal((end - start, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def collection_vectors(collection_name: str) -> np.ndarray:
+    """All vectors stored in a collection of the configured backend"""
+    from app.core.vector_store import vector_store_manager
+    backend = vector_store_manager.get_backend(collection_name)
+    batches = []
+    for offset in range(0, backend.count(), 5000):
+        batches.append(np.asarray(backend.get(limit=5000, offset=offset, include=["embeddings"])["embeddings"], dtype=np.float32))
+    vectors = np.concatenate(batches)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    """Ground truth: row indices of the k most similar vectors per query"""
+    truth = []
+    for query in queries:
+        scores = vectors @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        truth.append(set(top[np.argsort(-scores[top])].tolist()))
+    return truth
+
+
+def measure(search, queries: np.ndarray, truth: list, k: int):
+    """Run queries through search(query) -> row indices; return recall@k and latencies in ms"""
+    hits = 0
+    latencies = []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected.intersection(found[:k]))
+    return hits / (len(queries) * k), latencies
+
+
+def summarize(name: str, recall: float, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[max(int(len(ordered) * 0.95) - 1, 0)]
+    print(f"{name:<18} recall@k={recall:6.3f}  p50={statistics.median(ordered):8.2f}ms  p95={p95:8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100000, help="Synthetic vectors to index")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000, help="Topic clusters in the synthetic data")
+    parser.add_argument("--collection", help="Use the vectors of this collection instead of synthetic ones")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--nprobe", default="1,4,16,32,64", help="Comma-separated nprobe values to try")
+    parser.add_argument("--dtypes", default="float32", help="Comma-separated vector dtypes to try (float32, float16, int8)")
+    parser.add_argument("--rescore-factor", type=int, default=4, help="Quantized candidates re-scored per result")
+    parser.add_argument("--chroma", action="store_true", help="Also measure a Chroma (HNSW) collection")
+    args = parser.parse_args()
+    
+    if args.collection:
+        vectors = collection_vectors(args.collection)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim, args.clusters)
+    rng = np.random.default_rng(1)
+    # Queries are perturbed copies of stored vectors, like questions close to a chunk
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = exact_top_k(vectors, queries, args.k)
+    ids = [str(i) for i in range(len(vectors))]
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, k={args.k}\n")
+    
+    summarize("numpy exact", 1.0, measure(
+        lambda q: np.argpartition(-(vectors @ q), args.k - 1)[:args.k].tolist(), queries, truth, args.k
+    )[1])
+    
+    workdir = tempfile.mkdtemp(prefix="vector_recall_")
+    try:
+        dtypes = args.dtypes.split(",")
+        path = os.path.join(workdir, "ivf")
+        store = IVFStore(path, nlist=args.nlist, dtype=dtypes[0], rescore_factor=args.rescore_factor)
+        start = time.perf_counter()
+        for offset in range(0, len(vectors), 10000):
+            batch = vectors[offset:offset + 10000]
+            store.add(ids[offset:offset + 10000], batch, [""] * len(batch), [None] * len(batch))
+        if store._centroids is None:
+            store.train()
+        print(f"{'ivf build':<18} {time.perf_counter() - start:8.1f}s (nlist={args.nlist})")
+        for dtype in dtypes:
+            if dtype != store.dtype:
+                # Reopening with another dtype rebuilds the quantized copy from the float32 file
+                store.close()
+                store = IVFStore(path, nlist=args.nlist, dtype=dtype, rescore_factor=args.rescore_factor)
+            scanned = vectors.shape[1] * (4 if dtype == "float32" else np.dtype(dtype).itemsize)
+            print(f"\n{dtype}: {scanned} bytes scanned per vector" + (
+                f", top {args.k * args.rescore_factor} re-scored in float32" if dtype in QUANTIZED_DTYPES else ""
+            ))
+            for nprobe in [int(value) for value in args.nprobe.split(",")]:
+                recall, latencies = measure(
+                    lambda q: [int(i) for i in store.query(q, args.k, nprobe=nprobe)["ids"]], queries, truth, args.k
+                )
+                summarize(f"ivf nprobe={nprobe}", recall, latencies)
+        store.close()
+        
+        if args.chroma:
+            import chromadb
+            collection = chromadb.PersistentClient(path=os.path.join(workdir, "chroma")).create_collection(
+                "benchmark", embedding_function=None
+            )
+            start = time.perf_counter()
+            for offset in range(0, len(vectors), 5000):
+                collection.add(ids=ids[offset:offset + 5000], embeddings=vectors[offset:offset + 5000])
+            print(f"\n{'chroma build':<18} {time.perf_counter() - start:8.1f}s")
+            recall, latencies = measure(
+                lambda q: [int(i) for i in collection.query(query_embeddings=[q], n_results=args.k, include=[])["ids"][0]],
+                queries, truth, args.k
+            )
+            summarize("chroma hnsw", recall, latencies)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,17 @@ const chatMessages = document.getElementById('chatMessages');
 
 let isProcessing = false;
 
+// Conversation ID, kept for the browser tab so follow-up questions have context
+const sessionId = sessionStorage.getItem('chatSessionId') || newSessionId();
+sessionStorage.setItem('chatSessionId', sessionId);
+
+function newSessionId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
 // Chat form submission
 chatForm.addEventListener('submit', async (e) => {
     e.preventDefault();
@@ -27,24 +38,7 @@ chatForm.addEventListener('submit', async (e) => {
     sendBtn.disabled = true;
     
     try {
-        const response = await fetch(`${API_BASE_URL}/chat/query`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ question })
-        });
-        
-        const data = await response.json();
-        
-        // Remove loading
-        removeLoading();
-        
-        if (response.ok) {
-            addMessage(data.answer, 'assistant', data.sources);
-        } else {
-            addMessage('Sorry, I encountered an error processing your question. Please try again.', 'assistant');
-        }
+        await streamAnswer(question);
     } catch (error) {
         console.error('Query error:', error);
         removeLoading();
@@ -56,6 +50,76 @@ chatForm.addEventListener('submit', async (e) => {
     }
 });
 
+// Stream an answer over Server-Sent Events, rendering tokens as they arrive
+async function streamAnswer(question) {
+    const response = await fetch(`${API_BASE_URL}/chat/query/stream`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ question, session_id: sessionId })
+    });
+    
+    if (!response.ok || !response.body) {
+        throw new Error(`Stream request failed: ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let message = null;
+    let sources = null;
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const { event, data } = parseEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+            
+            if (event === 'sources') {
+                sources = data.sources;
+            } else if (event === 'token') {
+                if (!message) {
+                    removeLoading();
+                    message = addMessage('', 'assistant');
+                }
+                message.text.textContent += data.text;
+                scrollToBottom();
+            } else if (event === 'done') {
+                if (!message) {
+                    removeLoading();
+                    message = addMessage('', 'assistant');
+                }
+                setSources(message.bubble, sources);
+            } else if (event === 'error') {
+                removeLoading();
+                addMessage(data.message, 'assistant');
+            }
+        }
+    }
+    
+    removeLoading();
+}
+
+// Parse one Server-Sent Event block
+function parseEvent(block) {
+    let event = 'message';
+    const dataLines = [];
+    for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    }
+    return { event, data: JSON.parse(dataLines.join('\n') || '{}') };
+}
+
 // Add message to chat
 function addMessage(text, role, sources = null) {
     // Remove welcome message if it exists
@@ -71,20 +135,10 @@ function addMessage(text, role, sources = null) {
         ? '<i class="bi bi-person-circle message-icon"></i>' 
         : '<i class="bi bi-robot message-icon"></i>';
     
-    let sourcesHtml = '';
-    if (sources && sources.length > 0) {
-        sourcesHtml = `
-            <div class="sources">
-                <strong>Sources:</strong>
-                ${sources.map(source => `<div><i class="bi bi-file-earmark-text"></i> ${source}</div>`).join('')}
-            </div>
-        `;
-    }
-    
     if (role === 'user') {
         messageDiv.innerHTML = `
             <div class="message-bubble">
-                ${escapeHtml(text)}
+                <span class="message-text"></span>
             </div>
             ${icon}
         `;
@@ -92,14 +146,32 @@ function addMessage(text, role, sources = null) {
         messageDiv.innerHTML = `
             ${icon}
             <div class="message-bubble">
-                ${escapeHtml(text)}
-                ${sourcesHtml}
+                <span class="message-text"></span>
             </div>
         `;
     }
     
+    const bubble = messageDiv.querySelector('.message-bubble');
+    const textSpan = messageDiv.querySelector('.message-text');
+    textSpan.textContent = text;
+    setSources(bubble, sources);
+    
     chatMessages.appendChild(messageDiv);
     scrollToBottom();
+    
+    return { bubble, text: textSpan };
+}
+
+// Render the sources list under a message
+function setSources(bubble, sources) {
+    if (sources && sources.length > 0) {
+        bubble.insertAdjacentHTML('beforeend', `
+            <div class="sources">
+                <strong>Sources:</strong>
+                ${sources.map(source => `<div><i class="bi bi-file-earmark-text"></i> ${escapeHtml(source)}</div>`).join('')}
+            </div>
+        `);
+    }
 }
 
 // Show loading indicator
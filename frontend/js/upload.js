@@ -7,23 +7,32 @@ const uploadBtn = document.getElementById('uploadBtn');
 const progressContainer = document.getElementById('progressContainer');
 const alertContainer = document.getElementById('alertContainer');
 const documentsList = document.getElementById('documentsList');
+const loadMoreBtn = document.getElementById('loadMoreBtn');
+
+// Documents are listed one page at a time; nextCursor fetches the next page
+const DOCUMENTS_PAGE_SIZE = 50;
+let nextCursor = null;
 
 // Upload form submission
 uploadForm.addEventListener('submit', async (e) => {
     e.preventDefault();
     
-    const file = fileInput.files[0];
-    if (!file) {
+    const files = Array.from(fileInput.files);
+    if (files.length === 0) {
         showAlert('Please select a file', 'danger');
         return;
     }
     
-    if (!file.name.endsWith('.pdf')) {
-        showAlert('Only PDF files are allowed', 'danger');
+    if (files.some(file => !file.name.endsWith('.pdf') && !file.name.toLowerCase().endsWith('.zip'))) {
+        showAlert('Only PDF and ZIP files are allowed', 'danger');
         return;
     }
     
-    await uploadDocument(file);
+    if (files.length === 1 && files[0].name.endsWith('.pdf')) {
+        await uploadDocument(files[0]);
+    } else {
+        await uploadBatch(files);
+    }
 });
 
 // Upload document
@@ -44,12 +53,13 @@ async function uploadDocument(file) {
         
         const data = await response.json();
         
-        if (data.success) {
-            showAlert(
-                `Success! ${data.filename} uploaded and processed. Created ${data.num_chunks} chunks.`,
-                'success'
-            );
+        if (data.success && data.job_id) {
             fileInput.value = '';
+            await waitForJob(data.job_id, data.filename);
+        } else if (data.success) {
+            // Identical content was already indexed, nothing to wait for
+            fileInput.value = '';
+            showAlert(data.message, 'success');
             loadDocuments();
         } else {
             // Show the specific error message from the server
@@ -64,25 +74,139 @@ async function uploadDocument(file) {
     }
 }
 
-// Load documents list
-async function loadDocuments() {
+// Upload several documents (or zip archives) in one request
+async function uploadBatch(files) {
+    const formData = new FormData();
+    files.forEach(file => formData.append('files', file));
+    
+    progressContainer.classList.remove('d-none');
+    uploadBtn.disabled = true;
+    alertContainer.innerHTML = '';
+    
     try {
-        const response = await fetch(`${API_BASE_URL}/documents/`);
+        const response = await fetch(`${API_BASE_URL}/documents/upload/batch`, {
+            method: 'POST',
+            body: formData
+        });
+        
         const data = await response.json();
         
-        if (data.documents && data.documents.length > 0) {
-            displayDocuments(data.documents);
+        if (data.success) {
+            fileInput.value = '';
+            const rejected = data.files.filter(file => !file.success);
+            await waitForBatch(data.batch_id, rejected);
         } else {
+            showAlert(data.message || 'Upload failed', 'danger');
+        }
+    } catch (error) {
+        console.error('Upload error:', error);
+        showAlert('Network error uploading documents. Please check if the server is running.', 'danger');
+    } finally {
+        progressContainer.classList.add('d-none');
+        uploadBtn.disabled = false;
+    }
+}
+
+// Poll a batch upload until every file is finished
+async function waitForBatch(batchId, rejected) {
+    while (true) {
+        const response = await fetch(`${API_BASE_URL}/documents/batches/${batchId}`);
+        if (!response.ok) {
+            showAlert('Lost track of the processing batch. Please refresh the page.', 'danger');
+            return;
+        }
+        
+        const batch = await response.json();
+        const done = batch.completed + batch.failed;
+        
+        if (done === batch.total) {
+            const failed = batch.jobs
+                .filter(job => job.status === 'failed')
+                .map(job => `${job.filename}: ${job.message}`)
+                .concat(rejected.map(file => `${file.filename}: ${file.message}`));
+            const summary = `Processed ${batch.completed} of ${batch.total + rejected.length} file(s).`;
+            showAlert(
+                failed.length ? `${summary} Failed: ${failed.join('; ')}` : summary,
+                failed.length ? 'warning' : 'success'
+            );
+            loadDocuments();
+            return;
+        }
+        
+        showAlert(`Processing ${batch.total} file(s): ${batch.completed} done, ${batch.processing} in progress, ${batch.failed} failed...`, 'info');
+        
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
+// Poll an ingestion job until it finishes
+async function waitForJob(jobId, filename) {
+    while (true) {
+        const response = await fetch(`${API_BASE_URL}/documents/jobs/${jobId}`);
+        if (!response.ok) {
+            showAlert('Lost track of the processing job. Please refresh the page.', 'danger');
+            return;
+        }
+        
+        const job = await response.json();
+        
+        if (job.status === 'completed') {
+            showAlert(
+                `Success! ${filename} uploaded and processed. Created ${job.chunks_total} chunks.`,
+                'success'
+            );
+            loadDocuments();
+            return;
+        }
+        if (job.status === 'failed') {
+            showAlert(job.message || 'Processing failed', 'danger');
+            return;
+        }
+        
+        const pages = job.pages_total
+            ? `page ${job.pages_parsed}/${job.pages_total}`
+            : `${job.pages_parsed} pages`;
+        const progress = `${pages}, embedded ${job.chunks_embedded} chunks`;
+        showAlert(`Processing ${filename}: ${progress}...`, 'info');
+        
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
+// Load the first page of the documents list, or the next one if more is true
+async function loadDocuments(more = false) {
+    try {
+        let query = `?limit=${DOCUMENTS_PAGE_SIZE}`;
+        if (more && nextCursor) {
+            query += `&cursor=${encodeURIComponent(nextCursor)}`;
+        }
+        loadMoreBtn.disabled = true;
+        const response = await fetch(`${API_BASE_URL}/documents/${query}`);
+        const data = await response.json();
+        const documents = data.documents || [];
+        nextCursor = data.next_cursor || null;
+        
+        if (documents.length > 0) {
+            displayDocuments(documents, more);
+        } else if (!more) {
             documentsList.innerHTML = '<p class="text-muted">No documents uploaded yet.</p>';
         }
     } catch (error) {
         console.error('Error loading documents:', error);
-        documentsList.innerHTML = '<p class="text-danger">Error loading documents.</p>';
+        if (!more) {
+            nextCursor = null;
+            documentsList.innerHTML = '<p class="text-danger">Error loading documents.</p>';
+        } else {
+            showAlert('Error loading more documents', 'danger');
+        }
+    } finally {
+        loadMoreBtn.disabled = false;
+        loadMoreBtn.classList.toggle('d-none', !nextCursor);
     }
 }
 
-// Display documents
-function displayDocuments(documents) {
+// Display documents, after the ones already shown if append is true
+function displayDocuments(documents, append = false) {
     const html = documents.map(doc => `
         <div class="document-item">
             <div class="d-flex justify-content-between align-items-center">
@@ -104,7 +228,11 @@ function displayDocuments(documents) {
         </div>
     `).join('');
     
-    documentsList.innerHTML = html;
+    if (append) {
+        documentsList.insertAdjacentHTML('beforeend', html);
+    } else {
+        documentsList.innerHTML = html;
+    }
 }
 
 // Delete document
@@ -150,5 +278,7 @@ function formatFileSize(bytes) {
     return Math.round(bytes / Math.pow(k, i) * 100) / 100 + ' ' + sizes[i];
 }
 
+loadMoreBtn.addEventListener('click', () => loadDocuments(true));
+
 // Load documents on page load
 loadDocuments();
@@ -0,0 +1,39 @@
+"""
+Script to compact the vector store after deletions
+
+Rebuilds the collection's index without deleted vectors and vacuums the
+underlying SQLite file. Stop the API server before running it.
+
+Usage:
+    python scripts/compact_vector_store.py [--collection documents]
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.vector_store import vector_store_manager
+
+
+def compact_vector_store(collection_name):
+    """Compact one collection and report the space reclaimed"""
+    print(f"Compacting collection '{collection_name}'...")
+    
+    result = vector_store_manager.compact(collection_name)
+    
+    reclaimed = result["size_before_bytes"] - result["size_after_bytes"]
+    print(f"\n{'='*50}")
+    print(f"Compaction complete!")
+    print(f"Records kept: {result['records']}")
+    print(f"Size: {result['size_before_bytes'] / 1e6:.1f} MB -> {result['size_after_bytes'] / 1e6:.1f} MB "
+          f"({reclaimed / 1e6:.1f} MB reclaimed)")
+    print(f"{'='*50}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reclaim space used by deleted vectors")
+    parser.add_argument("--collection", default="documents", help="Collection to compact")
+    args = parser.parse_args()
+    compact_vector_store(args.collection)
@@ -1,64 +1,288 @@
 """
 Script to reprocess existing PDF files in uploads folder
+
+Indexing is incremental: a manifest next to the vector store records each
+file's size, mtime, SHA-256 and chunk IDs. A rerun only (re)indexes new or
+changed files and removes the vectors of deleted ones.
+
+Files uploaded through the API are matched to their MongoDB documents by
+content hash. Their chunks get the same document_id and filename metadata
+the API writes and go to the collection of each owning document's
+workspace; files without a document are indexed into the default
+workspace. Chunks of content a MongoDB document still owns are never
+deleted.
+
+Usage:
+    python scripts/reprocess_pdfs.py [--workers N] [--full]
 """
+import argparse
 import asyncio
+import json
 import os
 import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.utils.pdf_loader import PDFLoaderUtil
-from app.utils.text_splitter import text_splitter
-from app.core.vector_store import vector_store_manager
 from app.core.config import settings
+from app.utils.hashing import chunk_ids, file_sha256
+
+MANIFEST_VERSION = 2
+MANIFEST_PATH = os.path.join(settings.CHROMA_DIR, "reprocess_manifest.json")
+
+
+def load_manifest():
+    """Load the manifest, or start an empty one"""
+    try:
+        with open(MANIFEST_PATH) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+        print("Manifest version changed, reindexing everything.")
+    except FileNotFoundError:
+        pass
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def save_manifest(manifest):
+    """Write the manifest atomically"""
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def prepare_file(file_path, known_hash):
+    """
+    Hash a file and, if its content changed, load and split it
+    
+    Runs in a worker process, so it must not touch the vector store. Pages
+    are split exactly as API ingestion splits them, so both write the same
+    chunk for the same ID.
+    
+    Returns:
+        (sha256, chunks) where chunks is None if the content is unchanged
+    """
+    from app.utils.pdf_loader import PDFLoaderUtil
+    from app.utils.text_splitter import text_splitter
+    
+    content_hash = file_sha256(file_path)
+    if content_hash == known_hash:
+        return content_hash, None
+    
+    # Files are already spread across processes; extract each one in its worker
+    return content_hash, list(text_splitter.iter_chunks(PDFLoaderUtil.iter_pages(file_path, workers=1)))
+
+
+async def load_owners():
+    """
+    MongoDB documents by content hash and workspace
+    
+    Returns:
+        {content_hash: {workspace: document}}, keeping the oldest document
+        per workspace; empty if MongoDB is unavailable
+    """
+    from app.core.database import mongodb
+    
+    owners = defaultdict(dict)
+    await mongodb.connect()
+    collection = mongodb.get_collection("documents")
+    if collection is None:
+        print("MongoDB unavailable: indexing every file into the default workspace without document metadata.")
+        return owners
+    try:
+        cursor = collection.find(
+            {"content_hash": {"$exists": True}},
+            {"content_hash": 1, "filename": 1, "workspace": 1}
+        ).sort("_id", 1)
+        async for doc in cursor:
+            workspace = doc.get("workspace") or settings.DEFAULT_WORKSPACE
+            owners[doc["content_hash"]].setdefault(workspace, doc)
+    finally:
+        await mongodb.close()
+    return owners
+
 
-async def reprocess_pdfs():
-    """Reprocess all PDFs in uploads folder"""
+def unowned(collection_name, ids, owned_hashes):
+    """Drop IDs of content a MongoDB document of the collection's workspace still owns"""
+    return [
+        chunk_id for chunk_id in ids
+        if (collection_name, chunk_id.rsplit(":", 1)[0]) not in owned_hashes
+    ]
+
+
+def tag_chunks(chunks, document):
+    """Copies of chunks with the metadata API ingestion writes for document"""
+    tagged = []
+    for chunk in chunks:
+        chunk = chunk.model_copy(update={"metadata": dict(chunk.metadata)})
+        chunk.metadata["document_id"] = str(document["_id"])
+        chunk.metadata["filename"] = document["filename"]
+        tagged.append(chunk)
+    return tagged
+
+
+def release_ids(refcount, collections):
+    """
+    Drop one reference to each chunk ID of a manifest entry
+    
+    Returns:
+        {collection: IDs no file uses anymore}
+    """
+    unused = defaultdict(list)
+    for collection_name, ids in collections.items():
+        for chunk_id in ids:
+            key = (collection_name, chunk_id)
+            refcount[key] -= 1
+            if refcount[key] <= 0:
+                del refcount[key]
+                unused[collection_name].append(chunk_id)
+    return unused
+
+
+def delete_unused(vector_store_manager, unused, owned_hashes):
+    """Delete released IDs that no MongoDB document owns; returns how many were deleted"""
+    deleted = 0
+    for collection_name, ids in unused.items():
+        ids = unowned(collection_name, ids, owned_hashes)
+        if ids:
+            vector_store_manager.delete(ids, collection_name)
+            deleted += len(ids)
+    return deleted
+
+
+def reprocess_pdfs(workers, full=False):
+    """Incrementally reindex all PDFs in uploads folder"""
     upload_dir = settings.UPLOAD_DIR
     
     print(f"Scanning {upload_dir} for PDF files...")
     
-    pdf_files = [f for f in os.listdir(upload_dir) if f.endswith('.pdf')]
+    manifest = load_manifest()
+    known = manifest["files"]
     
-    if not pdf_files:
-        print("No PDF files found to process.")
+    # Cheap pass: only files whose size or mtime changed need hashing
+    present = {}
+    candidates = []
+    for entry in os.scandir(upload_dir):
+        if not entry.is_file() or not entry.name.endswith('.pdf'):
+            continue
+        stat = entry.stat()
+        present[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        previous = known.get(entry.name)
+        if full or previous is None or (previous["size"], previous["mtime_ns"]) != present[entry.name]:
+            candidates.append(entry.name)
+    
+    deleted = [name for name in known if name not in present]
+    
+    print(f"Found {len(present)} PDF file(s): {len(candidates)} new or modified, {len(deleted)} deleted")
+    
+    if not candidates and not deleted:
+        print("Index is up to date.")
         return
     
-    print(f"Found {len(pdf_files)} PDF file(s):")
-    for pdf in pdf_files:
-        print(f"  - {pdf}")
+    # Import lazily: loading the embedding model is the slowest part of a no-op run
+    from app.core.vector_store import collection_for_workspace, vector_store_manager
     
-    pdf_loader = PDFLoaderUtil()
-    total_chunks = 0
+    owners = asyncio.run(load_owners())
+    owned_hashes = {
+        (collection_for_workspace(workspace), content_hash)
+        for content_hash, documents in owners.items()
+        for workspace in documents
+    }
+    
+    # Files with identical content share chunk IDs, so count references
+    refcount = Counter(
+        (collection_name, chunk_id)
+        for entry in known.values()
+        for collection_name, ids in entry["collections"].items()
+        for chunk_id in ids
+    )
     
-    for pdf_file in pdf_files:
-        file_path = os.path.join(upload_dir, pdf_file)
-        print(f"\nProcessing: {pdf_file}")
+    # Remove vectors of deleted files
+    for name in deleted:
+        removed = delete_unused(vector_store_manager, release_ids(refcount, known.pop(name)["collections"]), owned_hashes)
+        print(f"  ✗ Removed {name} ({removed} chunk(s))")
+    
+    total_chunks = 0
+    errors = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                prepare_file,
+                os.path.join(upload_dir, name),
+                None if full else known.get(name, {}).get("sha256")
+            ): name
+            for name in candidates
+        }
         
-        try:
-            # Load PDF
-            documents = pdf_loader.load_pdf(file_path)
-            print(f"  ✓ Loaded {len(documents)} page(s)")
-            
-            # Split into chunks
-            chunks = text_splitter.split_documents(documents)
-            print(f"  ✓ Created {len(chunks)} chunk(s)")
-            
-            # Add to vector store
-            vector_store_manager.add_documents(chunks)
-            print(f"  ✓ Added to vector store")
-            
-            total_chunks += len(chunks)
-            
-        except Exception as e:
-            print(f"  ✗ Error: {e}")
+        for future in as_completed(futures):
+            name = futures[future]
+            size, mtime_ns = present[name]
+            try:
+                content_hash, chunks = future.result()
+                
+                if chunks is None:
+                    # Touched but not modified: just refresh the stat info
+                    known[name].update(size=size, mtime_ns=mtime_ns)
+                    print(f"  = {name} unchanged")
+                    continue
+                
+                ids = chunk_ids(content_hash, len(chunks))
+                collections = {}
+                documents = owners.get(content_hash)
+                if documents:
+                    # Same IDs, contents and metadata as the API wrote
+                    for workspace, document in documents.items():
+                        collection_name = collection_for_workspace(workspace)
+                        vector_store_manager.add_documents(tag_chunks(chunks, document), collection_name, ids=ids)
+                        collections[collection_name] = ids
+                else:
+                    collection_name = collection_for_workspace()
+                    vector_store_manager.add_documents(chunks, collection_name, ids=ids)
+                    collections[collection_name] = ids
+                refcount.update((collection_name, chunk_id) for collection_name in collections for chunk_id in ids)
+                
+                # Drop chunks of the previous version that are no longer used
+                previous = known.get(name)
+                if previous is not None:
+                    delete_unused(vector_store_manager, release_ids(refcount, previous["collections"]), owned_hashes)
+                
+                known[name] = {
+                    "size": size,
+                    "mtime_ns": mtime_ns,
+                    "sha256": content_hash,
+                    "collections": collections
+                }
+                total_chunks += len(chunks)
+                print(f"  ✓ Indexed {name} ({len(chunks)} chunk(s))")
+            except Exception as e:
+                errors += 1
+                print(f"  ✗ Error processing {name}: {e}")
+    
+    save_manifest(manifest)
+    vector_store_manager.flush()
     
     print(f"\n{'='*50}")
     print(f"Processing complete!")
     print(f"Total chunks indexed: {total_chunks}")
+    if errors:
+        print(f"Files with errors: {errors}")
+    if vector_store_manager.embedding_cache is not None:
+        cache_stats = vector_store_manager.embedding_cache.stats()
+        print(f"Embedding cache hit rate: {cache_stats['hit_rate']:.1%} "
+              f"({cache_stats['hits']} reused, {cache_stats['misses']} embedded)")
     print(f"{'='*50}")
     print("\nYou can now ask questions about your documents!")
 
+
 if __name__ == "__main__":
-    asyncio.run(reprocess_pdfs())
+    parser = argparse.ArgumentParser(description="Incrementally reindex PDFs in the uploads folder")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes used to hash, parse and split PDFs (default: CPU count)")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the manifest and reindex every file")
+    args = parser.parse_args()
+    reprocess_pdfs(workers=max(1, args.workers), full=args.full)